@@ -87,8 +87,11 @@ def plot_multivariate(df: pd.DataFrame, dimensions: List[str]):
     return fig
 
 
-def auto_visualize(df: pd.DataFrame, query: str):
-    if is_relevant_chart_query(query):
+def auto_visualize(df: pd.DataFrame, query: str, chart_intent: bool = None):
+    # chart_intent: the is_relevant_chart_query verdict when the caller already has it
+    if chart_intent is None:
+        chart_intent = is_relevant_chart_query(query)
+    if chart_intent:
         figs = []
         numeric = df.select_dtypes(include='number').columns.tolist()
         
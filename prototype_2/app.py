@@ -3,13 +3,19 @@ from streamlit_chat import message  # Install via: pip install streamlit-chat
 import pandas as pd
 import plotly.express as px
 from Visualizations.AutoVisualizer import to_dataframe, auto_visualize  
-from sql_LLM import run_sql_llm,general_answers
-from utilities.is_relevant import is_relevant_log_query_zero_shot,is_relevant_chart_query,is_relevant_log_query_pre_trained
+from sql_LLM import general_answers,get_pipeline
+from orchestrator import get_orchestrator
+from utilities.is_relevant import warm_up
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import queue
 import re
-import torch
-torch.classes.__path__ = [] # add this line to manually set it to empty.
+import time
+import uuid
 #Can you get the correlation between the users and the success rate of the status code
 
+log = logging.getLogger("logbot")
+
 
 st.title("Logbot - Your Log Assistant")
 
@@ -18,57 +24,149 @@ st.title("Logbot - Your Log Assistant")
 if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
 
+
+def load_more_rows(i):
+    # Pull the next page of chat entry i's result (the pager re-runs its query for it)
+    entry = st.session_state.chat_history[i]
+    pager = entry["pager"]
+    rows = pager.fetch_page()
+    if rows:
+        entry["df"] = pd.concat([entry["df"], to_dataframe(rows, pager.columns)], ignore_index=True)
+    entry["truncated"] = pager.truncated or pager.timed_out or pager.cancelled
+    entry["page_timed_out"] = pager.timed_out
+    if pager.done:
+        entry["pager"] = None
+
+
+@st.cache_resource
+def warm_models():
+    # Once per process: the page renders right away while MiniLM loads in the background
+    return warm_up()
+
+
+warm_models()
+
+
+@st.cache_resource
+def query_executor():
+    # Shared by all sessions; queries run here so the script thread stays free to notice a Cancel click
+    return ThreadPoolExecutor(max_workers=8)
+
+
+def run_question(question):
+    """
+    Answers a question through the orchestrator (orchestrator.py) in a worker thread and renders its
+    events from this script run: the result table as soon as the query has run, then the answer as
+    its tokens arrive. Returns {"relevance", "state", "general_answer", "chart_intent"}.
+    Any click (e.g. "Cancel query") makes Streamlit stop this run at the next st call, which lands in
+    the finally block below and interrupts the SQLite query still running for it.
+    """
+    run_id = uuid.uuid4().hex
+    events = queue.Queue()
+    future = query_executor().submit(get_orchestrator().run_to_queue, question, run_id, events)
+    st.button("Cancel query", key=f"cancel_{run_id}")
+    status = st.empty()
+    answer_box = st.empty()
+    table_box = st.empty()
+    started = time.time()
+    outcome = {"relevance": None, "state": None, "general_answer": None, "chart_intent": None}
+    text, renders, last_render = "", 0, 0.0
+    try:
+        while True:
+            try:
+                event = events.get(timeout=0.2)
+            except queue.Empty:
+                status.caption(f"Thinking real hard... {time.time() - started:.0f}s")
+                continue
+            if event is None:
+                break
+            kind, payload = event
+            if kind == "token":
+                text += payload
+                # The chat component is remounted on every update, so redraws are throttled
+                if time.time() - last_render >= 0.1:
+                    with answer_box.container():
+                        message(text + "▌", key=f"stream_{run_id}_{renders}")
+                    renders += 1
+                    last_render = time.time()
+            elif kind in ("relevance", "general_answer", "chart_intent"):
+                outcome[kind] = payload
+                if kind == "relevance":
+                    log.info("relevance %s: %s", run_id, payload)
+            else:
+                outcome["state"] = state = payload
+                if kind == "execute_query" and not (state.get("timed_out") or state.get("cancelled")):
+                    status.empty()
+                    with table_box.container():
+                        st.subheader("📊 Result Table")
+                        st.dataframe(to_dataframe(state["result"], state["columns"]), use_container_width=True)
+        future.result()  # re-raises what the orchestrator failed with
+        return outcome
+    finally:
+        status.empty()
+        if not future.done():
+            get_pipeline().cancel(run_id)
+
+
+def render_entry(i, entry):
+    if entry["role"] == "user":
+        message(entry["text"], is_user=True, key=f"user_{i}")
+        return
+    message(entry["text"], key=f"assistant_{i}")
+    if entry.get("df") is not None:
+        st.subheader("📊 Result Table")
+        st.dataframe(entry["df"], use_container_width=True)
+        if entry.get("pager") is not None:
+            st.button("Load more rows", key=f"more_{i}", on_click=load_more_rows, args=(i,))
+        elif entry.get("page_timed_out"):
+            st.caption(f"Showing the first {len(entry['df'])} rows; loading more took longer than the time limit.")
+        elif entry.get("truncated"):
+            st.caption(f"Showing the first {len(entry['df'])} rows; the result was truncated.")
+
+    if entry.get("figs"):  # ✅ Show stored figures if any
+        st.subheader("📈 Auto Visualization")
+        for j, fig in enumerate(entry["figs"]):
+            st.plotly_chart(fig, use_container_width=True, key=f"plot_{i}_{j}")
+
+
+# ✅ Display chat history first, so a new answer streams in below it
+for i, entry in enumerate(st.session_state.chat_history):
+    render_entry(i, entry)
+
 # Text input area styled like a chatbot prompt
 user_input = st.chat_input("Ask me anything about your logs")
 
 # Handle input
 if user_input:
-    with st.spinner("Thinking real hard..."):
-        try:
-            if is_relevant_log_query_pre_trained(user_input):
-                result = run_sql_llm(user_input)
-                print(result['query'])  # For debugging
-                df = to_dataframe(result['result'], result['columns'])
-
-                # Save to chat history
-                st.session_state.chat_history.append({
-                    "role": "user", "text": user_input
-                })
-                st.session_state.chat_history.append({
-                    "role": "assistant", "text": result['answer'], "df": df ,"figs": auto_visualize(df, user_input)
-                })
-            else:
-                st.session_state.chat_history.append({
-                    "role": "user", "text": user_input
-                })
-                
-                st.session_state.chat_history.append({
-                    "role": "assistant", "text": general_answers(user_input), "df": None , "figs": None
-                })
-
-        except Exception as e:
+    user_entry = {"role": "user", "text": user_input}
+    st.session_state.chat_history.append(user_entry)
+    render_entry(len(st.session_state.chat_history) - 1, user_entry)
+    try:
+        outcome = run_question(user_input)
+        user_entry["relevance"] = outcome["relevance"]
+        if outcome["relevance"]["is_log_query"]:
+            result = outcome["state"]
+            print(result['query'])  # For debugging
+            timed_out = result.get('timed_out') or result.get('cancelled')
+            df = None if timed_out else to_dataframe(result['result'], result['columns'])
+
+            # Save to chat history
             st.session_state.chat_history.append({
-                "role": "user", "text": user_input
+                "role": "assistant", "text": result['answer'], "df": df ,
+                "figs": None if timed_out else auto_visualize(df, user_input, outcome["chart_intent"]),
+                "pager": result.get('pager'), "truncated": result.get('truncated', False)
             })
+        else:
             st.session_state.chat_history.append({
-                "role": "assistant", "text":general_answers(e,"error"), "df": None , "figs": None
+                "role": "assistant", "text": outcome["general_answer"], "df": None , "figs": None
             })
 
-# ✅ Display chat history once, at the bottom
-for i, entry in enumerate(st.session_state.chat_history):
-    if entry["role"] == "user":
-        message(entry["text"], is_user=True, key=f"user_{i}")
-    else:
-        message(entry["text"], key=f"assistant_{i}")
-        if entry.get("df") is not None:
-            st.subheader("📊 Result Table")
-            st.dataframe(entry["df"], use_container_width=True)
-
-        if entry.get("figs"):  # ✅ Show stored figures if any
-            st.subheader("📈 Auto Visualization")
-            for j, fig in enumerate(entry["figs"]):
-                st.plotly_chart(fig, use_container_width=True, key=f"plot_{i}_{j}")
-
+    except Exception as e:
+        st.session_state.chat_history.append({
+            "role": "assistant", "text":general_answers(e,"error"), "df": None , "figs": None
+        })
+    # The streamed placeholders are replaced by the finished entry (with its pager and charts)
+    st.rerun()
 
 
 
@@ -0,0 +1,130 @@
+"""
+Concurrent orchestration of one chat question.
+
+Answered strictly in order, a log question waits for relevance, then SQL generation, then execution,
+then the answer, although some of those waits do not depend on each other. Orchestrator runs them on
+an asyncio loop instead:
+
+    - classify_log_query and write_query start together when classification is not settled locally
+      within speculate_after_ms (i.e. it went to the LLM). The speculative SQL is cancelled, or its
+      result dropped, if the question is not about logs.
+    - the chart-intent check runs while the query executes and the answer streams.
+
+With LOGBOT_ROUTING=single the LLM relevance prompt and write_query collapse into one call,
+SQLPipeline.route(): the local kNN score still turns away confident non-log questions without any
+LLM call, everything else is routed (and its SQL written) by that single request.
+
+Blocking calls (LLM round trips, MiniLM, SQLite) run on a dedicated thread pool, so a discarded
+speculative call never holds up the loop's shutdown. Progress goes out as events through `emit`:
+
+    ("relevance", dict)         classify_log_query's verdict (path "routed" when route() decided)
+    ("general_answer", text)    the reply to a question that is not about logs
+    (node, state) / ("token", text)
+                                SQLPipeline.stream() events for a log question
+    ("chart_intent", bool)      is_relevant_chart_query, after the answer
+"""
+from sql_LLM import ROUTING, general_answers, get_pipeline
+from utilities.is_relevant import RELEVANCE_HIGH, RELEVANCE_LOW, classify_log_query, is_relevant_chart_query, log_query_score
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import os
+import threading
+import time
+
+
+SPECULATE_AFTER_MS = float(os.environ.get("LOGBOT_SPECULATE_AFTER_MS", "50"))
+
+
+class Orchestrator:
+    def __init__(self, pipeline=None, speculate_after_ms: float = SPECULATE_AFTER_MS, routing: str = ROUTING,
+                 max_workers: int = 16):
+        self.pipeline = pipeline if pipeline is not None else get_pipeline()
+        self.speculate_after_ms = speculate_after_ms
+        self.routing = routing
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="orchestrator")
+
+    def _spawn(self, func, *args) -> asyncio.Future:
+        return asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def run(self, question: str, run_id: str, emit):
+        if self.routing == "single":
+            return await self._run_routed(question, run_id, emit)
+        metrics = self.pipeline.metrics
+        relevance_task = self._spawn(classify_log_query, question)
+        done, _ = await asyncio.wait({relevance_task}, timeout=self.speculate_after_ms / 1000)
+        sql_task = None
+        if not done:
+            # The kNN score was not conclusive and the LLM is being asked: write the SQL meanwhile
+            sql_task = self._spawn(self.pipeline.write_query, {"question": question})
+            metrics.incr("speculative_sql")
+        relevance = await relevance_task
+        metrics.incr(f"relevance_{relevance['path']}")
+        emit(("relevance", relevance))
+
+        if not relevance["is_log_query"]:
+            if sql_task is not None:
+                sql_task.cancel()  # not started yet: never runs; in flight: its result is dropped
+                metrics.incr("speculative_sql_discarded")
+            emit(("general_answer", await self._spawn(general_answers, question)))
+            return
+
+        chart_task = self._spawn(is_relevant_chart_query, question)
+        written = await sql_task if sql_task is not None else None
+        await self._answer(question, run_id, written, chart_task, emit)
+
+    async def _run_routed(self, question: str, run_id: str, emit):
+        started = time.perf_counter()
+        score = await self._spawn(log_query_score, question)
+        routed = None
+        if score < RELEVANCE_LOW:
+            path, relevant = "knn_reject", False
+        else:
+            routed = await self._spawn(self.pipeline.route, question)
+            # A confident kNN accept stands; in between, the routed call's verdict decides
+            path = "knn_accept" if score >= RELEVANCE_HIGH else "routed"
+            relevant = score >= RELEVANCE_HIGH or routed["is_log_query"]
+        relevance = {"is_log_query": relevant, "path": path, "score": round(score, 4),
+                     "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)}
+        self.pipeline.metrics.incr(f"relevance_{path}")
+        emit(("relevance", relevance))
+        if not relevant:
+            emit(("general_answer", await self._spawn(general_answers, question)))
+            return
+
+        if routed["chart_intent"] is None:
+            chart_task = self._spawn(is_relevant_chart_query, question)
+        else:
+            chart_task = asyncio.get_running_loop().create_future()
+            chart_task.set_result(bool(routed["chart_intent"]))
+        # An empty query (kNN accepted what the router rejected) is written by the graph as usual
+        written = {"query": routed["query"], "sql_cache_hit": routed["sql_cache_hit"]} if routed["query"] else None
+        await self._answer(question, run_id, written, chart_task, emit)
+
+    async def _answer(self, question: str, run_id: str, written: dict, chart_task: asyncio.Future, emit):
+        await self._spawn(self._stream, question, run_id, written, emit)
+        emit(("chart_intent", await chart_task))
+
+    def _stream(self, question: str, run_id: str, written: dict, emit):
+        for event in self.pipeline.stream(question, run_id, written):
+            emit(event)
+
+    def run_to_queue(self, question: str, run_id: str, events):
+        """Blocking entry point for a worker thread: events go to `events`, then None marks the end."""
+        try:
+            asyncio.run(self.run(question, run_id, events.put))
+        finally:
+            events.put(None)
+
+
+_orchestrator = None
+_orchestrator_lock = threading.Lock()
+
+
+def get_orchestrator() -> Orchestrator:
+    """Returns the process-wide Orchestrator, building it (and the pipeline) on first use."""
+    global _orchestrator
+    if _orchestrator is None:
+        with _orchestrator_lock:
+            if _orchestrator is None:
+                _orchestrator = Orchestrator()
+    return _orchestrator
@@ -1,117 +1,82 @@
 from langchain_community.utilities import SQLDatabase
 from langchain_community.tools.sql_database.tool import QuerySQLDatabaseTool
+from langchain_core.runnables import RunnableConfig
 from typing_extensions import TypedDict, Annotated
-from langchain.chat_models import init_chat_model
 from langgraph.graph import START, StateGraph
+from utilities.llm_client import get_llm
+from utilities.semantic_cache import SemanticSQLCache
+from utilities.result_cache import ResultCache
+from utilities.index_advisor import IndexAdvisor
+from utilities.result_stream import ResultPager
+from utilities.metrics import Metrics
+from utilities.time_rewrite import rewrite_time_predicates
+from utilities.partitions import PartitionPruner
+from utilities.rollups import RollupRewriter
+from utilities.engines import ENGINE, make_engine
+from utilities.example_store import ExampleStore, render_examples
+from utilities.schema_linker import SchemaLinker
+from utilities.create_logs_db import HIDDEN_COLUMNS
 import os
+import re
 import sqlite3
+import threading
 
 
+DB_PATH = os.environ.get("LOGBOT_DB", "logs2.db")
+AUTO_INDEX = os.environ.get("LOGBOT_AUTO_INDEX", "false").lower() == "true"
+# "cascade": relevance check, then write_query. "single": one routed call answers both (see route())
+ROUTING = os.environ.get("LOGBOT_ROUTING", "cascade").lower()
 
 
-def run_sql_llm(question:str)-> dict:
-    """
-    This function initializes a SQL LLM pipeline to analyze logs from a security and network observability platform.
-    It uses SQLite as the database backend and LangChain's SQLDatabase for querying.
-    has question,query,result,columns,answer as the state variables.
-    """
-    # Set environment variables
-    os.environ["LANGSMITH_API_KEY"] = os.environ.get("LANGSMITH_API_KEY", "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")
-    os.environ["LANGSMITH_TRACING"] = "false"
-    os.environ["GROQ_API_KEY"] = os.environ.get("GROQ_API_KEY", "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")
+# Define state for the pipeline
+class State(TypedDict): 
+    question : str
+    query : str
+    result : str
+    columns : list
+    answer : str
+    sql_cache_hit : bool
+    result_cache_hit : bool
+    truncated : bool
+    pager : ResultPager
+    run_id : str
+    executed_query : str
+    timed_out : bool
+    cancelled : bool
+
+
+# Structured output format
+class QueryOutput(TypedDict):
+    query: Annotated[str, ..., "Syntactically valid SQL query."]  # type: ignore
 
-    # Initialize DB (SQLite version of our synthetic log system)
-    db = SQLDatabase.from_uri("sqlite:///logs2.db")
 
-    # Define state for the pipeline
-    class State(TypedDict): 
-        question : str
-        query : str
-        result : str
-        columns : list
-        answer : str
+# Structured output of the single-call routing mode
+class RoutedQueryOutput(QueryOutput):
+    is_log_query: Annotated[bool, ..., "True if the question can be answered from the log tables."]  # type: ignore
+    chart_intent: Annotated[bool, ..., "True if the user asks for a chart, plot, trend or other visualization."]  # type: ignore
 
-    # Initialize LLM (Gemma via Groq)
-    llm = init_chat_model("gemma2-9b-it", model_provider="groq")
 
-    # CUSTOM PROMPT FOR LOG ANALYSIS (RAG-style contextual guidance)
-    CUSTOM_PROMPT = """
+# CUSTOM PROMPT FOR LOG ANALYSIS (RAG-style contextual guidance)
+# The examples are the nearest ones from the example library (utilities/example_store.py) and table_info
+# covers only the tables linked to the question (utilities/schema_linker.py), so the prompt does not grow
+# with the library or with the number of log sources.
+CUSTOM_PROMPT = """
 
     You are a SQL assistant helping analyze internal logs from a security and network observability platform.
     
-    The logs are stored in three tables: `vpc_logs`, `access_logs`, and `execution_logs`.
-
-    Each table has the following schemas:
-
-    - vpc_logs(timestamp, src_ip, dst_ip, action, bytes_sent, request_id)
-    - access_logs(timestamp, user_id, endpoint,method,status_code, request_id)
-    - execution_logs(timestamp, function_name, duration_ms, success, request_id)
-
-    example data for vpc_logs:
-    | timestamp           | src_ip      | dst_ip   | action | bytes_sent | request_id   |
-    | ------------------- | ----------- | -------- | ------ | ---------- | ------------ |
-    | 2025-04-13T12:00:00 | 192.168.1.1 | 10.0.0.5 | ACCEPT | 2111       | req-118ab9fe |
-    | 2025-04-13T12:01:00 | 192.168.1.2 | 10.0.0.6 | REJECT | 2635       | req-fc133d2e |
-    | 2025-04-13T12:02:00 | 192.168.1.3 | 10.0.0.7 | ACCEPT | 3328       | req-7af7bf97 |
-    | 2025-04-13T12:03:00 | 192.168.1.4 | 10.0.0.8 | REJECT | 1347       | req-612e052f |
-    | 2025-04-13T12:04:00 | 192.168.1.5 | 10.0.0.9 | REJECT | 3793       | req-a8ea25b5 |
-
-    example data for access_logs:
-    | timestamp           | user_id | endpoint   | method | status_code | request_id   |
-    | ------------------- | ------- | ---------- | ------ | ----------- | ------------ |
-    | 2025-04-13T12:00:00 | user_1  | /api/login | GET    | 200         | req-118ab9fe |
-    | 2025-04-13T12:01:00 | user_2  | /api/data  | GET    | 403         | req-fc133d2e |
-    | 2025-04-13T12:02:00 | user_3  | /api/login | POST   | 201         | req-7af7bf97 |
-    | 2025-04-13T12:03:00 | user_4  | /api/login | GET    | 200         | req-612e052f |
-    | 2025-04-13T12:04:00 | user_5  | /api/login | GET    | 201         | req-a8ea25b5 |
-
-    example data for execution_logs:
-    | timestamp           | function_name | duration_ms | status  | request_id   |
-    | ------------------- | ------------- | ----------- | ------- | ------------ |
-    | 2025-04-13T12:00:00 | auth_user     | 924         | SUCCESS | req-118ab9fe |
-    | 2025-04-13T12:01:00 | auth_user     | 476         | SUCCESS | req-fc133d2e |
-    | 2025-04-13T12:02:00 | get_data      | 218         | SUCCESS | req-7af7bf97 |
-    | 2025-04-13T12:03:00 | auth_user     | 914         | FAILED  | req-612e052f |
-    | 2025-04-13T12:04:00 | get_data      | 792         | SUCCESS | req-a8ea25b5 |
+    The logs are stored in tables such as `vpc_logs`, `access_logs`, and `execution_logs`; the schema below has the ones relevant to this question.
 
     Use the request_id to join tables when the question requires correlating events.
+    {schema_notes}
 
     Some example questions:
     Example Question → SQL:
 
-    - Which functions failed?  
-    → SELECT function_name FROM execution_logs WHERE status = 'FAILED';
-
-    - can you give me how many users were accepted in the month of april? 
-    → SELECT COUNT(DISTINCT access_logs.user_id) AS accepted_users FROM access_logs JOIN vpc_logs USING (request_id) WHERE vpc_logs.action = 'ACCEPT' AND access_logs.timestamp >= '2025-04-01T00:00:00' AND access_logs.timestamp <= '2025-04-30T23:59:59';
-
-    - Which users triggered rejected VPC actions?  
-    → SELECT user_id FROM access_logs JOIN vpc_logs USING (request_id) WHERE action = 'REJECT';
-
-    - Which services had the highest average execution time for failed requests?  
-    → SELECT function_name, AVG(duration_ms) AS avg_duration FROM execution_logs WHERE status = 'FAILED' GROUP BY function_name ORDER BY avg_duration DESC;
-
-    - Which user IDs accessed the `/api/data` endpoint but the VPC action was REJECT?  
-    → SELECT access_logs.user_id FROM access_logs JOIN vpc_logs USING (request_id) WHERE access_logs.endpoint = '/api/data' AND vpc_logs.action = 'REJECT';
+{examples}
 
-    - For failed `auth_user` function calls, what were the corresponding IPs and status codes?  
-    → SELECT vpc_logs.src_ip, vpc_logs.dst_ip, access_logs.status_code FROM execution_logs JOIN vpc_logs USING (request_id) JOIN access_logs USING (request_id) WHERE execution_logs.function_name = 'auth_user' AND execution_logs.status = 'FAILED';
+    {routing}
 
-    - What is the total number of bytes sent for successful requests to the `/api/login` endpoint?  
-    → SELECT SUM(vpc_logs.bytes_sent) AS total_bytes FROM access_logs JOIN execution_logs USING (request_id) JOIN vpc_logs USING (request_id) WHERE access_logs.endpoint = '/api/login' AND execution_logs.status = 'SUCCESS';
-
-    - Which user had the longest execution duration and what function was called?  
-    → SELECT access_logs.user_id, execution_logs.function_name, execution_logs.duration_ms FROM execution_logs JOIN access_logs USING (request_id) ORDER BY execution_logs.duration_ms DESC LIMIT 1;
-
-    - List all requests where the VPC action was REJECT and the function call failed, along with timestamp and endpoint.  
-    → SELECT access_logs.timestamp, access_logs.endpoint, vpc_logs.src_ip, execution_logs.function_name FROM access_logs JOIN vpc_logs USING (request_id) JOIN execution_logs USING (request_id) WHERE vpc_logs.action = 'REJECT' AND execution_logs.status = 'FAILED';
-
-    - Count of failed requests by endpoint where latency was greater than 500ms.  
-    → SELECT access_logs.endpoint, COUNT(*) AS failed_count FROM execution_logs JOIN access_logs USING (request_id) WHERE execution_logs.status = 'FAILED' AND execution_logs.duration_ms > 500 GROUP BY access_logs.endpoint;
-
-    if the question is not related to the logs, say "I can't help with that".
-
-    Now, using the following user question and schema, generate a syntactically valid SQL query that works for SQLite. Do NOT explain the query — just return the SQL.
+    Now, using the following user question and schema, generate a syntactically valid SQL query that works for {dialect}. Do NOT explain the query — just return the SQL.
 
     Schema:
     {table_info}
@@ -120,34 +85,224 @@ def run_sql_llm(question:str)-> dict:
     {input}
     """
 
-    # Structured output format
-    class QueryOutput(TypedDict):
-        query: Annotated[str, ..., "Syntactically valid SQL query."]  # type: ignore
-  
+NOT_LOGS_INSTRUCTION = 'if the question is not related to the logs, say "I can\'t help with that".'
+ROUTING_INSTRUCTION = (
+    "Also decide whether the question is about these logs at all: set is_log_query to false (and query to an "
+    "empty string) if it is not. Set chart_intent to true if the user asks for a chart, plot, trend or visualization."
+)
+
+
+class SQLPipeline:
+    """
+    Long-lived SQL LLM pipeline to analyze logs from a security and network observability platform.
+    Owns the execution engine (SQLite, or DuckDB over Parquet: utilities/engines.py) with its SQLDatabase
+    handle, the LLM client and the compiled LangGraph workflow, so they are built once per process and
+    shared across Streamlit reruns and sessions.
+    has question,query,result,columns,answer as the state variables.
+    """
+
+    def __init__(self, db_path: str = DB_PATH, llm=None, engine=None):
+        self.db_path = db_path
+        # Initialize DB (SQLite version of our synthetic log system, or its Parquet copy under DuckDB)
+        self.engine = engine if engine is not None else make_engine(ENGINE, db_path)
+        self.pool = self.engine.pool
+        self.version = self.engine.version
+        self.schema = self.engine.schema
+        self.index_advisor = IndexAdvisor(db_path, auto_create=AUTO_INDEX)
+        self.metrics = Metrics()
+        self._running = {}  # run_id -> QueryGuard of the query executing for it
+        self._cancelled = set()
+        self._running_lock = threading.Lock()
+        self._epoch_columns = (None, False)
+        self.partition_pruner = PartitionPruner()
+        self.rollup_rewriter = RollupRewriter()
+        # Initialize LLM (Gemma via Groq)
+        self.llm = llm if llm is not None else get_llm()
+        self.structured_llm = self.llm.with_structured_output(QueryOutput)
+        self.routed_llm = self.llm.with_structured_output(RoutedQueryOutput)
+        self.sql_cache = SemanticSQLCache()
+        self.result_cache = ResultCache()
+        self.examples = ExampleStore()
+        self.schema_linker = SchemaLinker()
+        self.graph = self._build_graph()
+
+    @property
+    def db(self) -> SQLDatabase:
+        return self.schema.db
+
+    def _build_graph(self):
+        # Build LangGraph workflow
+        graph_builder = StateGraph(State).add_sequence(
+            [("write_query", self.write_query), ("execute_query", self.execute_query), ("generate_answer", self.generate_answer)]
+        )
+        graph_builder.add_edge(START, "write_query")
+        return graph_builder.compile()
 
     # Step 1: SQL generation
-    def write_query(state: State):
-        prompt = CUSTOM_PROMPT.format(
-            table_info=db.get_table_info(),
-            input=state["question"]
+    def write_query(self, state: State):
+        if state.get("query"):
+            # Already written before the graph started (speculatively, see orchestrator.py)
+            return {}
+        cached = self.sql_cache.lookup(state["question"], self.schema.fingerprint())
+        if cached is not None:
+            return {"query": cached[0], "sql_cache_hit": True}
+        result = self.structured_llm.invoke(self._sql_prompt(state["question"]))
+        return {"query": result["query"], "sql_cache_hit": False}
+
+    def _sql_prompt(self, question: str, routing: str = NOT_LOGS_INSTRUCTION) -> str:
+        examples = self.examples.retrieve(question)
+        linked = self.link_schema(question)
+        return CUSTOM_PROMPT.format(
+            examples=render_examples(examples),
+            schema_notes=linked.notes(),
+            table_info=self.schema.table_info(linked.tables or None),
+            routing=routing,
+            dialect=self.engine.dialect,
+            input=question
+        )
+
+    def route(self, question: str) -> dict:
+        """
+        Single-call routing: one structured request decides whether the question is about the logs,
+        writes its SQL and flags chart intent, on the same prompt as write_query (no separate relevance
+        prompt repeating the schema). Returns write_query's keys plus is_log_query and chart_intent
+        (None when not asked, i.e. on an SQL cache hit, which only ever holds log questions).
+        """
+        cached = self.sql_cache.lookup(question, self.schema.fingerprint())
+        if cached is not None:
+            return {"query": cached[0], "sql_cache_hit": True, "is_log_query": True, "chart_intent": None}
+        result = self.routed_llm.invoke(self._sql_prompt(question, ROUTING_INSTRUCTION))
+        return {"query": result.get("query") or "", "sql_cache_hit": False,
+                "is_log_query": bool(result.get("is_log_query")), "chart_intent": result.get("chart_intent")}
+
+    def link_schema(self, question: str):
+        """Tables (with join keys and value dictionaries) relevant to the question, see SchemaLinker."""
+        index = self.schema_linker.index(
+            self.schema.fingerprint(), self.db.get_usable_table_names(),
+            lambda: self.pool.checkout(timeout=30), self.pool.release,
         )
-        structured_llm = llm.with_structured_output(QueryOutput)
-        result = structured_llm.invoke(prompt)
-        return {"query": result["query"]}
+        return self.schema_linker.link(question, index)
+
+    def _has_epoch_columns(self, conn: sqlite3.Connection, schema_version: int) -> bool:
+        # Time predicates can only be moved onto ts_epoch once every log table has it
+        if self._epoch_columns[0] != schema_version:
+            has = all(
+                "ts_epoch" in [r[1] for r in conn.execute(f"PRAGMA table_xinfo({table})")]
+                for table in ("vpc_logs", "access_logs", "execution_logs")
+            )
+            self._epoch_columns = (schema_version, has)
+        return self._epoch_columns[1]
+
+    def prepare_sql(self, conn: sqlite3.Connection, query: str, version) -> str:
+        """
+        The SQL actually executed for a generated query: time predicates moved onto the indexed
+        ts_epoch column, then answered from a rollup table when one gives the same result, else
+        (partitioned layout only) pruned to the shards they can touch. Other engines only get the
+        generated SQL checked against their dialect.
+        """
+        if self.engine.name != "sqlite":
+            return self.engine.check_dialect(conn, query)
+        if self._has_epoch_columns(conn, version[0]):
+            query = rewrite_time_predicates(query)
+            rollup = self.rollup_rewriter.rewrite(conn, query, version[0])
+            if rollup is not None:
+                self.metrics.incr("rollup_rewrites")
+                return rollup
+        return self.partition_pruner.prune(conn, query, version[0])
 
     # Step 2: SQL execution
-    def execute_query(state: State):
-        # execute_query_tool = QuerySQLDatabaseTool(db=db)
+    def execute_query(self, state: State):
+        # execute_query_tool = QuerySQLDatabaseTool(db=self.db)
         # return {"result": execute_query_tool.invoke(state["query"])}
-            conn = sqlite3.connect("logs2.db")
-            cursor = conn.cursor()
-            cursor.execute(state["query"])
-            rows = cursor.fetchall()
-            columns = [desc[0] for desc in cursor.description]  # 👈 column names
-            return {"result": rows, "columns": columns}
+        version = self.version.current()
+        cached = self.result_cache.get(state["query"], version)
+        if cached is not None:
+            return {"result": cached[0], "columns": cached[1], "result_cache_hit": True,
+                    "truncated": False, "pager": None}
+        run_id = state.get("run_id")
+        if run_id in self._cancelled:
+            return self._aborted("cancelled")
+        conn = self.pool.checkout(timeout=30)
+        guard = self.engine.guard(conn)
+        with self._running_lock:
+            if run_id in self._cancelled:
+                # Cancelled while waiting for a connection: the guard aborts at its first check
+                guard.reason = "cancelled"
+            if run_id is not None:
+                self._running[run_id] = guard
+        try:
+            sql = self.prepare_sql(conn, state["query"], version)
+            if self.engine.name == "sqlite":
+                self.index_advisor.observe(conn, sql, version[0])
+            with guard:
+                try:
+                    cursor = conn.execute(sql)
+                except self.engine.errors:
+                    if guard.reason is not None or sql == state["query"] or self.engine.name != "sqlite":
+                        raise
+                    # A rewrite (ts_epoch, rollup, partitions) the statement did not survive: run it as generated
+                    self.metrics.incr("rewrite_fallbacks")
+                    sql = state["query"]
+                    cursor = conn.execute(sql)
+            # The first page is answered from; the UI pulls the rest on demand, each page on a fresh checkout
+            # Index helpers come back from SELECT *; they are only shown when the question's SQL asked for them
+            hidden = {c for c in HIDDEN_COLUMNS if not re.search(rf"\b{c}\b", state["query"], re.I)}
+            pager = ResultPager(cursor, sql, run_page=self._run_page, guard=guard, hidden=hidden)
+            rows = pager.fetch_page()
+        except self.engine.errors:
+            if guard.reason is None:
+                raise
+            return self._aborted(guard.reason)
+        finally:
+            self.pool.release(conn)
+            with self._running_lock:
+                self._running.pop(run_id, None)
+        self.metrics.incr("queries")
+        if not state.get("sql_cache_hit"):
+            # Only SQL that actually ran is worth reusing
+            self.sql_cache.store(state["question"], state["query"], self.schema.fingerprint())
+        # Results of SQL relative to 'now' go stale without any data change, so they are not cached
+        if pager.exhausted and not re.search(r"'now'|random\s*\(", sql, re.I):
+            self.result_cache.put(state["query"], version, rows, pager.columns)
+        return {"result": rows, "columns": pager.columns, "result_cache_hit": False, "executed_query": sql,
+                "truncated": pager.truncated, "pager": None if pager.done else pager}
+
+    def _run_page(self, sql: str) -> dict:
+        # A later page of a ResultPager: its own connection and budget, returned as soon as it is read.
+        # Stopped by its budget it reports like execute_query does, instead of raising into the UI callback
+        conn = self.pool.checkout(timeout=30)
+        guard = self.engine.guard(conn)
+        try:
+            with guard:
+                return {"result": conn.execute(sql).fetchall()}
+        except self.engine.errors:
+            if guard.reason is None:
+                raise
+            return self._aborted(guard.reason)
+        finally:
+            self.pool.release(conn)
+
+    def _aborted(self, reason: str) -> dict:
+        # Structured result for a query stopped by its budget ("timeout"/"steps") or by cancel()
+        self.metrics.incr("query_cancellations" if reason == "cancelled" else "query_timeouts")
+        return {"result": [], "columns": [], "result_cache_hit": False, "truncated": False, "pager": None,
+                "timed_out": reason != "cancelled", "cancelled": reason == "cancelled"}
+
+    def cancel(self, run_id: str):
+        """Cancels the query running (or about to run) for `run_id`; safe to call from any thread."""
+        with self._running_lock:
+            guard = self._running.get(run_id)
+            if guard is None:
+                self._cancelled.add(run_id)
+                return
+        guard.cancel()
 
     # Step 3: Answer generation from SQL result
-    def generate_answer(state: State):
+    def generate_answer(self, state: State, config: RunnableConfig = None):
+        if state.get("cancelled"):
+            return {"answer": "The query was cancelled."}
+        if state.get("timed_out"):
+            return {"answer": "That query was taking too long and was stopped. Try narrowing it down, for example to a shorter time range."}
         prompt = (
             "You are a log analysis assistant.\n\n"
             "Given the following user question, SQL query, and result, explain the outcome, only the outcome not any others.You should striclty just explain the summary of the result only:\n\n"
@@ -161,35 +316,81 @@ def run_sql_llm(question:str)-> dict:
         )
         print(len(prompt))
         if len(prompt) < 800:
-            response = llm.invoke(prompt)
+            # config carries the graph's callbacks, so stream() sees the answer token by token
+            response = self.llm.invoke(prompt, config=config)
             return {"answer": response.content}
         else:
              return {"answer":"The data is shown below"}
 
-    # Build LangGraph workflow
-    graph_builder = StateGraph(State).add_sequence(
-        [write_query, execute_query, generate_answer]
-    )
-    graph_builder.add_edge(START, "write_query")
-    graph = graph_builder.compile()
-
-    # 🧪 Example question to test it
-    # for step in graph.stream(
-    #     {"question": "Which services had the highest average latency during failed requests?"}, stream_mode="updates"
-    # ):
-    #     print(step)
+    def ask(self, question: str, run_id: str = None) -> dict:
+        # 🧪 Example question to test it
+        # for step in self.graph.stream(
+        #     {"question": "Which services had the highest average latency during failed requests?"}, stream_mode="updates"
+        # ):
+        #     print(step)
+        try:
+            return self.graph.invoke({"question": question, "run_id": run_id})
+        finally:
+            with self._running_lock:
+                self._cancelled.discard(run_id)
+
+    def stream(self, question: str, run_id: str = None, written: dict = None):
+        """
+        Runs the same graph as ask(), yielding as it goes:
+            (node, state)     after each step ("write_query", "execute_query", "generate_answer"),
+                              state being everything so far, so the result table can be shown as
+                              soon as execute_query is done
+            ("token", text)   each piece of the answer while generate_answer's LLM call streams it
+        The last event is ("generate_answer", final state), the same dict ask() returns.
+        `written` is a write_query() result obtained beforehand; the graph then starts from its SQL.
+        """
+        state = {"question": question, "run_id": run_id, **(written or {})}
+        try:
+            for mode, chunk in self.graph.stream(state, stream_mode=["updates", "messages"]):
+                if mode == "messages":
+                    token, metadata = chunk
+                    # write_query's structured output streams too; only the answer is meant for the user
+                    if metadata.get("langgraph_node") == "generate_answer" and token.content:
+                        yield "token", token.content
+                    continue
+                for node, update in chunk.items():
+                    state.update(update or {})
+                    yield node, dict(state)
+        finally:
+            with self._running_lock:
+                self._cancelled.discard(run_id)
+
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def get_pipeline() -> SQLPipeline:
+    """Returns the process-wide SQLPipeline, building it on first use."""
+    global _pipeline
+    if _pipeline is None:
+        with _pipeline_lock:
+            if _pipeline is None:
+                _pipeline = SQLPipeline()
+    return _pipeline
+
+
+def run_sql_llm(question:str, run_id:str=None)-> dict:
+    """
+    Answers a log question with the shared SQL LLM pipeline (see SQLPipeline).
+    has question,query,result,columns,answer as the state variables.
+    Pass a run_id to be able to stop the query with get_pipeline().cancel(run_id).
+    """
+    return get_pipeline().ask(question, run_id)
 
 
-    final_state = graph.invoke({"question": question})
-    return final_state
+def stream_sql_llm(question:str, run_id:str=None):
+    """Streaming run_sql_llm: yields the events of SQLPipeline.stream()."""
+    return get_pipeline().stream(question, run_id)
 
 
 def general_answers(question:str,mode="normal")->str:
-     # Set environment variables
-    os.environ["LANGSMITH_API_KEY"] = os.environ.get("LANGSMITH_API_KEY", "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")
-    os.environ["LANGSMITH_TRACING"] = "false"
-    os.environ["GROQ_API_KEY"] = os.environ.get("GROQ_API_KEY", "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")
-    llm = init_chat_model("gemma2-9b-it", model_provider="groq")
+    llm = get_llm()
     prompt = ""
     if mode=="error":
         prompt = f"""
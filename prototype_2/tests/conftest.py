@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The app imports its modules as `utilities.*` from prototype_2/, the directory it is run from
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,16 @@
+from utilities.create_logs_db import create_indexes, create_tables
+import sqlite3
+
+
+def test_migration_removes_duplicate_request_ids(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "logs.db"))
+    # The pre-index layout, loaded twice by the old loader
+    conn.execute("CREATE TABLE vpc_logs (timestamp TEXT, src_ip TEXT, dst_ip TEXT, action TEXT, bytes_sent INTEGER, request_id TEXT)")
+    rows = [("2025-04-13T10:00:00", "10.0.0.1", "10.0.0.2", "ACCEPT", i, f"req-{i}") for i in range(3)]
+    rows.append(("2025-04-13T10:00:00", "10.0.0.1", "10.0.0.2", "ACCEPT", 9, None))
+    conn.executemany("INSERT INTO vpc_logs VALUES (?, ?, ?, ?, ?, ?)", rows + rows)
+    create_tables(conn)
+    assert create_indexes(conn) == {"vpc_logs": 3}
+    assert conn.execute("SELECT COUNT(*) FROM vpc_logs").fetchone()[0] == 5  # rows without request_id are kept
+    assert create_indexes(conn) == {}
+    conn.close()
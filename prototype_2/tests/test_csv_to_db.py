@@ -0,0 +1,59 @@
+from utilities.create_logs_db import TABLES, create_indexes, create_tables
+from utilities import csv_to_db
+from utilities.csv_to_db import load_csv
+from utilities.partitions import create_catalog, rebuild_view
+from utilities.rollups import create_rollups
+import sqlite3
+import pytest
+
+
+CSV = (
+    "timestamp,request_id,src_ip,dst_ip,action,bytes_sent\n"
+    "2025-04-13T10:00:00,req-1,10.0.0.1,10.0.0.2,ACCEPT,10\n"
+    "2025-04-13T11:00:00,req-2,10.0.0.1,10.0.0.2,REJECT,20\n"
+)
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "vpc_logs.csv"
+    path.write_text(CSV)
+    return str(path)
+
+
+def test_counts_loaded_rows_not_rollup_changes(csv_path):
+    conn = sqlite3.connect(":memory:", isolation_level=None)
+    create_tables(conn)
+    create_indexes(conn, secondary=False)
+    create_rollups(conn)
+    assert load_csv(conn, csv_path) == 2
+    assert load_csv(conn, csv_path) == 0  # same request_ids: skipped
+
+
+def test_counts_loaded_rows_not_partition_catalog(csv_path):
+    conn = sqlite3.connect(":memory:", isolation_level=None)
+    create_catalog(conn, "hour")
+    for log_type in TABLES:
+        rebuild_view(conn, log_type)
+    assert load_csv(conn, csv_path) == 2
+    assert conn.execute("SELECT COUNT(*) FROM vpc_logs").fetchone()[0] == 2
+
+
+def test_indexes_are_only_rebuilt_for_empty_tables_or_on_request(csv_path, tmp_path, monkeypatch):
+    dropped = []
+    monkeypatch.setattr(csv_to_db, "drop_secondary_indexes", lambda conn, tables: dropped.append(tables))
+    db = str(tmp_path / "logs.db")
+    csv_to_db.main(["--db", db, csv_path])
+    csv_to_db.main(["--db", db, csv_path])
+    csv_to_db.main(["--db", db, "--rebuild-indexes", csv_path])
+    assert dropped == [["vpc_logs"], [], ["vpc_logs"]]
+
+
+def test_empty_fields_load_as_null(tmp_path):
+    path = tmp_path / "vpc_logs.csv"
+    path.write_text(CSV + "2025-04-13T12:00:00,req-3,10.0.0.1,,ACCEPT,\n")
+    conn = sqlite3.connect(":memory:", isolation_level=None)
+    create_tables(conn)
+    load_csv(conn, str(path))
+    assert conn.execute("SELECT dst_ip, bytes_sent FROM vpc_logs WHERE request_id = 'req-3'").fetchone() == (None, None)
+    assert conn.execute("SELECT COUNT(bytes_sent) FROM vpc_logs").fetchone()[0] == 2
@@ -0,0 +1,39 @@
+from utilities.embedding_bank import EmbeddingBank
+import numpy as np
+import pytest
+
+
+def _encoder(calls):
+    def encode(texts):
+        calls.append(list(texts))
+        vectors = np.array([[len(t), 1.0] for t in texts], dtype=np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    return encode
+
+
+def test_seed_is_encoded_on_first_use_not_in_the_constructor(tmp_path):
+    calls = []
+    bank = EmbeddingBank("examples", _encoder(calls), "model", ["a", "bb"], root=str(tmp_path))
+    assert calls == []
+    assert bank.top_k(np.array([1.0, 0.0]), 1)[0][0] == "bb"
+    assert calls == [["a", "bb"]]
+    # Another process (or a restart) maps the stored seed instead of encoding it again
+    again = EmbeddingBank("examples", _encoder(calls), "model", ["a", "bb"], root=str(tmp_path))
+    assert len(again) == 2
+    assert calls == [["a", "bb"]]
+
+
+def test_seed_is_retried_after_a_failed_encode(tmp_path):
+    calls, ready = [], []
+    encode = _encoder(calls)
+
+    def flaky(texts):
+        if not ready:
+            raise RuntimeError("encoder not loaded")
+        return encode(texts)
+
+    bank = EmbeddingBank("examples", flaky, "model", ["a"], root=str(tmp_path))
+    with pytest.raises(RuntimeError):
+        bank.refresh()
+    ready.append(True)
+    assert bank.texts() == ["a"]
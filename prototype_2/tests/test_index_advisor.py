@@ -0,0 +1,50 @@
+from utilities.index_advisor import IndexAdvisor
+import sqlite3
+import pytest
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "logs.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE execution_logs (request_id TEXT, function_name TEXT, status TEXT)")
+    conn.executemany("INSERT INTO execution_logs VALUES (?, ?, ?)",
+                     [(f"req-{i}", f"fn_{i % 7}", "FAILED" if i % 5 else "SUCCESS") for i in range(100)])
+    conn.commit()
+    conn.close()
+    return path
+
+
+def _schema_version(conn):
+    return conn.execute("PRAGMA schema_version").fetchone()[0]
+
+
+def _indexes(path):
+    conn = sqlite3.connect(path)
+    try:
+        return [r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")]
+    finally:
+        conn.close()
+
+
+def test_auto_create_runs_in_the_background(db_path):
+    advisor = IndexAdvisor(db_path, auto_create=True, min_occurrences=2)
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    sql = "SELECT function_name FROM execution_logs WHERE status = 'FAILED'"
+    advisor.observe(conn, sql, _schema_version(conn))
+    assert advisor._worker is None
+    proposals = advisor.observe(conn, sql, _schema_version(conn))
+    advisor.wait()
+    assert proposals[0]["created"]
+    assert "ix_auto_execution_logs_status" in _indexes(db_path)
+    conn.close()
+
+
+def test_columns_follow_schema_version(db_path):
+    advisor = IndexAdvisor(db_path)
+    conn = sqlite3.connect(db_path)
+    advisor.observe(conn, "SELECT * FROM execution_logs WHERE status = 'FAILED'", _schema_version(conn))
+    conn.execute("ALTER TABLE execution_logs ADD COLUMN duration_ms INTEGER")
+    proposals = advisor.observe(conn, "SELECT * FROM execution_logs WHERE duration_ms > 500", _schema_version(conn))
+    assert [p["columns"] for p in proposals] == [["duration_ms"]]
+    conn.close()
@@ -0,0 +1,36 @@
+import pytest
+
+pytest.importorskip("langchain")
+
+from utilities import is_relevant
+import os
+import subprocess
+import sys
+import threading
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLASSIFY = "labels, _ = is_relevant.classify_log_queries(['which ips were rejected?', 'write a poem'])\nprint(list(labels))\n"
+
+
+def test_nested_loads_do_not_deadlock(monkeypatch):
+    monkeypatch.setattr(is_relevant, "_loaded", {})
+    result = []
+    build = lambda: is_relevant._load("inner", lambda: 1) + 1
+    thread = threading.Thread(target=lambda: result.append(is_relevant._load("outer", build)), daemon=True)
+    thread.start()
+    thread.join(10)
+    assert result == [2]
+
+
+@pytest.mark.parametrize("first", ["is_relevant.warm_up(background=False)\n", ""])
+def test_cold_process_classifies(first, tmp_path):
+    # A fresh process with no embeddings on disk: building a bank encodes its seed examples
+    pytest.importorskip("sentence_transformers")
+    done = subprocess.run(
+        [sys.executable, "-c", "from utilities import is_relevant\n" + first + CLASSIFY],
+        cwd=ROOT, env={**os.environ, "LOGBOT_EMBEDDING_DIR": str(tmp_path)},
+        capture_output=True, text=True, timeout=300,
+    )
+    assert done.returncode == 0, done.stderr
+    assert done.stdout.strip() == "[True, False]"
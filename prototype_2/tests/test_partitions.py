@@ -0,0 +1,43 @@
+from utilities.create_logs_db import TABLES
+from utilities.partitions import PartitionPruner, create_catalog, insert_partitioned, rebuild_view
+from utilities.time_rewrite import rewrite_time_predicates
+import sqlite3
+import pytest
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    create_catalog(conn, "hour")
+    for log_type in TABLES:
+        rebuild_view(conn, log_type)
+    columns = ["timestamp", "src_ip", "dst_ip", "action", "bytes_sent", "request_id"]
+    rows = [(f"2025-04-{13 + i // 1440:02d}T{i // 60 % 24:02d}:{i % 60:02d}:00", "10.0.0.1", "10.0.0.2",
+             "ACCEPT" if i % 3 else "REJECT", i, f"req-{i}") for i in range(2000)]
+    insert_partitioned(conn, "vpc_logs", columns, rows)
+    yield conn
+    conn.close()
+
+
+def _both(conn, sql):
+    rewritten = rewrite_time_predicates(sql)
+    pruned = PartitionPruner().prune(conn, rewritten, 0)
+    return conn.execute(sql).fetchall(), conn.execute(pruned).fetchall(), pruned
+
+
+def test_where_bounds_prune_shards(conn):
+    plain, pruned, sql = _both(conn, "SELECT COUNT(*) FROM vpc_logs WHERE timestamp >= '2025-04-13T13:00:00'")
+    assert sql.startswith("WITH vpc_logs AS")
+    assert plain == pruned
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT COUNT(*), SUM(timestamp >= '2025-04-13T13:00:00') FROM vpc_logs",
+    "SELECT COUNT(*), MAX(timestamp >= '2025-04-14T00:00:00') FROM vpc_logs",
+    "SELECT COUNT(*), SUM(timestamp >= '2025-04-13T13:00:00') FROM vpc_logs WHERE action = 'ACCEPT'",
+    "SELECT action, COUNT(*) FROM vpc_logs GROUP BY action HAVING MAX(timestamp) >= '2025-04-14T00:00:00'",
+])
+def test_select_list_comparisons_do_not_prune(conn, sql):
+    plain, pruned, executed = _both(conn, sql)
+    assert not executed.startswith("WITH vpc_logs AS")
+    assert plain == pruned
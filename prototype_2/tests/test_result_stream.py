@@ -0,0 +1,63 @@
+from utilities.result_stream import ResultPager, page_sql
+import sqlite3
+import pytest
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE t (x INTEGER, y INTEGER)")
+    conn.executemany("INSERT INTO t VALUES (?, ?)", [(i, i % 7) for i in range(23)])
+    yield conn
+    conn.close()
+
+
+def _all_pages(conn, sql, run_page=True, **kwargs):
+    def run(page):
+        return {"result": conn.execute(page).fetchall()}
+    pager = ResultPager(conn.execute(sql), sql, run_page=run if run_page else None, page_size=5, **kwargs)
+    rows = []
+    while not pager.done:
+        rows.extend(pager.fetch_page())
+    return rows, pager
+
+
+def test_page_sql_carries_the_statements_own_order_and_limit():
+    assert page_sql("SELECT x FROM t", 5, 0) is None
+    assert page_sql("SELECT x FROM t ORDER BY x; -- highest first", 5, 10) == "SELECT x FROM t ORDER BY x\nLIMIT 5 OFFSET 10"
+    assert page_sql("SELECT x FROM t ORDER BY x LIMIT 12 OFFSET 3", 5, 10) == "SELECT x FROM t ORDER BY x LIMIT 2 OFFSET 13"
+    assert page_sql("SELECT x FROM t ORDER BY x LIMIT 3, 12", 5, 10) == "SELECT x FROM t ORDER BY x LIMIT 2 OFFSET 13"
+    assert page_sql("SELECT x FROM t ORDER BY x LIMIT (SELECT 3)", 5, 10) is None
+    assert page_sql("SELECT x FROM (SELECT x FROM t ORDER BY x LIMIT 3)", 5, 0) is None
+
+
+@pytest.mark.parametrize("sql, expected", [
+    ("SELECT x FROM t ORDER BY y, x -- by remainder", sorted(range(23), key=lambda i: (i % 7, i))),
+    ("SELECT x FROM t ORDER BY x DESC LIMIT 12", list(range(22, 10, -1))),
+    ("SELECT x FROM t WHERE x % 2 = 0", list(range(0, 23, 2))),
+])
+def test_pages_neither_overlap_nor_skip(conn, sql, expected):
+    rows, pager = _all_pages(conn, sql)
+    assert [r[0] for r in rows] == expected
+    assert pager.exhausted
+
+
+def test_unordered_result_is_read_up_front_within_the_caps(conn):
+    rows, pager = _all_pages(conn, "SELECT x FROM t", max_rows=12)
+    assert len(rows) == 12
+    assert pager.truncated
+
+
+def test_timed_out_page_is_reported_not_raised(conn):
+    sql = "SELECT x FROM t ORDER BY x"
+    pager = ResultPager(conn.execute(sql), sql, run_page=lambda page: {"result": [], "timed_out": True}, page_size=5)
+    assert len(pager.fetch_page()) == 5
+    assert pager.fetch_page() == []
+    assert pager.timed_out and pager.done
+
+
+def test_hidden_columns_are_left_out(conn):
+    sql = "SELECT * FROM t ORDER BY x"
+    pager = ResultPager(conn.execute(sql), sql, page_size=3, hidden={"y"})
+    assert pager.columns == ["x"]
+    assert pager.fetch_page() == [(0,), (1,), (2,)]
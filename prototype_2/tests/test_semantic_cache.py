@@ -0,0 +1,49 @@
+import pytest
+
+pytest.importorskip("langchain")
+
+from utilities.semantic_cache import SemanticSQLCache
+import numpy as np
+
+
+def _near(text: str) -> np.ndarray:
+    # Every question lands on (almost) the same vector, so only the constraint check tells them apart
+    vector = np.array([1.0, 1e-3 * len(text)], dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = SemanticSQLCache(str(tmp_path / "cache.db"))
+    monkeypatch.setattr(cache, "_encode", _near)
+    return cache
+
+
+def test_top_5_does_not_hit_cached_top_10(cache):
+    cache.store("top 10 source ips by bytes sent", "SELECT src_ip FROM vpc_logs ORDER BY bytes_sent DESC LIMIT 10;")
+    assert cache.lookup("top 5 source ips by bytes sent") is None
+    assert cache.lookup("Top 10 source IPs by bytes sent") is not None
+
+
+def test_negation_and_literals_must_match(cache):
+    cache.store("which functions failed on '/api/data'?", "SELECT 1;")
+    assert cache.lookup("which functions did not fail on '/api/data'?") is None
+    assert cache.lookup("which functions failed on '/api/login'?") is None
+    assert cache.lookup("which functions have failed on '/api/data'?")[0] == "SELECT 1;"
+
+
+@pytest.mark.parametrize("cached, asked", [
+    ("accepted requests today", "rejected requests yesterday"),
+    ("failed executions last month", "successful executions last month"),
+    ("denied connections this week", "allowed connections this week"),
+    ("bytes sent in april", "bytes sent in may"),
+    ("logins on monday", "logins on friday"),
+])
+def test_time_windows_and_opposite_values_must_match(cache, cached, asked):
+    cache.store(cached, "SELECT 1;")
+    assert cache.lookup(asked) is None
+
+
+def test_spellings_of_the_same_value_still_hit(cache):
+    cache.store("rejected requests yesterday", "SELECT 1;")
+    assert cache.lookup("requests that were rejected yesterday")[0] == "SELECT 1;"
@@ -0,0 +1,85 @@
+from utilities.partitions import create_catalog, rebuild_view
+from utilities.tail_ingest import TailIngester
+from utilities.create_logs_db import TABLES
+import json
+import os
+import sqlite3
+import pytest
+
+
+@pytest.fixture
+def ingester():
+    conn = sqlite3.connect(":memory:", isolation_level=None)
+    yield TailIngester(conn)
+    conn.close()
+
+
+def _count(ingester, table):
+    return ingester.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def test_malformed_json_line_is_skipped(ingester, tmp_path):
+    path = tmp_path / "access_logs.jsonl"
+    path.write_text(
+        '{"timestamp": "2025-04-13T10:00:00", "request_id": "req-1", "user_id": "u1"}\n'
+        '{"timestamp": "2025-04-13T10:00:01", "request_id": \n'
+        '["not", "an", "object"]\n'
+        '{"timestamp": "2025-04-13T10:00:02", "request_id": "req-2", "user_id": "u2"}\n'
+        '{"timestamp": "2025-04-13T10:00:03", "requ'
+    )
+    assert ingester.poll_file(str(path)) == 2
+    assert ingester.skipped == 2
+    # The half-written last line is held back until its newline arrives
+    with open(path, "a") as f:
+        f.write('est_id": "req-3", "user_id": "u3"}\n')
+    assert ingester.poll_file(str(path)) == 1
+    assert ingester.skipped == 2
+
+
+def test_records_without_request_id_are_all_kept(ingester):
+    records = [{"timestamp": f"2025-04-13T10:00:0{i}", "user_id": f"u{i}"} for i in range(3)]
+    records.append({"timestamp": "2025-04-13T10:00:09", "request_id": "req-1", "user_id": "u9"})
+    records.append({"timestamp": "2025-04-13T10:00:09", "request_id": "req-1", "user_id": "u9"})
+    assert len(ingester.insert_records("access_logs", records)) == 4
+    assert _count(ingester, "access_logs") == 4
+
+
+def _line(i, **fields):
+    return json.dumps({"timestamp": f"2025-04-13T10:00:{i:02d}", "request_id": f"req-{i}", "user_id": f"u{i}", **fields}) + "\n"
+
+
+def test_rejected_record_does_not_stall_the_file(ingester, tmp_path):
+    path = tmp_path / "access_logs.jsonl"
+    path.write_text(_line(1) + _line(2, user_id={"nested": True}) + _line(3, endpoint=["/a", "/b"]) + _line(4))
+    assert ingester.poll_file(str(path)) == 2
+    assert ingester.rejected == 2
+    with open(path, "a") as f:
+        f.write(_line(5))
+    # The checkpoint moved past the rejected lines: only the new one is read
+    assert ingester.poll_file(str(path)) == 1
+    assert ingester.rejected == 2
+
+
+def test_record_without_timestamp_is_rejected_when_partitioned(tmp_path):
+    conn = sqlite3.connect(":memory:", isolation_level=None)
+    create_catalog(conn, "hour")
+    for log_type in TABLES:
+        rebuild_view(conn, log_type)
+    ingester = TailIngester(conn)
+    path = tmp_path / "access_logs.jsonl"
+    path.write_text(_line(1) + json.dumps({"request_id": "req-2"}) + "\n" + _line(3, timestamp="yesterday"))
+    assert ingester.poll_file(str(path)) == 1
+    assert ingester.rejected == 2
+
+
+def test_rotation_drains_the_old_file_first(ingester, tmp_path):
+    path = tmp_path / "access_logs.jsonl"
+    path.write_text(_line(1))
+    assert ingester.poll_file(str(path)) == 1
+    with open(path, "a") as f:
+        f.write(_line(2) + _line(3).rstrip("\n"))  # the writer's last line, never terminated
+    os.rename(path, tmp_path / "access_logs.jsonl.1")
+    path.write_text(_line(4))
+    assert ingester.poll_file(str(path)) == 3
+    assert _count(ingester, "access_logs") == 4
+    assert ingester.poll_file(str(path)) == 0
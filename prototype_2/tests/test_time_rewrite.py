@@ -0,0 +1,41 @@
+from utilities.create_logs_db import create_tables
+from utilities.time_rewrite import rewrite_time_predicates
+import sqlite3
+import pytest
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    create_tables(conn)
+    conn.executemany(
+        "INSERT INTO vpc_logs(timestamp, src_ip, dst_ip, action, bytes_sent, request_id) VALUES (?, ?, ?, ?, ?, ?)",
+        [(f"2025-04-13T{h:02d}:00:00", "10.0.0.1", "10.0.0.2", "ACCEPT" if h % 2 else "REJECT", 100 * h, f"req-{h}")
+         for h in range(24)],
+    )
+    yield conn
+    conn.close()
+
+
+def test_base_table_predicate_is_rewritten(conn):
+    sql = "SELECT COUNT(*) FROM vpc_logs v WHERE v.timestamp >= '2025-04-13T12:00:00'"
+    rewritten = rewrite_time_predicates(sql)
+    assert "v.ts_epoch" in rewritten
+    assert conn.execute(rewritten).fetchall() == conn.execute(sql).fetchall() == [(12,)]
+
+
+@pytest.mark.parametrize("sql", [
+    "WITH recent AS (SELECT timestamp, action FROM vpc_logs) "
+    "SELECT COUNT(*) FROM recent WHERE timestamp >= '2025-04-13T12:00:00'",
+    "SELECT t.timestamp FROM (SELECT timestamp FROM vpc_logs) t WHERE t.timestamp > '2025-04-13T20:00:00'",
+])
+def test_derived_tables_are_left_alone(conn, sql):
+    assert rewrite_time_predicates(sql) == sql
+    conn.execute(sql).fetchall()
+
+
+def test_qualifier_of_unknown_table_is_left_alone():
+    sql = "SELECT * FROM vpc_logs v JOIN other o USING (request_id) WHERE o.timestamp > '2025-04-13T12:00:00'"
+    assert rewrite_time_predicates(sql) == sql
+    sql = "SELECT * FROM other WHERE timestamp > '2025-04-13T12:00:00'"
+    assert rewrite_time_predicates(sql) == sql
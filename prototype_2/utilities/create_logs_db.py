@@ -1,53 +1,155 @@
+import re
 import sqlite3
+import sys
 
-conn = sqlite3.connect('logs.db')
-cursor = conn.cursor()
 
-#VPC Logs Table
-cursor.execute("""
+# Integer epoch seconds (UTC) derived from the ISO timestamp TEXT. It is a generated column, so every
+# loader (csv_to_db, tail_ingest, pandas to_sql...) gets it for free, and it is what time-range
+# predicates are rewritten onto (utilities/time_rewrite.py) so they become index range scans.
+EPOCH_EXPR = "CAST(strftime('%s', timestamp) AS INTEGER)"
+# Index helpers that are not log data: kept out of the prompt's schema and out of SELECT * results
+HIDDEN_COLUMNS = {"ts_epoch"}
+
+TABLES = {
+    #VPC Logs Table
+    "vpc_logs": """
 CREATE TABLE IF NOT EXISTS vpc_logs (
     timestamp TEXT,
     src_ip TEXT,
     dst_ip TEXT,
     action TEXT,
     bytes_sent INTEGER,
-    request_id TEXT
+    request_id TEXT,
+    ts_epoch INTEGER GENERATED ALWAYS AS (CAST(strftime('%s', timestamp) AS INTEGER)) STORED
 );
-""")
-
-
-
-# Access Logs Table
-cursor.execute("""
+""",
+    # Access Logs Table
+    "access_logs": """
 CREATE TABLE IF NOT EXISTS access_logs (
     timestamp TEXT,
     user_id TEXT,
     endpoint TEXT,
     method TEXT,
     status_code INTEGER,
-    request_id TEXT
+    request_id TEXT,
+    ts_epoch INTEGER GENERATED ALWAYS AS (CAST(strftime('%s', timestamp) AS INTEGER)) STORED
 );
-""")
-
-# Execution Logs Table
-cursor.execute("""
+""",
+    # Execution Logs Table
+    "execution_logs": """
 CREATE TABLE IF NOT EXISTS execution_logs (
     timestamp TEXT,
     function_name TEXT,
     duration_ms INTEGER,
     status TEXT,
-    request_id TEXT
+    request_id TEXT,
+    ts_epoch INTEGER GENERATED ALWAYS AS (CAST(strftime('%s', timestamp) AS INTEGER)) STORED
 );
-""")
+""",
+}
+
+# request_id is the join key of every multi-table question (JOIN ... USING (request_id)) and is unique
+# per table, so it gets a UNIQUE index. The rest cover the common filters (timestamp ranges, action,
+# endpoint, status) and carry the columns those questions usually aggregate so they stay index-only.
+UNIQUE_INDEXES = [
+    "CREATE UNIQUE INDEX IF NOT EXISTS ux_vpc_logs_request_id ON vpc_logs(request_id);",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ux_access_logs_request_id ON access_logs(request_id);",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ux_execution_logs_request_id ON execution_logs(request_id);",
+]
+SECONDARY_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_vpc_logs_timestamp ON vpc_logs(timestamp);",
+    "CREATE INDEX IF NOT EXISTS ix_vpc_logs_ts_epoch ON vpc_logs(ts_epoch);",
+    "CREATE INDEX IF NOT EXISTS ix_vpc_logs_action ON vpc_logs(action, ts_epoch, src_ip, bytes_sent);",
+    "CREATE INDEX IF NOT EXISTS ix_access_logs_timestamp ON access_logs(timestamp);",
+    "CREATE INDEX IF NOT EXISTS ix_access_logs_ts_epoch ON access_logs(ts_epoch);",
+    "CREATE INDEX IF NOT EXISTS ix_access_logs_endpoint ON access_logs(endpoint, ts_epoch, status_code, user_id);",
+    "CREATE INDEX IF NOT EXISTS ix_access_logs_status_code ON access_logs(status_code, ts_epoch);",
+    "CREATE INDEX IF NOT EXISTS ix_execution_logs_timestamp ON execution_logs(timestamp);",
+    "CREATE INDEX IF NOT EXISTS ix_execution_logs_ts_epoch ON execution_logs(ts_epoch);",
+    "CREATE INDEX IF NOT EXISTS ix_execution_logs_status ON execution_logs(status, function_name, duration_ms);",
+    "CREATE INDEX IF NOT EXISTS ix_execution_logs_function_name ON execution_logs(function_name, status, duration_ms);",
+]
+
+
+# Bookkeeping and derived tables that are not log sources and never go into the LLM prompt
+INTERNAL_TABLE = re.compile(r"^(sqlite_.*|ingest_checkpoints|log_partition.*|rollup_.*|.*_p\d{8}(\d{2})?|.*_pu\d+)$")
+
+
+def is_internal_table(name: str) -> bool:
+    return bool(INTERNAL_TABLE.match(name))
+
+
+def _views(conn: sqlite3.Connection) -> set:
+    return {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'view'")}
+
+
+def create_tables(conn: sqlite3.Connection):
+    cursor = conn.cursor()
+    for ddl in TABLES.values():
+        cursor.execute(ddl)
+    add_epoch_columns(conn)
+
+
+def add_epoch_columns(conn: sqlite3.Connection):
+    # Tables created before ts_epoch existed get it as a VIRTUAL column (ALTER TABLE cannot add STORED
+    # ones); its index still stores the computed values, so range scans cost the same.
+    cursor = conn.cursor()
+    for table in set(TABLES) - _views(conn):
+        columns = [r[1] for r in cursor.execute(f"PRAGMA table_xinfo({table})")]
+        if "ts_epoch" not in columns:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN ts_epoch INTEGER GENERATED ALWAYS AS ({EPOCH_EXPR}) VIRTUAL;")
+
+
+def dedupe_request_ids(conn: sqlite3.Connection, table: str) -> int:
+    """Deletes all but the first-loaded row of every repeated request_id. Returns the rows deleted."""
+    return conn.execute(
+        f"DELETE FROM {table} WHERE request_id IS NOT NULL AND rowid NOT IN "
+        f"(SELECT MIN(rowid) FROM {table} WHERE request_id IS NOT NULL GROUP BY request_id)"
+    ).rowcount
+
+
+def create_indexes(conn: sqlite3.Connection, unique: bool = True, secondary: bool = True) -> dict:
+    """Creates the missing indexes. Returns {table: duplicate rows deleted to make request_id unique}."""
+    cursor = conn.cursor()
+    # In the partitioned layout (utilities/partitions.py) the log tables are views; shards carry the indexes
+    views = _views(conn)
+    indexes = {r[0] for r in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    deduped = {}
+    for ddl in (UNIQUE_INDEXES if unique else []) + (SECONDARY_INDEXES if secondary else []):
+        name, on = ddl.split(" IF NOT EXISTS ")[1].split(" ON ")
+        table = on.split("(")[0]
+        if table in views:
+            continue
+        if ddl in UNIQUE_INDEXES and name not in indexes:
+            # Loaders before the unique index re-inserted rows on every re-run; CREATE UNIQUE INDEX fails on those
+            removed = dedupe_request_ids(conn, table)
+            if removed:
+                deduped[table] = removed
+        cursor.execute(ddl)
+    # Give the planner real statistics for the new indexes
+    cursor.execute("ANALYZE;")
+    return deduped
 
 
-# Commit and close
-conn.commit()
-conn.close()
+def drop_secondary_indexes(conn: sqlite3.Connection, tables=None):
+    cursor = conn.cursor()
+    for ddl in SECONDARY_INDEXES:
+        name, on = ddl.split(" IF NOT EXISTS ")[1].split(" ON ")
+        if tables is None or on.split("(")[0] in tables:
+            cursor.execute(f"DROP INDEX IF EXISTS {name};")
 
 
+if __name__ == "__main__":
+    # Also migrates an existing DB in place: python utilities/create_logs_db.py logs2.db
+    conn = sqlite3.connect(sys.argv[1] if len(sys.argv) > 1 else 'logs.db')
+    create_tables(conn)
+    for table, removed in create_indexes(conn).items():
+        print(f"{table}: removed {removed} rows with a duplicate request_id")
 
-print("Database setup complete.")
+    # Commit and close
+    conn.commit()
+    conn.close()
 
 
 
+    print("Database setup complete.")
@@ -1,21 +1,143 @@
+"""
+Bulk loader for the vpc/access/execution CSV exports.
+
+    python -m utilities.csv_to_db --db logs2.db CSVs/vpc_logs.csv CSVs/access_logs.csv CSVs/execution_logs.csv
+
+CSVs are streamed in bounded chunks (never read whole) and inserted with executemany inside large
+transactions under ingest-time PRAGMAs. Secondary indexes stay in place for appends; they are dropped
+for the load and rebuilt afterwards only for tables that start out empty, or for all loaded tables with
+--rebuild-indexes (worth it when the load dwarfs what is already there). Each file is mapped to a table by its name prefix (vpc_logs-2025-04-13.csv -> vpc_logs).
+Rollup tables (utilities/rollups.py), when present, are refreshed before every commit.
+"""
+from utilities.create_logs_db import TABLES, create_tables, create_indexes, drop_secondary_indexes
+from utilities.partitions import is_partitioned, insert_partitioned
+from utilities.rollups import refresh_rollups
+import argparse
 import csv
-import sqlite3
-import pandas as pd
+import glob
 import os
-import sys
+import sqlite3
+import time
+
+
+CHUNK_ROWS = 50_000
+COMMIT_ROWS = 1_000_000
+
+
+def ingest_pragmas(conn: sqlite3.Connection):
+    conn.execute("PRAGMA journal_mode=WAL")
+    # Nothing is fsynced during the load: a crash of this process only loses the open transaction, but
+    # an OS crash or power loss mid-load can corrupt the DB file (reload it from the CSVs then).
+    # main() makes the result durable with a checkpoint under synchronous=NORMAL once the load is done.
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("PRAGMA cache_size=-262144")  # 256 MiB
+    conn.execute("PRAGMA temp_store=MEMORY")
+
+
+def table_for(path: str) -> str:
+    name = os.path.basename(path).lower()
+    for table in TABLES:
+        if name.startswith(table):
+            return table
+    raise ValueError(f"{path}: file name does not start with one of {', '.join(TABLES)}")
+
+
+def read_chunks(path: str, chunk_rows: int = CHUNK_ROWS):
+    """Yields (header, rows) with at most chunk_rows rows at a time; empty fields are None (NULL), as pandas read them."""
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        chunk = []
+        for row in reader:
+            if row:
+                chunk.append([value if value != "" else None for value in row])
+            if len(chunk) >= chunk_rows:
+                yield header, chunk
+                chunk = []
+        if chunk:
+            yield header, chunk
+
+
+def is_empty(conn: sqlite3.Connection, table: str) -> bool:
+    return conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone() is None
+
+
+def load_csv(conn: sqlite3.Connection, path: str, table: str = None,
+             chunk_rows: int = CHUNK_ROWS, commit_rows: int = COMMIT_ROWS) -> int:
+    """Appends one CSV to its table; rows whose request_id is already loaded are skipped. Returns rows inserted."""
+    table = table or table_for(path)
+    table_columns = [r[1] for r in conn.execute(f"PRAGMA table_info({table})")]
+    partitioned = is_partitioned(conn)
+    pending = inserted = 0
+    conn.execute("BEGIN")
+    try:
+        for header, rows in read_chunks(path, chunk_rows):
+            unknown = [c for c in header if c not in table_columns]
+            if unknown:
+                raise ValueError(f"{path}: columns {unknown} are not in {table}")
+            # Counted from the log-table inserts alone: rollup refreshes and shard catalog rows are not loaded rows
+            if partitioned:
+                inserted += insert_partitioned(conn, table, header, rows)
+            else:
+                sql = f"INSERT OR IGNORE INTO {table} ({', '.join(header)}) VALUES ({', '.join('?' * len(header))})"
+                inserted += conn.executemany(sql, rows).rowcount
+            pending += len(rows)
+            if pending >= commit_rows:
+                refresh_rollups(conn, [table])
+                conn.execute("COMMIT")
+                conn.execute("BEGIN")
+                pending = 0
+        refresh_rollups(conn, [table])
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return inserted
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream CSV log exports into the logs DB.")
+    parser.add_argument("csvs", nargs="*", help="CSV files (default: CSVs/*.csv)")
+    parser.add_argument("--db", default="logs.db")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--commit-rows", type=int, default=COMMIT_ROWS)
+    parser.add_argument("--rebuild-indexes", action="store_true",
+                        help="drop secondary indexes during the load and rebuild them afterwards, even for "
+                             "tables that already hold rows (better for loads much larger than the table)")
+    args = parser.parse_args(argv)
+
+    paths = args.csvs or sorted(glob.glob(os.path.join("CSVs", "*.csv")))
+    conn = sqlite3.connect(args.db, isolation_level=None)
+    ingest_pragmas(conn)
+    create_tables(conn)
+    # request_id stays uniquely indexed during the load: it is what INSERT OR IGNORE dedupes on
+    create_indexes(conn, secondary=False)
+    tables = {table_for(path) for path in paths}
+    rebuilt = [t for t in sorted(tables) if args.rebuild_indexes or is_empty(conn, t)]
+    drop_secondary_indexes(conn, rebuilt)
 
+    started = time.perf_counter()
+    total = 0
+    for path in paths:
+        t0 = time.perf_counter()
+        rows = load_csv(conn, path, chunk_rows=args.chunk_rows, commit_rows=args.commit_rows)
+        elapsed = time.perf_counter() - t0
+        total += rows
+        print(f"{path}: {rows} rows in {elapsed:.1f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s)")
 
-conn = sqlite3.connect('logs.db')
+    t0 = time.perf_counter()
+    create_indexes(conn)
+    if rebuilt:
+        print(f"indexes of {', '.join(rebuilt)} rebuilt in {time.perf_counter() - t0:.1f}s")
+    # Back to durable writes, and fold the WAL into the DB file with an fsync before declaring success
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+    elapsed = time.perf_counter() - started
+    print(f"Data inserted into database successfully: {total} rows in {elapsed:.1f}s ({total / max(elapsed, 1e-9):,.0f} rows/s)")
 
-vpc_df = pd.read_csv("vpc_logs.csv")
-access_df = pd.read_csv("access_logs.csv")
-execution_df = pd.read_csv("execution_logs.csv")
 
-# Insert into respective tables
-vpc_df.to_sql('vpc_logs', conn, if_exists='append', index=False)
-access_df.to_sql('access_logs', conn, if_exists='append', index=False)
-execution_df.to_sql('execution_logs', conn, if_exists='append', index=False)
-conn.commit()   
-conn.close()
-print("Data inserted into database successfully.")
-# db_to_csv.py      
\ No newline at end of file
+if __name__ == "__main__":
+    main()
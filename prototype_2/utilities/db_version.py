@@ -0,0 +1,39 @@
+from utilities.create_logs_db import is_internal_table
+import hashlib
+import sqlite3
+import threading
+
+
+class DBVersion:
+    """
+    Reports (schema_version, data_version) for a SQLite file.
+    PRAGMA data_version only changes when *another* connection commits, so the probe keeps one
+    long-lived read-only connection of its own and never writes through it.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+
+    def current(self) -> tuple:
+        with self._lock:
+            schema_version = self._conn.execute("PRAGMA schema_version").fetchone()[0]
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        return schema_version, data_version
+
+    def schema_fingerprint(self) -> str:
+        """
+        Hash of the columns of every log table/view. Unlike schema_version it ignores index churn,
+        internal tables and view bodies (a partitioned view is redefined whenever a shard is added).
+        """
+        with self._lock:
+            names = [r[0] for r in self._conn.execute(
+                "SELECT name FROM sqlite_master WHERE type IN ('table', 'view') ORDER BY name"
+            ) if not is_internal_table(r[0])]
+            rows = [(name, self._conn.execute(f"PRAGMA table_xinfo({name})").fetchall()) for name in names]
+        return hashlib.sha1(repr(rows).encode()).hexdigest()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,266 @@
+"""
+DuckDB backend over Parquet copies of the log tables (LOGBOT_ENGINE=duckdb, see utilities/engines.py).
+
+    python -m utilities.duckdb_engine --db logs2.db --parquet-dir parquet
+
+exports vpc_logs / access_logs / execution_logs to parquet/<table>/<table>-<stamp>.parquet (zstd,
+sorted by timestamp so row-group min/max statistics skip whole groups on time filters). A small
+DuckDB catalog file (logs.duckdb) holds one view per table over its Parquet files; the prompt's
+table_info is rendered from it through SQLDatabase (duckdb_engine SQLAlchemy dialect), and queries run
+on read-only cursors with `threads` set to every core. The catalog is written by this command; the app
+only opens it read-only (so any number of workers can share it) and creates it itself only when the file
+does not exist yet. The views glob their table's directory, so re-exported Parquet is picked up as is.
+
+Columns keep their SQLite types (timestamp stays TEXT), so string comparisons on timestamps behave
+the same. Generated SQL is bound with EXPLAIN before it runs; SQLite-only syntax that fails there is
+transpiled with sqlglot when it is installed.
+"""
+from langchain_community.utilities import SQLDatabase
+from utilities.create_logs_db import TABLES
+from utilities.query_guard import QUERY_TIMEOUT_S
+from utilities.schema_cache import SchemaContext
+from utilities.sqlite_pool import POOL_SIZE
+from datetime import datetime
+import argparse
+import duckdb
+import glob
+import hashlib
+import os
+import sqlite3
+import threading
+
+try:
+    import sqlglot
+except ImportError:
+    sqlglot = None
+
+
+DUCKDB_PATH = os.environ.get("LOGBOT_DUCKDB_PATH", "logs.duckdb")
+PARQUET_DIR = os.environ.get("LOGBOT_PARQUET_DIR", "parquet")
+DUCKDB_THREADS = int(os.environ.get("LOGBOT_DUCKDB_THREADS", str(os.cpu_count() or 1)))
+
+
+class DialectError(ValueError):
+    """Generated SQL that DuckDB cannot bind, even after transpiling it from SQLite."""
+
+
+def _quote(path: str) -> str:
+    return "'" + path.replace("'", "''") + "'"
+
+
+def _parquet_files(parquet_dir: str, table: str) -> list:
+    return sorted(glob.glob(os.path.join(parquet_dir, table, "*.parquet")))
+
+
+def export_parquet(sqlite_path: str, parquet_dir: str = PARQUET_DIR) -> dict:
+    """Snapshots the log tables of a SQLite DB into Parquet. Returns {table: rows}."""
+    src = sqlite3.connect(f"file:{sqlite_path}?mode=ro", uri=True)
+    conn = duckdb.connect()
+    conn.execute("INSTALL sqlite; LOAD sqlite;")
+    stamp = datetime.now().strftime("%Y%m%d%H%M%S")
+    exported = {}
+    try:
+        for table in TABLES:
+            # table_info leaves out generated columns: ts_epoch is a SQLite-side index helper
+            columns = [r[1] for r in src.execute(f"PRAGMA table_info({table})")]
+            if not columns:
+                continue
+            os.makedirs(os.path.join(parquet_dir, table), exist_ok=True)
+            stale = _parquet_files(parquet_dir, table)
+            target = os.path.join(parquet_dir, table, f"{table}-{stamp}.parquet")
+            conn.execute(
+                f"COPY (SELECT {', '.join(columns)} FROM sqlite_scan({_quote(sqlite_path)}, {_quote(table)}) "
+                f"ORDER BY timestamp) TO {_quote(target)} (FORMAT parquet, COMPRESSION zstd)"
+            )
+            for path in stale:
+                if path != target:
+                    os.remove(path)
+            exported[table] = conn.execute(f"SELECT COUNT(*) FROM read_parquet({_quote(target)})").fetchone()[0]
+    finally:
+        conn.close()
+        src.close()
+    return exported
+
+
+def create_catalog(catalog_path: str = DUCKDB_PATH, parquet_dir: str = PARQUET_DIR):
+    """(Re)creates one view per log table over its Parquet files."""
+    # Written to a private file and renamed into place: two workers starting at once, or a rebuild while
+    # workers hold the old catalog open read-only, never meet on the same file or its lock
+    tmp = f"{catalog_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    conn = duckdb.connect(tmp)
+    try:
+        for table in TABLES:
+            if not _parquet_files(parquet_dir, table):
+                continue
+            pattern = os.path.join(os.path.abspath(parquet_dir), table, "*.parquet")
+            conn.execute(
+                f"CREATE OR REPLACE VIEW {table} AS SELECT * FROM read_parquet({_quote(pattern)}, union_by_name = true)"
+            )
+        conn.close()
+        os.replace(tmp, catalog_path)
+    finally:
+        conn.close()
+        for path in (tmp, tmp + ".wal"):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+class ParquetVersion:
+    """
+    (schema key, data key) for the Parquet layout, the DuckDB counterpart of DBVersion.
+    Data changes whenever a Parquet file is added, replaced or removed; the schema whenever the
+    catalog file is rewritten.
+    """
+
+    def __init__(self, catalog_path: str, parquet_dir: str, conn):
+        self.catalog_path = catalog_path
+        self.parquet_dir = parquet_dir
+        self._conn = conn
+        self._lock = threading.Lock()
+
+    def current(self) -> tuple:
+        files = [(path, os.stat(path).st_size, os.stat(path).st_mtime_ns)
+                 for table in TABLES for path in _parquet_files(self.parquet_dir, table)]
+        return os.stat(self.catalog_path).st_mtime_ns, hashlib.sha1(repr(files).encode()).hexdigest()
+
+    def schema_fingerprint(self) -> str:
+        with self._lock:
+            cursor = self._conn.cursor()
+            try:
+                rows = [(table, cursor.execute(f"DESCRIBE {table}").fetchall())
+                        for (table,) in cursor.execute(
+                            "SELECT view_name FROM duckdb_views() WHERE NOT internal ORDER BY view_name"
+                        ).fetchall()]
+            finally:
+                cursor.close()
+        return hashlib.sha1(repr(rows).encode()).hexdigest()
+
+    def close(self):
+        pass
+
+
+class DuckDBSchemaContext(SchemaContext):
+    def _build_db(self) -> SQLDatabase:
+        return SQLDatabase.from_uri(
+            f"duckdb:///{self.db_path}", view_support=True,
+            engine_args={"connect_args": {"read_only": True}},
+        )
+
+
+class DuckDBPool:
+    """Hands out per-thread cursors of one read-only DuckDB connection, at most `size` at a time."""
+
+    def __init__(self, conn, size: int = POOL_SIZE):
+        self._conn = conn
+        self._slots = threading.BoundedSemaphore(size)
+
+    def checkout(self, timeout: float = None):
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError(f"no DuckDB connection available after {timeout}s")
+        return self._conn.cursor()
+
+    def release(self, cursor):
+        try:
+            cursor.close()
+        finally:
+            self._slots.release()
+
+    def close(self):
+        self._conn.close()
+
+
+class DuckDBGuard:
+    """
+    Time budget and cancellation for one DuckDB query, same interface as QueryGuard.
+    DuckDB has no progress handler, so the deadline is a timer that interrupts the cursor.
+    """
+
+    def __init__(self, conn, timeout_s: float = QUERY_TIMEOUT_S):
+        self.conn = conn
+        self.timeout_s = timeout_s
+        self.reason = None
+        self._timer = None
+
+    def _expire(self):
+        self.reason = self.reason or "timeout"
+        self.conn.interrupt()
+
+    def arm(self):
+        if self.reason is not None:
+            # Cancelled before it started: an interrupt now would not reach the statement
+            raise duckdb.InterruptException(self.reason)
+        if self.timeout_s:
+            self._timer = threading.Timer(self.timeout_s, self._expire)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def disarm(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def cancel(self):
+        self.reason = self.reason or "cancelled"
+        self.conn.interrupt()
+
+    def __enter__(self):
+        self.arm()
+        return self
+
+    def __exit__(self, *exc):
+        self.disarm()
+        return False
+
+
+class DuckDBEngine:
+    name = "duckdb"
+    dialect = "DuckDB"
+    errors = (duckdb.Error, DialectError)
+
+    def __init__(self, catalog_path: str = DUCKDB_PATH, parquet_dir: str = PARQUET_DIR,
+                 threads: int = DUCKDB_THREADS):
+        self.db_path = catalog_path
+        if not os.path.exists(catalog_path):
+            # Only ever opened read-only once it exists, so any number of workers can share it
+            create_catalog(catalog_path, parquet_dir)
+        conn = duckdb.connect(catalog_path, read_only=True)
+        conn.execute(f"SET threads = {int(threads)}")
+        self.pool = DuckDBPool(conn)
+        self.version = ParquetVersion(catalog_path, parquet_dir, conn)
+        self.schema = DuckDBSchemaContext(catalog_path, self.version)
+
+    def guard(self, conn) -> DuckDBGuard:
+        return DuckDBGuard(conn)
+
+    def check_dialect(self, conn, sql: str) -> str:
+        """Returns SQL DuckDB can run (the generated one, or its transpilation), else raises DialectError."""
+        try:
+            conn.execute("EXPLAIN " + sql)
+            return sql
+        except (duckdb.ParserException, duckdb.BinderException, duckdb.CatalogException) as e:
+            error = e
+        if sqlglot is not None:
+            try:
+                translated = sqlglot.transpile(sql, read="sqlite", write="duckdb")[0]
+                conn.execute("EXPLAIN " + translated)
+                return translated
+            except (sqlglot.errors.SqlglotError, duckdb.Error):
+                pass
+        raise DialectError(f"generated SQL is not valid DuckDB SQL: {error}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the SQLite log tables to Parquet for the DuckDB engine.")
+    parser.add_argument("--db", default="logs2.db", help="source SQLite DB")
+    parser.add_argument("--parquet-dir", default=PARQUET_DIR)
+    parser.add_argument("--catalog", default=DUCKDB_PATH)
+    args = parser.parse_args(argv)
+
+    for table, rows in export_parquet(args.db, args.parquet_dir).items():
+        print(f"{table}: {rows} rows")
+    create_catalog(args.catalog, args.parquet_dir)
+    print(f"DuckDB catalog written to {args.catalog}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""
+Example-question embeddings persisted as memory-mapped .npy segments.
+
+    embeddings/<model>/<bank>/seed-<sha1 of the texts>.npy   the examples shipped in the code
+    embeddings/<model>/<bank>/add-<sha1 of the texts>.npy    examples added at runtime
+    (each with a .json sibling holding its texts)
+
+Segments are opened with np.load(mmap_mode="r"): startup cost does not depend on the bank size and
+every worker process maps the same pages from the OS page cache. Vectors are L2-normalized, so the
+cosine similarity to a query is one matrix-vector product per segment. Appends write a new segment
+(atomically renamed into place); other processes pick it up on their next lookup. The seed segment is
+keyed by the hash of the example list, so editing the examples in code re-encodes them once. That
+encoding happens on first use, not in the constructor: a bank can be built while its encoder is still
+loading (is_relevant builds both lazily, each under its own lock).
+
+    python -m utilities.embedding_bank --bank log_examples questions.txt
+"""
+import argparse
+import hashlib
+import json
+import numpy as np
+import os
+import threading
+
+
+EMBEDDING_DIR = os.environ.get("LOGBOT_EMBEDDING_DIR", "embeddings")
+MAX_SEGMENTS = 32  # appended segments are compacted into one beyond this
+
+
+def texts_hash(texts) -> str:
+    return hashlib.sha1("\n".join(texts).encode("utf-8")).hexdigest()
+
+
+class EmbeddingBank:
+    """
+    Appendable bank of example texts and their embeddings for nearest-neighbour scoring.
+    `encode(texts) -> np.ndarray` must return L2-normalized float vectors (one row per text).
+    """
+
+    def __init__(self, name: str, encode, model_name: str, seed_texts=(), root: str = EMBEDDING_DIR):
+        self.name = name
+        self.encode = encode
+        self.dir = os.path.join(root, model_name.replace("/", "_"), name)
+        self._lock = threading.Lock()
+        self._segments = {}  # file name -> memory-mapped matrix
+        self._dir_mtime = None
+        self._texts = None  # loaded on first add(), for de-duplication
+        self._segment_texts = {}  # file name -> its texts, loaded by top_k()
+        self._seed_texts = list(seed_texts)  # encoded by the first refresh(), if not on disk yet
+        self._seed_lock = threading.Lock()
+        os.makedirs(self.dir, exist_ok=True)
+
+    def _path(self, segment: str) -> str:
+        return os.path.join(self.dir, segment)
+
+    def _write(self, prefix: str, texts: list, vectors: np.ndarray) -> str:
+        segment = f"{prefix}-{texts_hash(texts)}.npy"
+        tmp = f".{segment}.{os.getpid()}.{threading.get_ident()}"
+        with open(self._path(tmp + ".json"), "w", encoding="utf-8") as f:
+            json.dump(texts, f)
+        np.save(self._path(tmp + ".npy"), np.ascontiguousarray(vectors, dtype=np.float32), allow_pickle=False)
+        # The .npy is what readers look for, so it is renamed last
+        os.replace(self._path(tmp + ".json"), self._path(segment[:-4] + ".json"))
+        os.replace(self._path(tmp + ".npy"), self._path(segment))
+        return segment
+
+    def _seed(self):
+        with self._seed_lock:
+            # Cleared only once written, so a concurrent first lookup waits for the seed instead of missing it
+            if self._seed_texts:
+                self._write_seed(self._seed_texts)
+            self._seed_texts = None
+
+    def _write_seed(self, texts: list):
+        current = f"seed-{texts_hash(texts)}.npy"
+        for segment in os.listdir(self.dir):
+            if segment.startswith("seed-") and segment.endswith(".npy") and segment != current:
+                # The examples in the code changed: the old seed segment no longer applies
+                self._remove(segment)
+        if not os.path.exists(self._path(current)):
+            self._write("seed", texts, self.encode(texts))
+
+    def _remove(self, segment: str):
+        for path in (self._path(segment), self._path(segment[:-4] + ".json")):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def refresh(self):
+        """Maps segments written since the last call (by this or another process)."""
+        if self._seed_texts is not None:
+            self._seed()
+        mtime = os.stat(self.dir).st_mtime_ns
+        if mtime == self._dir_mtime:
+            return
+        with self._lock:
+            names = {n for n in os.listdir(self.dir) if n.endswith(".npy") and not n.startswith(".")}
+            segments = {}
+            for name in sorted(names):
+                matrix = self._segments.get(name)
+                if matrix is None:
+                    try:
+                        matrix = np.load(self._path(name), mmap_mode="r")
+                    except (FileNotFoundError, ValueError):
+                        continue  # removed or compacted by another process meanwhile
+                segments[name] = matrix
+            self._segments = segments
+            self._segment_texts = {n: t for n, t in self._segment_texts.items() if n in segments}
+            self._dir_mtime = mtime
+            self._texts = None
+
+    def __len__(self) -> int:
+        self.refresh()
+        return sum(len(m) for m in self._segments.values())
+
+    def max_score(self, vector: np.ndarray) -> float:
+        """Highest cosine similarity between a normalized query vector and any example."""
+        self.refresh()
+        vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+        scores = [float(np.max(m @ vector)) for m in self._segments.values() if len(m)]
+        return max(scores) if scores else 0.0
+
+    def max_scores(self, vectors: np.ndarray, chunk_rows: int = 4096) -> np.ndarray:
+        """Row-wise max_score for an (N, dim) batch of normalized vectors: one (N, M) product per segment."""
+        self.refresh()
+        vectors = np.asarray(vectors, dtype=np.float32)
+        best = np.zeros(len(vectors), dtype=np.float32)
+        if not self._segments:
+            return best
+        best[:] = -np.inf
+        for start in range(0, len(vectors), chunk_rows):
+            # Chunked so a replay of many questions never materializes the whole N x M matrix
+            block = vectors[start:start + chunk_rows]
+            for m in self._segments.values():
+                if len(m):
+                    np.maximum(best[start:start + chunk_rows], (block @ m.T).max(axis=1), out=best[start:start + chunk_rows])
+        best[np.isneginf(best)] = 0.0
+        return best
+
+    def _texts_of(self, segment: str) -> list:
+        if segment not in self._segment_texts:
+            with open(self._path(segment[:-4] + ".json"), encoding="utf-8") as f:
+                self._segment_texts[segment] = json.load(f)
+        return self._segment_texts[segment]
+
+    def top_k(self, vector: np.ndarray, k: int) -> list:
+        """The k examples most similar to a normalized query vector, as [(text, score)] best first."""
+        self.refresh()
+        vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+        candidates = []
+        for name, m in list(self._segments.items()):
+            if not len(m):
+                continue
+            scores = m @ vector
+            best = np.argpartition(-scores, min(k, len(scores)) - 1)[:k]
+            texts = self._texts_of(name)
+            candidates.extend((float(scores[i]), texts[i]) for i in best)
+        candidates.sort(key=lambda c: -c[0])
+        return [(text, score) for score, text in candidates[:k]]
+
+    def matrix(self) -> np.ndarray:
+        """All embeddings as one in-memory array (copies; scoring does not need it)."""
+        self.refresh()
+        return np.concatenate(list(self._segments.values())) if self._segments else np.zeros((0, 0), np.float32)
+
+    def texts(self) -> list:
+        self.refresh()
+        with self._lock:
+            if self._texts is None:
+                texts = []
+                for name in self._segments:
+                    with open(self._path(name[:-4] + ".json"), encoding="utf-8") as f:
+                        texts.extend(json.load(f))
+                self._texts = texts
+            return list(self._texts)
+
+    def add(self, texts) -> int:
+        """Encodes and appends the texts not already in the bank. Returns how many were added."""
+        known = set(self.texts())
+        fresh = list(dict.fromkeys(t for t in texts if t and t not in known))
+        if not fresh:
+            return 0
+        self._write("add", fresh, self.encode(fresh))
+        self.refresh()
+        if sum(n.startswith("add-") for n in self._segments) > MAX_SEGMENTS:
+            self.compact()
+        return len(fresh)
+
+    def compact(self):
+        """Merges the appended segments into one, so lookups stay a handful of matrix products."""
+        self.refresh()
+        added = [n for n in self._segments if n.startswith("add-")]
+        if len(added) < 2:
+            return
+        texts, vectors = [], []
+        for name in added:
+            with open(self._path(name[:-4] + ".json"), encoding="utf-8") as f:
+                texts.extend(json.load(f))
+            vectors.append(np.asarray(self._segments[name]))
+        self._write("add", texts, np.concatenate(vectors))
+        for name in added:
+            self._remove(name)
+        self.refresh()
+
+
+def main(argv=None):
+    # Imported here: is_relevant imports this module for the banks it builds
+    from utilities import is_relevant
+
+    parser = argparse.ArgumentParser(description="Append curated example questions to an embedding bank.")
+    parser.add_argument("files", nargs="+", help="text files with one example question per line")
+    parser.add_argument("--bank", choices=["log_examples", "chart_query_examples"], default="log_examples")
+    args = parser.parse_args(argv)
+
+    texts = []
+    for path in args.files:
+        with open(path, encoding="utf-8") as f:
+            texts.extend(line.strip() for line in f if line.strip())
+    bank = is_relevant.get_log_bank() if args.bank == "log_examples" else is_relevant.get_chart_bank()
+    added = bank.add(texts)
+    print(f"{args.bank}: added {added} examples, {len(bank)} in total")
+
+
+if __name__ == "__main__":
+    main()
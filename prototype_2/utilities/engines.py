@@ -0,0 +1,50 @@
+"""
+Execution engines for generated SQL, selected with LOGBOT_ENGINE:
+
+    sqlite  (default) the logs DB through the read-only SQLite pool
+    duckdb  the same three tables exported to Parquet and queried by DuckDB (utilities/duckdb_engine.py),
+            for wide analytical scans: columnar, compressed and parallel over all cores
+
+An engine bundles what SQLPipeline needs from its backend: a connection pool (checkout/release), a
+version probe for the caches, the SchemaContext the prompt's table_info comes from, a per-query guard
+(timeout/cancel) and the exceptions those guards abort with. Rewrites that rely on SQLite internals
+(ts_epoch, rollups, partitions, the index advisor) only run on the sqlite engine.
+"""
+from utilities.db_version import DBVersion
+from utilities.schema_cache import SchemaContext
+from utilities.sqlite_pool import ReadOnlyPool
+from utilities.query_guard import QueryGuard
+import os
+import sqlite3
+
+
+ENGINE = os.environ.get("LOGBOT_ENGINE", "sqlite").lower()
+
+
+class SQLiteEngine:
+    name = "sqlite"
+    dialect = "SQLite"
+    errors = (sqlite3.OperationalError,)
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.pool = ReadOnlyPool(db_path)
+        self.version = DBVersion(db_path)
+        self.schema = SchemaContext(db_path, self.version)
+
+    def guard(self, conn: sqlite3.Connection) -> QueryGuard:
+        return QueryGuard(conn)
+
+    def check_dialect(self, conn: sqlite3.Connection, sql: str) -> str:
+        # The prompt asks for SQLite; anything else fails at prepare time with its own error
+        return sql
+
+
+def make_engine(name: str = ENGINE, db_path: str = None):
+    if name == "sqlite":
+        return SQLiteEngine(db_path)
+    if name == "duckdb":
+        # Optional dependency (duckdb, duckdb_engine), only imported when selected
+        from utilities.duckdb_engine import DuckDBEngine
+        return DuckDBEngine()
+    raise ValueError(f"unknown LOGBOT_ENGINE {name!r} (expected 'sqlite' or 'duckdb')")
@@ -0,0 +1,149 @@
+"""
+Question -> SQL example library for the few-shot part of the SQL prompt.
+
+    python -m utilities.example_store add examples.jsonl   # {"question": ..., "sql": ...} per line
+    python -m utilities.example_store search "which ips sent the most bytes?"
+
+write_query no longer sends a fixed list of examples: the k examples whose questions are nearest to
+the incoming one (MiniLM cosine, through an EmbeddingBank) are put in the prompt, so it has the same
+size whether the library holds ten examples or thousands. Which tables go into table_info is decided
+separately, by utilities/schema_linker.py; example_tables() only lists the ones the retrieved SQL
+touches, for `search`. SEED_EXAMPLES ship with the code; curated pairs added with
+`add` are stored in a small SQLite file (kept apart from the logs DB, like the semantic SQL cache).
+"""
+from utilities import is_relevant
+from utilities.create_logs_db import TABLES
+from utilities.embedding_bank import EmbeddingBank
+from utilities.sql_text import table_aliases
+import argparse
+import json
+import os
+import sqlite3
+import threading
+
+
+EXAMPLES_PATH = os.environ.get("LOGBOT_EXAMPLES_PATH", "sql_examples.db")
+FEW_SHOT_K = int(os.environ.get("LOGBOT_FEW_SHOT_K", "4"))
+
+SEED_EXAMPLES = [
+    ("Which functions failed?",
+     "SELECT function_name FROM execution_logs WHERE status = 'FAILED';"),
+    ("can you give me how many users were accepted in the month of april?",
+     "SELECT COUNT(DISTINCT access_logs.user_id) AS accepted_users FROM access_logs JOIN vpc_logs USING (request_id) WHERE vpc_logs.action = 'ACCEPT' AND access_logs.timestamp >= '2025-04-01T00:00:00' AND access_logs.timestamp <= '2025-04-30T23:59:59';"),
+    ("Which users triggered rejected VPC actions?",
+     "SELECT user_id FROM access_logs JOIN vpc_logs USING (request_id) WHERE action = 'REJECT';"),
+    ("Which services had the highest average execution time for failed requests?",
+     "SELECT function_name, AVG(duration_ms) AS avg_duration FROM execution_logs WHERE status = 'FAILED' GROUP BY function_name ORDER BY avg_duration DESC;"),
+    ("Which user IDs accessed the `/api/data` endpoint but the VPC action was REJECT?",
+     "SELECT access_logs.user_id FROM access_logs JOIN vpc_logs USING (request_id) WHERE access_logs.endpoint = '/api/data' AND vpc_logs.action = 'REJECT';"),
+    ("For failed `auth_user` function calls, what were the corresponding IPs and status codes?",
+     "SELECT vpc_logs.src_ip, vpc_logs.dst_ip, access_logs.status_code FROM execution_logs JOIN vpc_logs USING (request_id) JOIN access_logs USING (request_id) WHERE execution_logs.function_name = 'auth_user' AND execution_logs.status = 'FAILED';"),
+    ("What is the total number of bytes sent for successful requests to the `/api/login` endpoint?",
+     "SELECT SUM(vpc_logs.bytes_sent) AS total_bytes FROM access_logs JOIN execution_logs USING (request_id) JOIN vpc_logs USING (request_id) WHERE access_logs.endpoint = '/api/login' AND execution_logs.status = 'SUCCESS';"),
+    ("Which user had the longest execution duration and what function was called?",
+     "SELECT access_logs.user_id, execution_logs.function_name, execution_logs.duration_ms FROM execution_logs JOIN access_logs USING (request_id) ORDER BY execution_logs.duration_ms DESC LIMIT 1;"),
+    ("List all requests where the VPC action was REJECT and the function call failed, along with timestamp and endpoint.",
+     "SELECT access_logs.timestamp, access_logs.endpoint, vpc_logs.src_ip, execution_logs.function_name FROM access_logs JOIN vpc_logs USING (request_id) JOIN execution_logs USING (request_id) WHERE vpc_logs.action = 'REJECT' AND execution_logs.status = 'FAILED';"),
+    ("Count of failed requests by endpoint where latency was greater than 500ms.",
+     "SELECT access_logs.endpoint, COUNT(*) AS failed_count FROM execution_logs JOIN access_logs USING (request_id) WHERE execution_logs.status = 'FAILED' AND execution_logs.duration_ms > 500 GROUP BY access_logs.endpoint;"),
+]
+
+
+def example_tables(examples) -> list:
+    """Log tables referenced by the SQL of the given (question, sql, ...) examples, in TABLES order."""
+    used = set()
+    for example in examples:
+        used.update(table_aliases(example[1], TABLES).values())
+    return [t for t in TABLES if t in used]
+
+
+def render_examples(examples) -> str:
+    return "\n\n".join(f"    - {question}  \n    → {sql}" for question, sql, *_ in examples)
+
+
+class ExampleStore:
+    """
+    Indexed question/SQL pairs. retrieve() embeds the question once and takes the top k from the
+    memory-mapped bank, so its cost grows with one matrix-vector product, not with the prompt.
+    """
+
+    def __init__(self, path: str = EXAMPLES_PATH, k: int = FEW_SHOT_K):
+        self.path = path
+        self.k = k
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+        CREATE TABLE IF NOT EXISTS sql_examples (
+            question TEXT PRIMARY KEY,
+            sql TEXT NOT NULL
+        );
+        """)
+        self._conn.commit()
+        self._sql = {}
+        self._load()
+        self.bank = EmbeddingBank(
+            "sql_examples", is_relevant.encode, is_relevant.encoder_name(), [q for q, _ in SEED_EXAMPLES]
+        )
+
+    def _load(self):
+        with self._lock:
+            self._sql = dict(SEED_EXAMPLES)
+            self._sql.update(self._conn.execute("SELECT question, sql FROM sql_examples").fetchall())
+
+    def __len__(self) -> int:
+        return len(self._sql)
+
+    def add(self, pairs) -> int:
+        """Stores (question, sql) pairs (a repeated question gets the new SQL). Returns how many were new."""
+        pairs = [(q.strip(), s.strip()) for q, s in pairs if q and q.strip() and s and s.strip()]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO sql_examples(question, sql) VALUES (?, ?) "
+                "ON CONFLICT(question) DO UPDATE SET sql = excluded.sql",
+                pairs,
+            )
+            self._conn.commit()
+            self._sql.update(pairs)
+        return self.bank.add([q for q, _ in pairs])
+
+    def retrieve(self, question: str, k: int = None) -> list:
+        """The k stored examples nearest to `question`, as [(question, sql, score)] best first."""
+        vector = is_relevant.encode([question])[0]
+        hits = self.bank.top_k(vector, k or self.k)
+        if any(q not in self._sql for q, _ in hits):
+            # Added by another process since we loaded
+            self._load()
+        return [(q, self._sql[q], score) for q, score in hits if q in self._sql]
+
+    def close(self):
+        self._conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the question -> SQL few-shot example library.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    add = sub.add_parser("add", help="add examples from JSONL files with question and sql fields")
+    add.add_argument("files", nargs="+")
+    search = sub.add_parser("search", help="show the examples the prompt would get for a question")
+    search.add_argument("question")
+    search.add_argument("-k", type=int, default=FEW_SHOT_K)
+    parser.add_argument("--path", default=EXAMPLES_PATH)
+    args = parser.parse_args(argv)
+
+    store = ExampleStore(args.path)
+    if args.command == "add":
+        pairs = []
+        for path in args.files:
+            with open(path, encoding="utf-8") as f:
+                pairs.extend((row["question"], row["sql"]) for row in map(json.loads, filter(str.strip, f)))
+        added = store.add(pairs)
+        print(f"added {added} examples ({len(pairs) - added} updated), {len(store)} in total")
+        return
+    examples = store.retrieve(args.question, args.k)
+    for question, sql, score in examples:
+        print(f"{score:.3f}  {question}\n       {sql}")
+    print(f"tables: {', '.join(example_tables(examples))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+from utilities.sql_text import table_aliases
+import argparse
+import logging
+import queue
+import re
+import sqlite3
+import threading
+
+
+log = logging.getLogger(__name__)
+_AUTOMATIC = re.compile(r"^SEARCH (\w+)(?: AS \w+)? USING AUTOMATIC (?:PARTIAL )?(?:COVERING )?INDEX \((.*)\)")
+_FULL_SCAN = re.compile(r"^SCAN (\w+)(?: AS \w+)?$")
+_PREDICATE = re.compile(
+    r"(?:\b([A-Za-z_]\w*)\.)?\b([A-Za-z_]\w*)\s*(=|==|<>|!=|>=|<=|<|>|\bin\b|\blike\b|\bbetween\b|\bglob\b)",
+    re.I,
+)
+
+
+def explain(conn: sqlite3.Connection, sql: str) -> list:
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql).fetchall()]
+
+
+class IndexAdvisor:
+    """
+    Watches the plans of generated SQL for the two signs of a missing index:
+    full-table scans ("SCAN t" without an index) and automatic indexes SQLite builds per query
+    ("USING AUTOMATIC ... INDEX"). Each finding is turned into a CREATE INDEX proposal and counted;
+    with auto_create, proposals seen `min_occurrences` times are queued to a background thread that
+    creates them through a separate writable connection (the query connections are read-only), so a
+    CREATE INDEX never runs on the query path or under the advisor's lock.
+    """
+
+    def __init__(self, db_path: str, auto_create: bool = False, min_occurrences: int = 3):
+        self.db_path = db_path
+        self.auto_create = auto_create
+        self.min_occurrences = min_occurrences
+        self.findings = {}  # ddl -> dict(table, columns, reason, count, example, created)
+        self.full_scans = {}  # table -> count
+        self._columns = (None, {})  # schema_version -> {table: [column]}
+        self._lock = threading.Lock()
+        self._pending = queue.Queue()
+        self._worker = None
+
+    def _table_columns(self, conn: sqlite3.Connection, schema_version: int) -> dict:
+        if self._columns[0] != schema_version:
+            tables = [r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+            self._columns = (schema_version, {
+                t: [r[1] for r in conn.execute(f"PRAGMA table_info({t})")] for t in tables
+            })
+        return self._columns[1]
+
+    def _filter_columns(self, sql: str, table: str, aliases: dict, columns: list) -> list:
+        # Equality columns first, then range columns: the order a composite index can use them in
+        where = re.split(r"\bwhere\b", sql, maxsplit=1, flags=re.I)
+        if len(where) < 2:
+            return []
+        equality, ranged = [], []
+        for qualifier, column, op in _PREDICATE.findall(where[1]):
+            if qualifier and aliases.get(qualifier.lower()) != table:
+                continue
+            if column not in columns:
+                continue
+            target = equality if op.lower() in ("=", "==", "in") else ranged
+            if column not in equality and column not in ranged:
+                target.append(column)
+        return equality + ranged
+
+    def _propose(self, table: str, columns: list, reason: str, sql: str) -> dict:
+        name = f"ix_auto_{table}_{'_'.join(columns)}"
+        ddl = f"CREATE INDEX IF NOT EXISTS {name} ON {table}({', '.join(columns)});"
+        finding = self.findings.setdefault(ddl, {
+            "ddl": ddl, "table": table, "columns": columns, "reason": reason, "count": 0, "example": sql,
+            "queued": False, "created": False,
+        })
+        finding["count"] += 1
+        return finding
+
+    def observe(self, conn: sqlite3.Connection, sql: str, schema_version: int) -> list:
+        """Explains `sql` on `conn` and records/returns index proposals for it."""
+        try:
+            plan = explain(conn, sql)
+        except sqlite3.Error:
+            return []
+        with self._lock:
+            table_columns = self._table_columns(conn, schema_version)
+            aliases = table_aliases(sql, table_columns)
+            proposals = []
+            for detail in plan:
+                match = _AUTOMATIC.match(detail)
+                if match:
+                    table = aliases.get(match.group(1).lower())
+                    columns = [c.split("=")[0].split(">")[0].split("<")[0].strip()
+                               for c in match.group(2).split(" AND ")]
+                    if table and columns:
+                        proposals.append(self._propose(table, columns, "automatic index", sql))
+                    continue
+                match = _FULL_SCAN.match(detail)
+                if match:
+                    table = aliases.get(match.group(1).lower())
+                    if table is None:
+                        continue
+                    self.full_scans[table] = self.full_scans.get(table, 0) + 1
+                    columns = self._filter_columns(sql, table, aliases, table_columns[table])
+                    if columns:
+                        proposals.append(self._propose(table, columns, "full table scan", sql))
+            due = [f for f in proposals if not f["queued"] and f["count"] >= self.min_occurrences]
+            if self.auto_create:
+                for finding in due:
+                    finding["queued"] = True
+                    self._pending.put(finding)
+                if due and self._worker is None:
+                    self._worker = threading.Thread(target=self._create_pending, name="index-advisor", daemon=True)
+                    self._worker.start()
+            return proposals
+
+    def _create_pending(self):
+        while True:
+            finding = self._pending.get()
+            try:
+                self.create(finding)
+            except sqlite3.Error as e:
+                # Typically the DB is locked by an ingest; the proposal is queued again on its next sighting
+                log.warning("index advisor: %s failed: %s", finding["ddl"], e)
+                with self._lock:
+                    finding["queued"] = False
+            finally:
+                self._pending.task_done()
+
+    def wait(self):
+        """Blocks until every queued CREATE INDEX has been attempted."""
+        self._pending.join()
+
+    def create(self, finding: dict):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute(finding["ddl"])
+            conn.commit()
+        finally:
+            conn.close()
+        with self._lock:
+            finding["created"] = True
+
+    def report(self) -> list:
+        with self._lock:
+            return sorted(self.findings.values(), key=lambda f: f["count"], reverse=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Explain SQL against the logs DB and propose missing indexes.")
+    parser.add_argument("sql", nargs="+", help="SQL statements to analyze")
+    parser.add_argument("--db", default="logs2.db")
+    parser.add_argument("--create", action="store_true", help="create the proposed indexes")
+    args = parser.parse_args()
+
+    advisor = IndexAdvisor(args.db)
+    conn = sqlite3.connect(f"file:{args.db}?mode=ro", uri=True)
+    schema_version = conn.execute("PRAGMA schema_version").fetchone()[0]
+    for statement in args.sql:
+        print(statement)
+        for detail in explain(conn, statement):
+            print("   ", detail)
+        advisor.observe(conn, statement, schema_version)
+    conn.close()
+    for finding in advisor.report():
+        print(f"{finding['count']}x {finding['reason']}: {finding['ddl']}")
+        if args.create:
+            advisor.create(finding)
@@ -1,11 +1,25 @@
-from sentence_transformers import SentenceTransformer, util
-from transformers import pipeline
-from langchain.chat_models import init_chat_model
+from utilities.llm_client import get_llm
+from utilities.embedding_bank import EmbeddingBank
+import numpy as np
 import os
+import threading
+import time
 
 
 import re
 
+# Models are loaded on first use (or by warm_up() in the background), never at import time.
+# The BART zero-shot classifier (~1.6 GB) is only loaded when LOGBOT_ZERO_SHOT is enabled.
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+# "torch" (sentence-transformers) or "onnx" (int8 ONNX Runtime export, see utilities/onnx_encoder.py)
+ENCODER_BACKEND = os.environ.get("LOGBOT_ENCODER", "torch").lower()
+ZERO_SHOT_MODEL = "facebook/bart-large-mnli"
+ZERO_SHOT_ENABLED = os.environ.get("LOGBOT_ZERO_SHOT", "false").lower() == "true"
+# classify_log_query(): kNN similarity at or above HIGH is a log query, below LOW is not,
+# and only the band in between is sent to the LLM classifier
+RELEVANCE_LOW = float(os.environ.get("LOGBOT_RELEVANCE_LOW", "0.35"))
+RELEVANCE_HIGH = float(os.environ.get("LOGBOT_RELEVANCE_HIGH", "0.6"))
+
 def normalize_query(text: str) -> str:
     # Lowercase and remove numbers (and optionally stopwords, etc.)
     text = text.lower()
@@ -78,37 +92,184 @@ chart_query_examples = [
     "Show the number of function calls per user over time",
     "Plot the total traffic by country across different days"
 ]
-model = SentenceTransformer('all-MiniLM-L6-v2')
-log_embeddings = model.encode(log_examples, convert_to_tensor=True)
-chart_embeddings = model.encode(chart_query_examples, convert_to_tensor=True)
-classifier = pipeline("zero-shot-classification", model="facebook/bart-large-mnli")
+# Questions that are NOT about the logs: negatives for the trained relevance head (utilities/relevance_head.py)
+non_log_examples = [
+    "What is the capital of France?",
+    "Tell me a joke.",
+    "How are you today?",
+    "Write a poem about the ocean.",
+    "What's the weather like tomorrow?",
+    "Who won the football match last night?",
+    "Explain how photosynthesis works.",
+    "Translate hello into Spanish.",
+    "What is 17 times 23?",
+    "Recommend a good book to read.",
+    "How do I cook pasta?",
+    "What is the meaning of life?",
+    "Who is the president of the United States?",
+    "Can you help me write a cover letter?",
+    "What time is it in Tokyo?",
+    "Summarize the plot of Hamlet.",
+    "How do I reset my phone?",
+    "What are the health benefits of green tea?",
+    "Give me a recipe for chocolate cake.",
+    "How far is the moon from the earth?",
+    "What's your name?",
+    "Suggest a name for my cat.",
+    "How do I learn to play the guitar?",
+    "What is machine learning?",
+    "Which movie should I watch tonight?",
+    "How tall is Mount Everest?",
+    "Explain the theory of relativity.",
+    "What are some tips for a job interview?",
+    "Hello!",
+    "Thanks, that's all."
+]
+_loaded = {}
+_load_locks = {}
+_load_locks_lock = threading.Lock()
+
+
+def _load(name: str, build):
+    # One build per process even when warm_up() and a first request race for it. Each name has its own
+    # lock and the registry lock is never held across a build: building a bank encodes with the model,
+    # i.e. loads another name, which a single process-wide lock would deadlock on
+    if name not in _loaded:
+        with _load_locks_lock:
+            lock = _load_locks.setdefault(name, threading.Lock())
+        with lock:
+            if name not in _loaded:
+                _loaded[name] = build()
+    return _loaded[name]
+
+
+def get_model():
+    """The shared sentence encoder (SentenceTransformer, or OnnxEncoder with LOGBOT_ENCODER=onnx), loaded on first use."""
+    def build():
+        if ENCODER_BACKEND == "onnx":
+            from utilities.onnx_encoder import OnnxEncoder
+            return OnnxEncoder()
+        from sentence_transformers import SentenceTransformer
+        import torch
+        torch.classes.__path__ = []  # keeps Streamlit's file watcher from tripping over torch.classes
+        return SentenceTransformer(EMBEDDING_MODEL)
+    return _load("model", build)
+
+
+def encoder_name() -> str:
+    # Banks are keyed by it: int8 ONNX vectors are close to, not identical with, the PyTorch ones
+    return EMBEDDING_MODEL if ENCODER_BACKEND != "onnx" else f"{EMBEDDING_MODEL}-onnx-int8"
+
+
+def encode(texts, batch_size: int = 64) -> np.ndarray:
+    """Normalized float32 embeddings, so cosine similarity is a dot product."""
+    return get_model().encode(texts, batch_size=batch_size, normalize_embeddings=True).astype(np.float32)
+
+
+def get_log_bank() -> EmbeddingBank:
+    """log_examples plus any curated examples appended at runtime (see utilities/embedding_bank.py)."""
+    return _load("log_bank", lambda: EmbeddingBank("log_examples", encode, encoder_name(), log_examples))
+
+
+def get_chart_bank() -> EmbeddingBank:
+    return _load("chart_bank", lambda: EmbeddingBank("chart_query_examples", encode, encoder_name(), chart_query_examples))
+
+
+def get_classifier():
+    """The BART zero-shot pipeline; only available with LOGBOT_ZERO_SHOT=true."""
+    if not ZERO_SHOT_ENABLED:
+        raise RuntimeError("zero-shot classification is disabled; set LOGBOT_ZERO_SHOT=true to enable it")
+
+    def build():
+        from transformers import pipeline
+        return pipeline("zero-shot-classification", model=ZERO_SHOT_MODEL)
+    return _load("classifier", build)
+
+
+def get_relevance_head():
+    """The trained logistic-regression head (utilities/relevance_head.py), loaded from its artifact on first use."""
+    def build():
+        from utilities.relevance_head import RelevanceHead
+        return RelevanceHead.load()
+    return _load("relevance_head", build)
+
+
+def warm_up(background: bool = True):
+    """Loads the embedding model and example embeddings ahead of the first question."""
+    def run():
+        get_model()
+        # refresh() encodes the seed examples when they are not on disk yet
+        get_log_bank().refresh()
+        get_chart_bank().refresh()
+        if ZERO_SHOT_ENABLED:
+            get_classifier()
+    if not background:
+        run()
+        return None
+    thread = threading.Thread(target=run, name="is_relevant-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def __getattr__(name):
+    # Old module attributes (is_relevant.model, ...) keep working, loaded on first access
+    loaders = {"model": get_model, "log_embeddings": lambda: get_log_bank().matrix(),
+               "chart_embeddings": lambda: get_chart_bank().matrix(), "classifier": get_classifier}
+    if name in loaders:
+        return loaders[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def log_query_scores(questions) -> np.ndarray:
+    """Cosine similarity of each question to its nearest log example, encoded as one batch."""
+    return get_log_bank().max_scores(encode([normalize_query(q) for q in questions]))
+
+
+def chart_query_scores(chart_queries) -> np.ndarray:
+    return get_chart_bank().max_scores(encode(list(chart_queries)))
+
+
+def classify_log_queries(questions, threshold: float = 0.5) -> tuple:
+    """Batch is_relevant_log_query: (labels, scores) arrays, one entry per question."""
+    scores = log_query_scores(questions)
+    return scores > threshold, scores
+
+
+def classify_chart_queries(chart_queries, threshold: float = 0.5) -> tuple:
+    """Batch is_relevant_chart_query: (labels, scores) arrays, one entry per query."""
+    scores = chart_query_scores(chart_queries)
+    return scores > threshold, scores
+
+
+def log_query_probabilities(questions) -> np.ndarray:
+    """P(log query) from the trained head, one per question, encoded as one batch."""
+    from utilities.relevance_head import features
+    return get_relevance_head().predict_proba(features(questions))
+
+
+def log_query_score(question: str) -> float:
+    """Cosine similarity of the question to its nearest log example."""
+    return float(log_query_scores([question])[0])
 
 
 def is_relevant_log_query(question: str) -> bool:
-    normalized_query = normalize_query(question)
-    query_embedding = model.encode(normalized_query, convert_to_tensor=True)
-    scores = util.cos_sim(query_embedding, log_embeddings)
-    max_score = scores.max().item()
+    max_score = log_query_score(question)
     return max_score > 0.5  # You can adjust this threshold
 def is_relevant_chart_query(chart_query)->bool:
-    query_embedding = model.encode(chart_query, convert_to_tensor=True)
-    scores = util.cos_sim(query_embedding, chart_embeddings)
-    max_score = scores.max().item()
+    max_score = float(chart_query_scores([chart_query])[0])
     return max_score > 0.5  # Threshold can be tuned
+def is_relevant_log_query_classifier(question: str) -> bool:
+    """Drop-in for is_relevant_log_query_zero_shot: the trained head instead of BART, milliseconds per call."""
+    return bool(log_query_probabilities([question])[0] >= get_relevance_head().threshold)
 def is_relevant_log_query_zero_shot(question:str)->bool:
-    result = classifier(
+    result = get_classifier()(
         question,
         candidate_labels=["log_query","non_log_query"]
     )
     print(result)
     return result['labels'][0] == "log_query" and result['scores'][0] > 0.7
 def is_relevant_log_query_pre_trained(question:str)->bool:
-    # Set environment variables
-    os.environ["LANGSMITH_API_KEY"] = os.environ.get("LANGSMITH_API_KEY", "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")
-    os.environ["LANGSMITH_TRACING"] = "false"
-    os.environ["GROQ_API_KEY"] = os.environ.get("GROQ_API_KEY", "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")
-
-    llm = init_chat_model("gemma2-9b-it", model_provider="groq")
+    llm = get_llm()
 
     prompt = f"""Classify this query as 'log_query' or 'non_log_query':
     
@@ -189,6 +350,24 @@ def is_relevant_log_query_pre_trained(question:str)->bool:
     return response.content.strip() == "log_query"
 
 
+def classify_log_query(question: str, low: float = RELEVANCE_LOW, high: float = RELEVANCE_HIGH) -> dict:
+    """
+    Local-first relevance cascade. The MiniLM kNN score settles confident cases; only scores in
+    [low, high) pay for the LLM round trip of is_relevant_log_query_pre_trained.
+    Returns {"is_log_query", "path" ("knn_accept" / "knn_reject" / "llm"), "score", "elapsed_ms"}.
+    """
+    started = time.perf_counter()
+    score = log_query_score(question)
+    if score >= high:
+        path, relevant = "knn_accept", True
+    elif score < low:
+        path, relevant = "knn_reject", False
+    else:
+        path, relevant = "llm", is_relevant_log_query_pre_trained(question)
+    return {"is_log_query": relevant, "path": path, "score": round(score, 4),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)}
+
+
 
 
 
@@ -0,0 +1,23 @@
+from langchain.chat_models import init_chat_model
+import functools
+import os
+
+
+MODEL_NAME = "gemma2-9b-it"
+
+
+def set_llm_env():
+    # Set environment variables
+    os.environ["LANGSMITH_API_KEY"] = os.environ.get("LANGSMITH_API_KEY", "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")
+    os.environ["LANGSMITH_TRACING"] = "false"
+    os.environ["GROQ_API_KEY"] = os.environ.get("GROQ_API_KEY", "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")
+
+
+@functools.lru_cache(maxsize=None)
+def get_llm(model: str = MODEL_NAME):
+    """
+    Returns the process-wide chat model client (Gemma via Groq).
+    init_chat_model builds a fresh HTTP client every time, so every caller shares this one.
+    """
+    set_llm_env()
+    return init_chat_model(model, model_provider="groq")
@@ -0,0 +1,18 @@
+from collections import Counter
+import threading
+
+
+class Metrics:
+    """Thread-safe counters shared by everything that runs inside one SQLPipeline."""
+
+    def __init__(self):
+        self._counters = Counter()
+        self._lock = threading.Lock()
+
+    def incr(self, name: str, value: int = 1):
+        with self._lock:
+            self._counters[name] += value
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self._counters)
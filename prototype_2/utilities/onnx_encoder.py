@@ -0,0 +1,144 @@
+"""
+ONNX Runtime backend for the MiniLM sentence encoder (LOGBOT_ENCODER=onnx).
+
+    python -m utilities.onnx_encoder export   # one-off, needs torch + transformers + onnxruntime
+    python -m utilities.onnx_encoder bench    # accuracy and latency against the PyTorch encoder
+
+`export` writes models/all-MiniLM-L6-v2-onnx/{model.onnx, model.int8.onnx, tokenizer.json}: the
+transformer exported from PyTorch, then dynamically quantized to int8 weights. At runtime OnnxEncoder
+needs only onnxruntime, tokenizers and numpy (no torch) and reproduces the sentence-transformers
+pipeline of all-MiniLM-L6-v2: tokenize (max 256 tokens), transformer, attention-masked mean pooling,
+L2 normalization. Its embeddings stay within ENCODER_TOLERANCE cosine of the PyTorch ones; `bench`
+checks that on the example banks.
+"""
+from utilities.is_relevant import EMBEDDING_MODEL, chart_query_examples, log_examples
+import argparse
+import numpy as np
+import os
+import time
+
+
+ONNX_DIR = os.environ.get("LOGBOT_ONNX_DIR", os.path.join("models", f"{EMBEDDING_MODEL}-onnx"))
+MAX_SEQ_LENGTH = 256  # all-MiniLM-L6-v2's sentence-transformers max_seq_length
+ENCODER_TOLERANCE = 0.99  # minimum cosine similarity between int8 ONNX and PyTorch embeddings
+
+
+class OnnxEncoder:
+    """Drop-in for SentenceTransformer.encode() on CPU, backed by the int8 ONNX export."""
+
+    def __init__(self, model_dir: str = ONNX_DIR, quantized: bool = True, threads: int = 0):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding()
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        model = "model.int8.onnx" if quantized else "model.onnx"
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, model), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def _encode_batch(self, texts: list) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+        }
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+        token_embeddings = self.session.run(None, feeds)[0]
+        mask = feeds["attention_mask"][..., None].astype(np.float32)
+        return (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+    def encode(self, sentences, batch_size: int = 32, normalize_embeddings: bool = False, **kwargs) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        # Similar lengths per batch keep padding (and wasted compute) small
+        order = np.argsort([len(t) for t in texts])
+        out = np.zeros((len(texts), 0), dtype=np.float32)
+        for start in range(0, len(texts), batch_size):
+            idx = order[start:start + batch_size]
+            vectors = self._encode_batch([texts[i] for i in idx])
+            if out.shape[1] == 0:
+                out = np.zeros((len(texts), vectors.shape[1]), dtype=np.float32)
+            out[idx] = vectors
+        if normalize_embeddings:
+            out /= np.clip(np.linalg.norm(out, axis=1, keepdims=True), 1e-12, None)
+        return out[0] if single else out
+
+
+def export(model_dir: str = ONNX_DIR, model_name: str = EMBEDDING_MODEL):
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(model_dir, exist_ok=True)
+    hf_name = f"sentence-transformers/{model_name}"
+    tokenizer = AutoTokenizer.from_pretrained(hf_name)
+    model = AutoModel.from_pretrained(hf_name).eval()
+    tokenizer.backend_tokenizer.save(os.path.join(model_dir, "tokenizer.json"))
+
+    sample = tokenizer(["Which IPs had the most outbound traffic?"], return_tensors="pt")
+    names = ["input_ids", "attention_mask", "token_type_ids"]
+    dynamic = {name: {0: "batch", 1: "sequence"} for name in names}
+    dynamic["last_hidden_state"] = {0: "batch", 1: "sequence"}
+    fp32 = os.path.join(model_dir, "model.onnx")
+    with torch.no_grad():
+        torch.onnx.export(
+            model, tuple(sample[n] for n in names), fp32, input_names=names,
+            output_names=["last_hidden_state"], dynamic_axes=dynamic, opset_version=14,
+        )
+    quantize_dynamic(fp32, os.path.join(model_dir, "model.int8.onnx"), weight_type=QuantType.QInt8)
+    print(f"exported {hf_name} to {model_dir}")
+
+
+def _latency_ms(encode, texts: list, batch_size: int, repeat: int = 3) -> float:
+    encode(texts[:batch_size], batch_size=batch_size)  # warm-up
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        encode(texts, batch_size=batch_size)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000 / len(texts)
+
+
+def bench(model_dir: str = ONNX_DIR):
+    from sentence_transformers import SentenceTransformer
+
+    texts = log_examples + chart_query_examples
+    reference = SentenceTransformer(EMBEDDING_MODEL)
+    encoders = {"torch fp32": reference.encode,
+                "onnx fp32": OnnxEncoder(model_dir, quantized=False).encode,
+                "onnx int8": OnnxEncoder(model_dir).encode}
+    expected = reference.encode(texts, normalize_embeddings=True)
+    print(f"{'encoder':<12} {'min cos':>8} {'1 query ms':>11} {'batch ms/q':>11}")
+    for name, encode in encoders.items():
+        got = encode(texts, normalize_embeddings=True)
+        similarity = float(np.min(np.sum(expected * got, axis=1)))
+        single = _latency_ms(encode, texts, batch_size=1)
+        batched = _latency_ms(encode, texts, batch_size=32)
+        flag = "" if similarity >= ENCODER_TOLERANCE else "  (below tolerance)"
+        print(f"{name:<12} {similarity:>8.4f} {single:>11.2f} {batched:>11.2f}{flag}")
+    for model in ("model.onnx", "model.int8.onnx"):
+        print(f"{model}: {os.path.getsize(os.path.join(model_dir, model)) / 1e6:.1f} MB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export and benchmark the ONNX MiniLM encoder.")
+    parser.add_argument("command", choices=["export", "bench"])
+    parser.add_argument("--model-dir", default=ONNX_DIR)
+    args = parser.parse_args(argv)
+    if args.command == "export":
+        export(args.model_dir)
+    else:
+        bench(args.model_dir)
+
+
+if __name__ == "__main__":
+    main()
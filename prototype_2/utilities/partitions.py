@@ -0,0 +1,256 @@
+"""
+Optional time-partitioned layout for the log tables.
+
+Rows of each log type live in daily (or hourly) shard tables such as vpc_logs_p20250413, listed in the
+log_partitions catalog with their [start_epoch, end_epoch) range. A view keeps the name the LLM prompt
+expects (vpc_logs = UNION ALL of its shards), so generated SQL runs unchanged, and PartitionPruner
+narrows a query to the shards its ts_epoch predicates can touch by shadowing that view with a CTE.
+Retention is a DROP TABLE per shard instead of a DELETE over the whole table.
+
+    python -m utilities.partitions --src logs2.db --dst logs_partitioned.db --granularity day
+    python -m utilities.partitions --dst logs_partitioned.db --drop-before 2025-01-01
+"""
+from utilities.create_logs_db import TABLES, UNIQUE_INDEXES, SECONDARY_INDEXES
+from utilities.sql_text import flat_conjuncts, has_nested_select, split_clauses, table_aliases
+from datetime import datetime, timedelta, timezone
+import argparse
+import calendar
+import re
+import sqlite3
+import threading
+
+
+GRANULARITIES = {"day": ("%Y%m%d", timedelta(days=1)), "hour": ("%Y%m%d%H", timedelta(hours=1))}
+MAX_COMPOUND_SELECT = 500  # SQLite's default SQLITE_MAX_COMPOUND_SELECT
+
+
+def create_catalog(conn: sqlite3.Connection, granularity: str = "day"):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS log_partitions (
+        name TEXT PRIMARY KEY,
+        log_type TEXT,
+        start_epoch INTEGER,
+        end_epoch INTEGER
+    );
+    """)
+    conn.execute("CREATE TABLE IF NOT EXISTS log_partition_layout (granularity TEXT);")
+    if conn.execute("SELECT COUNT(*) FROM log_partition_layout").fetchone()[0] == 0:
+        conn.execute("INSERT INTO log_partition_layout VALUES (?)", (granularity,))
+
+
+def is_partitioned(conn: sqlite3.Connection) -> bool:
+    return conn.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'log_partitions'"
+    ).fetchone()[0] > 0
+
+
+def layout_granularity(conn: sqlite3.Connection) -> str:
+    return conn.execute("SELECT granularity FROM log_partition_layout").fetchone()[0]
+
+
+def _bucket_start(timestamp: str, granularity: str) -> datetime:
+    dt = datetime.fromisoformat(timestamp)
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    dt = dt.replace(minute=0, second=0, microsecond=0)
+    return dt.replace(hour=0) if granularity == "day" else dt
+
+
+def partition_name(log_type: str, start: datetime, granularity: str) -> str:
+    return f"{log_type}_p{start.strftime(GRANULARITIES[granularity][0])}"
+
+
+def _shard_ddl(log_type: str, shard: str) -> list:
+    ddl = [TABLES[log_type].replace(f"EXISTS {log_type} (", f"EXISTS {shard} (")]
+    for index in UNIQUE_INDEXES + SECONDARY_INDEXES:
+        if f" ON {log_type}(" in index:
+            ddl.append(index.replace(f"_{log_type}_", f"_{shard}_").replace(f" ON {log_type}(", f" ON {shard}("))
+    return ddl
+
+
+def rebuild_view(conn: sqlite3.Connection, log_type: str):
+    shards = [r[0] for r in conn.execute(
+        "SELECT name FROM log_partitions WHERE log_type = ? ORDER BY start_epoch", (log_type,)
+    )]
+    for (name,) in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'view' AND (name = ? OR name LIKE ?)", (log_type, f"{log_type}_pu%")
+    ).fetchall():
+        conn.execute(f"DROP VIEW IF EXISTS {name}")
+    if conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = ?", (log_type,)).fetchone()[0]:
+        return  # still the monolithic table
+    placeholder = f"{log_type}_p00000000"
+    if shards:
+        conn.execute(f"DROP TABLE IF EXISTS {placeholder}")
+    else:
+        # Keep the name resolvable (with the right columns) before the first row arrives
+        conn.execute(_shard_ddl(log_type, placeholder)[0])
+        shards = [placeholder]
+    # A compound SELECT is limited to MAX_COMPOUND_SELECT terms, so large layouts nest union views
+    groups = [shards[i:i + MAX_COMPOUND_SELECT] for i in range(0, len(shards), MAX_COMPOUND_SELECT)]
+    if len(groups) > 1:
+        for i, group in enumerate(groups):
+            conn.execute(f"CREATE VIEW {log_type}_pu{i} AS " + " UNION ALL ".join(f"SELECT * FROM {s}" for s in group))
+        shards = [f"{log_type}_pu{i}" for i in range(len(groups))]
+    conn.execute(f"CREATE VIEW {log_type} AS " + " UNION ALL ".join(f"SELECT * FROM {s}" for s in shards))
+
+
+def ensure_partition(conn: sqlite3.Connection, log_type: str, start: datetime, granularity: str) -> str:
+    shard = partition_name(log_type, start, granularity)
+    exists = conn.execute("SELECT 1 FROM log_partitions WHERE name = ?", (shard,)).fetchone()
+    if exists is None:
+        for ddl in _shard_ddl(log_type, shard):
+            conn.execute(ddl)
+        end = start + GRANULARITIES[granularity][1]
+        conn.execute(
+            "INSERT INTO log_partitions VALUES (?, ?, ?, ?)",
+            (shard, log_type, calendar.timegm(start.timetuple()), calendar.timegm(end.timetuple())),
+        )
+        rebuild_view(conn, log_type)
+    return shard
+
+
+def insert_partitioned(conn: sqlite3.Connection, log_type: str, columns: list, rows: list) -> int:
+    """Routes rows (sequences in `columns` order) to their shards; duplicates by request_id are skipped."""
+    granularity = layout_granularity(conn)
+    ts = columns.index("timestamp")
+    by_shard = {}
+    for row in rows:
+        by_shard.setdefault(_bucket_start(row[ts], granularity), []).append(row)
+    inserted = 0
+    for start, shard_rows in by_shard.items():
+        shard = ensure_partition(conn, log_type, start, granularity)
+        inserted += conn.executemany(
+            f"INSERT OR IGNORE INTO {shard} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            shard_rows,
+        ).rowcount
+    return inserted
+
+
+def drop_partitions_before(conn: sqlite3.Connection, epoch: int) -> list:
+    dropped = conn.execute("SELECT name, log_type FROM log_partitions WHERE end_epoch <= ?", (epoch,)).fetchall()
+    for shard, _ in dropped:
+        conn.execute("DELETE FROM log_partitions WHERE name = ?", (shard,))
+    for log_type in {log_type for _, log_type in dropped}:
+        rebuild_view(conn, log_type)
+    for shard, _ in dropped:
+        conn.execute(f"DROP TABLE IF EXISTS {shard}")
+    return [shard for shard, _ in dropped]
+
+
+_UNSAFE = re.compile(r"\b(or|not|case|left|right|full)\b", re.I)
+_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_BOUND_VALUE = r"(?:-?\d+|CAST\(strftime\('%s',(?:[^()']|'[^']*'|\((?:[^()']|'[^']*')*\))*\) AS INTEGER\)(?:\s*\+\s*\d+)?)"
+_BOUND = re.compile(rf"(?<![\w.])(?:([A-Za-z_]\w*)\.)?ts_epoch\s*(>=|<=|=|>|<)\s*({_BOUND_VALUE})", re.I)
+
+
+class PartitionPruner:
+    """
+    Narrows a query to the shards its time predicates can touch.
+    Lower/upper bounds are read from the AND-ed `ts_epoch OP value` terms of the WHERE clause of a
+    single SELECT (as produced by utilities/time_rewrite.py); comparisons anywhere else (the SELECT
+    list, CASE, HAVING) do not filter rows and are ignored. Anything that could make the bounds
+    non-restrictive (OR, NOT, outer joins, a CTE or subquery, a log table referenced twice) disables
+    pruning for the query, which then runs on the views.
+    """
+
+    def __init__(self):
+        self._catalog = (None, {})  # schema_version -> {log_type: [(name, start, end)]}
+        self._lock = threading.Lock()
+
+    def catalog(self, conn: sqlite3.Connection, schema_version: int) -> dict:
+        with self._lock:
+            if self._catalog[0] != schema_version:
+                shards = {}
+                if is_partitioned(conn):
+                    for name, log_type, start, end in conn.execute(
+                        "SELECT name, log_type, start_epoch, end_epoch FROM log_partitions ORDER BY start_epoch"
+                    ):
+                        shards.setdefault(log_type, []).append((name, start, end))
+                self._catalog = (schema_version, shards)
+            return self._catalog[1]
+
+    def prune(self, conn: sqlite3.Connection, sql: str, schema_version: int) -> str:
+        catalog = self.catalog(conn, schema_version)
+        if not catalog:
+            return sql
+        unquoted = _LITERAL.sub("''", sql)
+        if _UNSAFE.search(unquoted) or has_nested_select(sql):
+            return sql
+        clauses = split_clauses(sql)
+        if clauses is None or "where" not in clauses:
+            return sql
+        aliases = table_aliases(unquoted, catalog)
+        referenced = set(aliases.values())
+        references = {t: len(re.findall(rf"\b(?:from|join)\s+{t}\b", unquoted, re.I)) for t in referenced}
+        bounds = {t: [None, None] for t in referenced if references[t] == 1}
+        terms = [_BOUND.fullmatch(term) for term in flat_conjuncts(clauses["where"])]
+        for qualifier, op, value in (m.groups() for m in terms if m is not None):
+            if qualifier:
+                table = aliases.get(qualifier.lower())
+            else:
+                table = next(iter(referenced)) if len(referenced) == 1 else None
+            if table not in bounds:
+                continue
+            epoch = int(value) if re.fullmatch(r"-?\d+", value) else conn.execute(f"SELECT {value}").fetchone()[0]
+            if epoch is None:
+                continue
+            low, high = bounds[table]
+            if op in (">=", ">", "="):
+                bounds[table][0] = epoch if low is None else max(low, epoch)
+            if op in ("<=", "<", "="):
+                # Upper bound kept inclusive; '<' only makes it tighter, which is still safe
+                bounds[table][1] = epoch if high is None else min(high, epoch)
+
+        ctes = []
+        for table, (low, high) in bounds.items():
+            if low is None and high is None:
+                continue
+            shards = [name for name, start, end in catalog[table]
+                      if (low is None or end > low) and (high is None or start <= high)]
+            if len(shards) == len(catalog[table]) or len(shards) > MAX_COMPOUND_SELECT:
+                continue
+            body = " UNION ALL ".join(f"SELECT * FROM {s}" for s in shards) or \
+                f"SELECT * FROM {catalog[table][0][0]} WHERE 0"
+            ctes.append(f"{table} AS ({body})")
+        if not ctes:
+            return sql
+        return "WITH " + ", ".join(ctes) + " " + sql
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or maintain the time-partitioned logs DB layout.")
+    parser.add_argument("--src", help="monolithic logs DB to copy rows from")
+    parser.add_argument("--dst", required=True, help="partitioned logs DB")
+    parser.add_argument("--granularity", choices=list(GRANULARITIES), default="day")
+    parser.add_argument("--drop-before", help="drop shards that end before this date (YYYY-MM-DD)")
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.dst, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("BEGIN")
+    create_catalog(conn, args.granularity)
+    for log_type in TABLES:
+        rebuild_view(conn, log_type)
+    if args.src:
+        conn.execute("ATTACH DATABASE ? AS src", (args.src,))
+        for log_type in TABLES:
+            columns = [r[1] for r in conn.execute(f"PRAGMA src.table_info({log_type})")]
+            cursor = conn.execute(f"SELECT {', '.join(columns)} FROM src.{log_type}")
+            copied = 0
+            while True:
+                rows = cursor.fetchmany(50_000)
+                if not rows:
+                    break
+                copied += insert_partitioned(conn, log_type, columns, rows)
+            print(f"{log_type}: {copied} rows")
+    if args.drop_before:
+        cutoff = calendar.timegm(datetime.strptime(args.drop_before, "%Y-%m-%d").timetuple())
+        print(f"dropped {len(drop_partitions_before(conn, cutoff))} shards")
+    conn.execute("COMMIT")
+    if args.src:
+        conn.execute("DETACH DATABASE src")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import os
+import sqlite3
+import time
+
+
+QUERY_TIMEOUT_S = float(os.environ.get("LOGBOT_QUERY_TIMEOUT_S", "15"))
+QUERY_MAX_STEPS = int(os.environ.get("LOGBOT_QUERY_MAX_STEPS", "200000000"))
+PROGRESS_INTERVAL = 10000  # SQLite VM instructions between progress-handler calls
+
+
+class QueryGuard:
+    """
+    Time and VM-step budget for one query on one SQLite connection.
+    While armed, SQLite's progress handler checks the budget every PROGRESS_INTERVAL instructions and
+    aborts the statement once it is spent; cancel() aborts it from any thread via conn.interrupt().
+    Either way the running call raises sqlite3.OperationalError and `reason` says why
+    ("timeout", "steps" or "cancelled"). The budget restarts on every arm(), i.e. per page fetched.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, timeout_s: float = QUERY_TIMEOUT_S,
+                 max_steps: int = QUERY_MAX_STEPS):
+        self.conn = conn
+        self.timeout_s = timeout_s
+        self.max_steps = max_steps
+        self.reason = None
+        self.steps = 0
+        self._deadline = None
+
+    def _check(self) -> int:
+        self.steps += PROGRESS_INTERVAL
+        if self.reason is not None:
+            return 1
+        if self.timeout_s and time.monotonic() > self._deadline:
+            self.reason = "timeout"
+        elif self.max_steps and self.steps > self.max_steps:
+            self.reason = "steps"
+        return 1 if self.reason else 0
+
+    def arm(self):
+        self.steps = 0
+        self._deadline = time.monotonic() + (self.timeout_s or 0)
+        self.conn.set_progress_handler(self._check, PROGRESS_INTERVAL)
+
+    def disarm(self):
+        self.conn.set_progress_handler(None, PROGRESS_INTERVAL)
+
+    def cancel(self):
+        self.reason = self.reason or "cancelled"
+        self.conn.interrupt()
+
+    def __enter__(self):
+        self.arm()
+        return self
+
+    def __exit__(self, *exc):
+        self.disarm()
+        return False
@@ -0,0 +1,164 @@
+"""
+Logistic-regression relevance head on MiniLM embeddings, a cheap replacement for the BART zero-shot check.
+
+    python -m utilities.relevance_head train --data labeled.csv   # writes models/relevance_head.npz
+    python -m utilities.relevance_head eval --data labeled.csv    # 5-fold CV vs the kNN rule (and BART if enabled)
+
+Training data is log_examples + chart_query_examples (positives), non_log_examples (negatives) and any
+labeled CSV/JSONL files with `question` and `label` (1/0, true/false or log_query/non_log_query).
+The head is L2-regularized logistic regression fit by Newton's method (IRLS), so its outputs are
+probabilities fit on log-loss; eval reports log-loss, Brier score and expected calibration error next to
+accuracy. The artifact records the encoder it was trained on and is refused by another one.
+"""
+from utilities import is_relevant
+import argparse
+import csv
+import json
+import numpy as np
+import os
+
+
+HEAD_PATH = os.environ.get("LOGBOT_RELEVANCE_HEAD", os.path.join("models", "relevance_head.npz"))
+_TRUE = {"1", "true", "yes", "log_query", "log"}
+_FALSE = {"0", "false", "no", "non_log_query", "non_log"}
+
+
+def _sigmoid(z: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-np.clip(z, -30, 30)))
+
+
+def fit_logistic(X: np.ndarray, y: np.ndarray, l2: float = 1.0, max_iter: int = 50, tol: float = 1e-6) -> np.ndarray:
+    """Weights (bias last) minimizing log-loss + l2/2 * |w|^2 (bias not penalized)."""
+    Xb = np.hstack([X, np.ones((len(X), 1), dtype=X.dtype)]).astype(np.float64)
+    w = np.zeros(Xb.shape[1])
+    penalty = np.full(Xb.shape[1], l2)
+    penalty[-1] = 0.0
+    for _ in range(max_iter):
+        p = _sigmoid(Xb @ w)
+        gradient = Xb.T @ (p - y) + penalty * w
+        hessian = (Xb * (p * (1 - p))[:, None]).T @ Xb + np.diag(penalty + 1e-9)
+        step = np.linalg.solve(hessian, gradient)
+        w -= step
+        if np.max(np.abs(step)) < tol:
+            break
+    return w
+
+
+class RelevanceHead:
+    def __init__(self, weights: np.ndarray, encoder: str, threshold: float = 0.5):
+        self.weights = weights
+        self.encoder = encoder
+        self.threshold = threshold
+
+    def predict_proba(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float64))
+        return _sigmoid(vectors @ self.weights[:-1] + self.weights[-1])
+
+    def save(self, path: str = HEAD_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        np.savez(path, weights=self.weights, encoder=self.encoder, threshold=self.threshold)
+
+    @classmethod
+    def load(cls, path: str = HEAD_PATH) -> "RelevanceHead":
+        data = np.load(path)
+        head = cls(data["weights"], str(data["encoder"]), float(data["threshold"]))
+        if head.encoder != is_relevant.encoder_name():
+            raise ValueError(f"{path} was trained on {head.encoder} embeddings, not {is_relevant.encoder_name()}")
+        return head
+
+
+def _label(value) -> int:
+    text = str(value).strip().lower()
+    if text in _TRUE:
+        return 1
+    if text in _FALSE:
+        return 0
+    raise ValueError(f"unknown label {value!r}")
+
+
+def load_labeled(paths) -> tuple:
+    questions, labels = [], []
+    for path in paths or []:
+        with open(path, encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()] if path.endswith((".jsonl", ".json")) \
+                else list(csv.DictReader(f))
+        for row in rows:
+            questions.append(row["question"])
+            labels.append(_label(row["label"]))
+    return questions, labels
+
+
+def training_set(paths=None) -> tuple:
+    positives = is_relevant.log_examples + is_relevant.chart_query_examples
+    questions = positives + is_relevant.non_log_examples
+    labels = [1] * len(positives) + [0] * len(is_relevant.non_log_examples)
+    extra_questions, extra_labels = load_labeled(paths)
+    return questions + extra_questions, np.array(labels + extra_labels, dtype=np.float64)
+
+
+def features(questions) -> np.ndarray:
+    # The head sees questions the way is_relevant_log_query does (numbers folded to N)
+    return is_relevant.encode([is_relevant.normalize_query(q) for q in questions])
+
+
+def _metrics(y: np.ndarray, p: np.ndarray, threshold: float = 0.5) -> dict:
+    eps = 1e-12
+    bins = np.minimum((p * 10).astype(int), 9)
+    ece = sum(abs(p[bins == b].mean() - y[bins == b].mean()) * np.mean(bins == b) for b in range(10) if np.any(bins == b))
+    return {
+        "accuracy": float(np.mean((p >= threshold) == (y == 1))),
+        "log_loss": float(-np.mean(y * np.log(p + eps) + (1 - y) * np.log(1 - p + eps))),
+        "brier": float(np.mean((p - y) ** 2)),
+        "ece": float(ece),
+    }
+
+
+def cross_validate(X: np.ndarray, y: np.ndarray, folds: int = 5, l2: float = 1.0, seed: int = 0) -> np.ndarray:
+    """Out-of-fold probabilities from stratified k-fold training."""
+    rng = np.random.default_rng(seed)
+    fold_of = np.zeros(len(y), dtype=int)
+    for label in (0, 1):
+        idx = rng.permutation(np.flatnonzero(y == label))
+        fold_of[idx] = np.arange(len(idx)) % folds
+    out = np.zeros(len(y))
+    for k in range(folds):
+        test = fold_of == k
+        head = RelevanceHead(fit_logistic(X[~test], y[~test], l2), is_relevant.encoder_name())
+        out[test] = head.predict_proba(X[test])
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train or evaluate the relevance classifier head.")
+    parser.add_argument("command", choices=["train", "eval"])
+    parser.add_argument("--data", nargs="*", default=[], help="labeled CSV/JSONL files (question, label)")
+    parser.add_argument("--out", default=HEAD_PATH)
+    parser.add_argument("--l2", type=float, default=1.0)
+    parser.add_argument("--folds", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    questions, y = training_set(args.data)
+    X = features(questions)
+    print(f"{len(y)} questions ({int(y.sum())} log, {int(len(y) - y.sum())} non-log), encoder {is_relevant.encoder_name()}")
+    if args.command == "train":
+        head = RelevanceHead(fit_logistic(X, y, args.l2), is_relevant.encoder_name())
+        head.save(args.out)
+        print(f"train {_metrics(y, head.predict_proba(X))}")
+        print(f"saved to {args.out}")
+        return
+
+    # Out-of-fold only for the head: the kNN rule would trivially match the banks it was built from,
+    # so it is scored on the non-log examples and the extra labeled data alone.
+    p = cross_validate(X, y, args.folds, args.l2)
+    print(f"head (cv)   {_metrics(y, p)}")
+    held_out = len(is_relevant.log_examples) + len(is_relevant.chart_query_examples)
+    knn = is_relevant.log_query_scores(questions[held_out:]) > 0.5
+    print(f"kNN > 0.5   accuracy on non-bank questions {float(np.mean(knn == (y[held_out:] == 1))):.3f}")
+    print(f"head (cv)   accuracy on non-bank questions {float(np.mean((p[held_out:] >= 0.5) == (y[held_out:] == 1))):.3f}")
+    if is_relevant.ZERO_SHOT_ENABLED:
+        bart = np.array([is_relevant.is_relevant_log_query_zero_shot(q) for q in questions])
+        print(f"BART        accuracy {float(np.mean(bart == (y == 1))):.3f}")
+
+
+if __name__ == "__main__":
+    main()
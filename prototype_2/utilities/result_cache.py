@@ -0,0 +1,103 @@
+from collections import OrderedDict
+import hashlib
+import re
+import sys
+import threading
+
+
+_SQL_TOKEN = re.compile(
+    r"""'(?:[^']|'')*'|"(?:[^"]|"")*"|`[^`]*`|\[[^\]]*\]|--[^\n]*|/\*.*?\*/|\s+|[^'"`\[\s]""",
+    re.S,
+)
+
+
+def normalize_sql(sql: str) -> str:
+    """Drops comments, collapses whitespace and lowercases everything outside literals and quoted names."""
+    parts = []
+    for token in _SQL_TOKEN.findall(sql):
+        if token.startswith(("--", "/*")) or token.isspace():
+            if parts and parts[-1] != " ":
+                parts.append(" ")
+        elif token[0] in "'\"`[":
+            parts.append(token)
+        else:
+            parts.append(token.lower())
+    return "".join(parts).strip().rstrip(";").strip()
+
+
+def sql_fingerprint(sql: str) -> str:
+    return hashlib.sha1(normalize_sql(sql).encode()).hexdigest()
+
+
+def estimate_size(rows, columns) -> int:
+    size = sys.getsizeof(rows) + sum(sys.getsizeof(c) for c in columns)
+    for row in rows:
+        size += sys.getsizeof(row) + sum(sys.getsizeof(v) for v in row)
+    return size
+
+
+class ResultCache:
+    """
+    LRU cache of query results keyed by normalized SQL fingerprint + database version.
+    The version is DBVersion.current() (schema_version, data_version), so any committed ingest, from
+    csv_to_db.py or any other loader/process, makes older entries unreachable; they are dropped the
+    first time a newer version is seen. Memory is bounded by `max_bytes` (estimated with getsizeof).
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # fingerprint -> (version, rows, columns, size)
+        self._version = None
+
+    def _invalidate_older(self, version):
+        if version != self._version:
+            self._version = version
+            for key in [k for k, e in self._entries.items() if e[0] != version]:
+                self.current_bytes -= self._entries.pop(key)[3]
+
+    def get(self, sql: str, version):
+        key = sql_fingerprint(sql)
+        with self._lock:
+            self._invalidate_older(version)
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1], entry[2]
+
+    def put(self, sql: str, version, rows, columns):
+        size = estimate_size(rows, columns)
+        if size > self.max_bytes:
+            return
+        key = sql_fingerprint(sql)
+        with self._lock:
+            self._invalidate_older(version)
+            if version != self._version:
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[3]
+            self._entries[key] = (version, rows, columns, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= evicted[3]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+        }
@@ -0,0 +1,155 @@
+from utilities.result_cache import estimate_size
+from utilities.sql_text import mask_literals, strip_comments, top_level_matches
+import os
+import re
+import threading
+
+
+PAGE_SIZE = int(os.environ.get("LOGBOT_PAGE_SIZE", "500"))
+MAX_ROWS = int(os.environ.get("LOGBOT_MAX_ROWS", "100000"))
+MAX_RESULT_BYTES = int(os.environ.get("LOGBOT_MAX_RESULT_BYTES", str(64 * 1024 * 1024)))
+
+_ORDER_BY = re.compile(r"\border\s+by\b", re.I)
+_LIMIT_WORD = re.compile(r"\blimit\b", re.I)
+_LIMIT = re.compile(r"\blimit\s+(\d+)\s*(?:offset\s+(\d+)|,\s*(\d+))?\s*$", re.I)
+
+
+def page_sql(sql: str, limit: int, offset: int):
+    """
+    `sql` narrowed to rows [offset, offset + limit) of its own result, or None when that result has no
+    defined order to page by (no top-level ORDER BY) or its LIMIT is not a plain number.
+    The paging goes into the statement's own LIMIT, so each page is cut from the same ORDER BY.
+    """
+    sql = strip_comments(sql).strip().rstrip(";").strip()
+    order = top_level_matches(sql, _ORDER_BY)
+    if not order:
+        return None
+    limits = [m for m in top_level_matches(sql, _LIMIT_WORD) if m.start() > order[-1].start()]
+    if not limits:
+        return f"{sql}\nLIMIT {int(limit)} OFFSET {int(offset)}"
+    match = _LIMIT.search(mask_literals(sql), limits[-1].start())
+    if match is None:
+        return None
+    if match.group(3) is not None:
+        skip, count = int(match.group(1)), int(match.group(3))  # LIMIT skip, count
+    else:
+        skip, count = int(match.group(2) or 0), int(match.group(1))
+    return f"{sql[:match.start()]}LIMIT {max(0, min(int(limit), count - int(offset)))} OFFSET {skip + int(offset)}"
+
+
+class ResultPager:
+    """
+    Pages a query result without holding on to its connection.
+    The first page is read from the cursor the query was executed on, which is closed right after, so
+    the caller can release its pooled connection at once. For a statement with an ORDER BY, later pages
+    re-run it narrowed with page_sql() through `run_page(sql) -> dict` (which checks out, and gives back,
+    a connection of its own and returns {"result": rows} or execute_query's timed_out/cancelled result),
+    so an idle or abandoned chat session keeps no connection, cursor or read snapshot open. Rows that
+    tie on the ORDER BY may swap places between two pages. A statement without an ORDER BY has no
+    stable pages: its rows are read up front (within the row/byte caps) and handed out page by page.
+    Reading stops once the result is exhausted, a row/byte cap is hit (truncated=True), a page is
+    stopped by its budget or cancelled (timed_out/cancelled=True) or close() is called.
+    An optional QueryGuard is armed around the reads from the cursor so they get the per-query budget.
+    Columns named in `hidden` (e.g. ts_epoch, which SELECT * picks up) are left out of `columns` and rows.
+    """
+
+    def __init__(self, cursor, sql: str, run_page=None, guard=None, page_size: int = PAGE_SIZE,
+                 max_rows: int = MAX_ROWS, max_bytes: int = MAX_RESULT_BYTES, hidden=()):
+        names = [desc[0] for desc in cursor.description]
+        keep = [i for i, name in enumerate(names) if name not in hidden]
+        self.columns = [names[i] for i in keep]  # 👈 column names
+        self._keep = keep if len(keep) < len(names) else None
+        self.sql = sql
+        self.page_size = page_size
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.rows_fetched = 0
+        self.bytes_fetched = 0
+        self.exhausted = False
+        self.truncated = False
+        self.timed_out = False
+        self.cancelled = False
+        self._cursor = cursor
+        self._run_page = run_page if run_page is not None and page_sql(sql, 1, 0) is not None else None
+        self._guard = guard
+        self._buffer = None  # the rest of an unordered result, read with the first page
+        self._buffer_cut = False  # the caps stopped that read before the result ended
+        self._done = False
+        self._lock = threading.Lock()
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    def _read_all(self, cursor) -> list:
+        rows, size = [], 0
+        while len(rows) <= self.max_rows and size < self.max_bytes:
+            chunk = cursor.fetchmany(self.page_size)
+            if not chunk:
+                return rows
+            rows.extend(chunk)
+            size += estimate_size(chunk, [])
+        self._buffer_cut = True
+        return rows
+
+    def _read(self, wanted: int) -> list:
+        # One row more than wanted tells whether there is anything after this page
+        if self._buffer is not None:
+            rows, self._buffer = self._buffer[:wanted + 1], self._buffer[wanted:]
+            return rows
+        if self._cursor is None:
+            page = self._run_page(page_sql(self.sql, wanted + 1, self.rows_fetched))
+            self.timed_out, self.cancelled = bool(page.get("timed_out")), bool(page.get("cancelled"))
+            return page["result"]
+        cursor, self._cursor = self._cursor, None
+        if self._guard is not None:
+            self._guard.arm()
+        try:
+            if self._run_page is not None:
+                return cursor.fetchmany(wanted + 1)
+            rows = self._read_all(cursor)
+            self._buffer = rows[wanted:]
+            return rows[:wanted + 1]
+        finally:
+            if self._guard is not None:
+                self._guard.disarm()
+            cursor.close()
+
+    def fetch_page(self) -> list:
+        with self._lock:
+            if self._done:
+                return []
+            wanted = min(self.page_size, self.max_rows - self.rows_fetched)
+            try:
+                rows = self._read(wanted)
+            except Exception:
+                self._done = True
+                raise
+            if self.timed_out or self.cancelled:
+                self._done = True
+                return []
+            more, rows = len(rows) > wanted, rows[:wanted]
+            if self._keep is not None:
+                rows = [tuple(row[i] for i in self._keep) for row in rows]
+            self.rows_fetched += len(rows)
+            self.bytes_fetched += estimate_size(rows, [])
+            if not more:
+                self._done = True
+                if self._buffer_cut:
+                    self.truncated = True
+                else:
+                    self.exhausted = True
+            elif self.rows_fetched >= self.max_rows or self.bytes_fetched >= self.max_bytes:
+                self.truncated = self._done = True
+            elif self._run_page is None and self._buffer is None:
+                # Nothing to fetch later pages with: what was read is all there will be
+                self.truncated = self._done = True
+            return rows
+
+    def close(self):
+        with self._lock:
+            self._done = True
+            self._buffer = None
+            cursor, self._cursor = self._cursor, None
+            if cursor is not None:
+                cursor.close()
@@ -0,0 +1,483 @@
+"""
+Pre-aggregated rollup tables for the common dashboard questions, kept current by the loaders.
+
+For each log type a rollup_<log>_<grain> table (grain = minute, hour, day) holds one row per
+(ts_epoch bucket, dimensions) with the row count and, per measure, its sum / non-null count / min / max:
+
+    rollup_vpc_logs_hour(bucket, action, src_ip, row_count, sum_bytes_sent, cnt_bytes_sent, ...)
+
+refresh_rollups() folds in the rows appended since the last refresh (rowid > watermark in rollup_state),
+so tail_ingest and csv_to_db keep the rollups up to date inside their own transactions. The log tables
+are append-only; anything that deletes or updates log rows must call rebuild_rollups() afterwards.
+
+RollupRewriter answers single-table aggregate queries from the coarsest rollup that can produce the
+exact same result (COUNT/SUM/AVG/MIN/MAX over the dimensions and time buckets it stores, filtered
+by dimension predicates and bucket-aligned ts_epoch bounds). Anything else, or a rollup whose
+watermark is behind its log table, falls back to the raw table.
+
+    python -m utilities.rollups --db logs2.db            # create and catch up
+    python -m utilities.rollups --db logs2.db --rebuild  # recompute from scratch
+"""
+from utilities.create_logs_db import create_tables
+from utilities.sql_text import split_clauses, split_conjuncts, split_top_level, strip_parens
+import argparse
+import re
+import sqlite3
+import threading
+import time
+
+
+GRAINS = {"minute": 60, "hour": 3600, "day": 86400}
+# log type -> (dimensions, measures). Dimensions are low-cardinality columns the questions group and
+# filter by; dst_ip and user_id are left out, they would make the rollups as large as the logs.
+ROLLUPS = {
+    "vpc_logs": (("action", "src_ip"), ("bytes_sent",)),
+    "access_logs": (("endpoint", "method", "status_code"), ()),
+    "execution_logs": (("function_name", "status"), ("duration_ms",)),
+}
+
+
+def rollup_name(log_type: str, grain: str) -> str:
+    return f"rollup_{log_type}_{grain}"
+
+
+def has_rollups(conn: sqlite3.Connection) -> bool:
+    return conn.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'rollup_state'"
+    ).fetchone()[0] > 0
+
+
+def _is_table(conn: sqlite3.Connection, name: str) -> bool:
+    return conn.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).fetchone()[0] > 0
+
+
+def _max_rowid(conn: sqlite3.Connection, log_type: str) -> int:
+    return conn.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM {log_type}").fetchone()[0]
+
+
+def create_rollups(conn: sqlite3.Connection):
+    """Creates the rollup tables (empty, watermark 0). Only the monolithic layout is supported: rollups
+    need the log tables' rowids, which the partitioned layout's views do not have."""
+    conn.execute("CREATE TABLE IF NOT EXISTS rollup_state (log_type TEXT PRIMARY KEY, max_rowid INTEGER);")
+    for log_type, (dims, measures) in ROLLUPS.items():
+        if not _is_table(conn, log_type):
+            continue
+        types = {r[1]: r[2] for r in conn.execute(f"PRAGMA table_info({log_type})")}
+        columns = ["bucket INTEGER"] + [f"{d} {types[d]}" for d in dims] + ["row_count INTEGER NOT NULL"]
+        for m in measures:
+            columns += [f"sum_{m} {types[m]}", f"cnt_{m} INTEGER", f"min_{m} {types[m]}", f"max_{m} {types[m]}"]
+        for grain in GRAINS:
+            conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {rollup_name(log_type, grain)} "
+                f"({', '.join(columns)}, PRIMARY KEY (bucket, {', '.join(dims)}));"
+            )
+        conn.execute("INSERT OR IGNORE INTO rollup_state VALUES (?, 0)", (log_type,))
+
+
+def _merge(column: str, how: str) -> str:
+    # NULL-preserving merge of an existing aggregate with the incoming one (excluded.*)
+    new = f"excluded.{column}"
+    if how == "add":
+        return f"{column} = CASE WHEN {column} IS NULL THEN {new} WHEN {new} IS NULL THEN {column} ELSE {column} + {new} END"
+    return f"{column} = COALESCE({how}({column}, {new}), {column}, {new})"
+
+
+def _fold(conn: sqlite3.Connection, log_type: str, after_rowid: int, through_rowid: int):
+    dims, measures = ROLLUPS[log_type]
+    keys = ", ".join(dims)
+    for grain, seconds in GRAINS.items():
+        select = [f"(ts_epoch / {seconds}) * {seconds}", *dims, "COUNT(*)"]
+        merges = [_merge("row_count", "add")]
+        for m in measures:
+            select += [f"SUM({m})", f"COUNT({m})", f"MIN({m})", f"MAX({m})"]
+            merges += [_merge(f"sum_{m}", "add"), _merge(f"cnt_{m}", "add"),
+                       _merge(f"min_{m}", "MIN"), _merge(f"max_{m}", "MAX")]
+        # Rows with a NULL dimension never conflict (NULLs are distinct in the key) and get rows of
+        # their own; the rewritten queries re-aggregate, so the results are the same.
+        conn.execute(
+            f"INSERT INTO {rollup_name(log_type, grain)} SELECT {', '.join(select)} FROM {log_type} "
+            f"WHERE rowid > ? AND rowid <= ? GROUP BY 1, {keys} "
+            f"ON CONFLICT (bucket, {keys}) DO UPDATE SET {', '.join(merges)};",
+            (after_rowid, through_rowid),
+        )
+
+
+def refresh_rollups(conn: sqlite3.Connection, log_types=None) -> int:
+    """
+    Folds rows appended since the last refresh into the rollups. Call it in the same transaction as the
+    inserts so readers never see rollups and logs disagree. Returns the number of log rows folded in.
+    """
+    if not has_rollups(conn):
+        return 0
+    folded = 0
+    for log_type, watermark in conn.execute("SELECT log_type, max_rowid FROM rollup_state").fetchall():
+        if log_types is not None and log_type not in log_types or not _is_table(conn, log_type):
+            continue
+        latest = _max_rowid(conn, log_type)
+        if latest < watermark:
+            # Rows were deleted from the end and rowids may be handed out again: start over
+            rebuild_rollups(conn, [log_type])
+            continue
+        if latest > watermark:
+            _fold(conn, log_type, watermark, latest)
+            conn.execute("UPDATE rollup_state SET max_rowid = ? WHERE log_type = ?", (latest, log_type))
+            folded += latest - watermark
+    return folded
+
+
+def rebuild_rollups(conn: sqlite3.Connection, log_types=None):
+    create_rollups(conn)
+    for log_type in log_types or ROLLUPS:
+        if not _is_table(conn, log_type):
+            continue
+        for grain in GRAINS:
+            conn.execute(f"DELETE FROM {rollup_name(log_type, grain)}")
+        latest = _max_rowid(conn, log_type)
+        _fold(conn, log_type, 0, latest)
+        conn.execute("UPDATE rollup_state SET max_rowid = ? WHERE log_type = ?", (latest, log_type))
+
+
+# --- query rewriting ---
+
+_AGGREGATE = re.compile(r"\b(count|sum|avg|min|max)\s*\(", re.I)
+# strftime('<fmt>', timestamp) / date(timestamp) / datetime(timestamp)
+_BUCKET = re.compile(
+    r"\b(?:strftime\s*\(\s*'(?P<fmt>[^']*)'\s*,|(?P<fn>date|datetime)\s*\()\s*"
+    r"(?:(?P<q>[A-Za-z_]\w*)\.)?timestamp\s*\)",
+    re.I,
+)
+_TOKEN = re.compile(r"\x00\d+\x00|'(?:[^']|'')*'|\"[^\"]+\"|([A-Za-z_]\w*)(?:\s*\.\s*([A-Za-z_]\w*))?(\s*\()?")
+_KEYWORDS = {
+    "as", "case", "when", "then", "else", "end", "and", "or", "not", "null", "is", "in", "like", "glob",
+    "between", "escape", "integer", "real", "text", "numeric", "asc", "desc", "nulls", "first", "last",
+    "collate", "nocase", "true", "false",
+}
+_SCALAR_FUNCTIONS = {
+    "round", "abs", "coalesce", "ifnull", "nullif", "upper", "lower", "length", "substr", "printf",
+    "cast", "min", "max", "iif", "instr", "replace", "trim",
+}
+# Finest time unit a strftime format needs -> grains that can produce it
+_FORMAT_GRAINS = {"day": set(GRAINS), "hour": {"minute", "hour"}, "minute": {"minute"}}
+_DAY_SPECIFIERS = set("Ymdjw%W")
+_EPOCH_BOUND = re.compile(r"^(?:(?P<q>[A-Za-z_]\w*)\.)?ts_epoch\s*(?P<op>>=|<=|>|<)\s*(?P<value>.+)$", re.I | re.S)
+_EPOCH_BETWEEN = re.compile(
+    r"^(?:(?P<q>[A-Za-z_]\w*)\.)?ts_epoch\s+between\s+(?P<low>.+?)\s+and\s+(?P<high>.+)$", re.I | re.S
+)
+# Day-aligned dynamic bounds produced by utilities/time_rewrite.py
+_DAY_ALIGNED = re.compile(
+    r"^CAST\(strftime\('%s', (?:date\(.*\)|.*, 'start of day')\) AS INTEGER\)(?:\s*\+\s*86400)?$", re.S
+)
+_ALIAS = re.compile(r"^(?P<expr>.*?\S)\s+(?:as\s+)?(?P<alias>[A-Za-z_]\w*|\"[^\"]+\")$", re.I | re.S)
+_ORDER_SUFFIX = re.compile(r"(?:\s+collate\s+\w+)?(?:\s+(?:asc|desc))?(?:\s+nulls\s+(?:first|last))?\s*$", re.I)
+# Keywords an expression can end with; any other keyword before a trailing word means it is not an alias
+_TERMINAL_KEYWORDS = {"end", "null", "true", "false"}
+
+
+class _Unsupported(Exception):
+    pass
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+class _Translation:
+    """Rewrites expressions over one log table into expressions over its rollup."""
+
+    def __init__(self, log_type: str, qualifiers: set, aliases: set):
+        self.log_type = log_type
+        self.dims, self.measures = ROLLUPS[log_type]
+        self.qualifiers = qualifiers
+        self.aliases = aliases
+        self.grains = set(GRAINS)
+        self._held = []
+
+    def _column(self, qualifier, name, dims_only: bool = False):
+        if qualifier is not None and qualifier.lower() not in self.qualifiers:
+            raise _Unsupported(f"unknown qualifier {qualifier}")
+        name = name.lower()
+        if name in self.dims:
+            return "dim", name
+        if name in self.measures and not dims_only:
+            return "measure", name
+        raise _Unsupported(f"column {name} is not in the rollup")
+
+    def _bucket(self, match) -> str:
+        qualifier = match.group("q")
+        if qualifier is not None and qualifier.lower() not in self.qualifiers:
+            raise _Unsupported(f"unknown qualifier {qualifier}")
+        if match.group("fn"):
+            if match.group("fn").lower() == "datetime":
+                raise _Unsupported("second granularity")
+            self.grains &= _FORMAT_GRAINS["day"]
+            return "date(bucket, 'unixepoch')"
+        fmt = match.group("fmt")
+        specifiers = set(re.findall(r"%(.)", fmt))
+        if specifiers - _DAY_SPECIFIERS - {"H", "M"}:
+            raise _Unsupported(f"format {fmt}")
+        unit = "minute" if "M" in specifiers else "hour" if "H" in specifiers else "day"
+        self.grains &= _FORMAT_GRAINS[unit]
+        return f"strftime('{fmt}', bucket, 'unixepoch')"
+
+    def _aggregate(self, function: str, argument: str) -> str:
+        argument = argument.strip()
+        function = function.lower()
+        distinct = re.match(r"^distinct\s+(.+)$", argument, re.I | re.S)
+        if distinct:
+            if function != "count":
+                raise _Unsupported("DISTINCT aggregate")
+            argument = distinct.group(1).strip()
+        if function == "count" and argument in ("*", "1") and not distinct:
+            return "COALESCE(SUM(row_count), 0)"
+        column = re.fullmatch(r"(?:([A-Za-z_]\w*)\s*\.\s*)?([A-Za-z_]\w*)", argument)
+        if column is None or self._column(column.group(1), column.group(2))[0] == "dim":
+            # An expression over dimensions and time buckets is constant within a rollup row,
+            # so each row stands for row_count identical values
+            value = self.translate(argument, aggregates=False)
+            if distinct:
+                return f"COUNT(DISTINCT {value})"
+            present = f"CASE WHEN ({value}) IS NOT NULL THEN row_count END"
+            return {
+                "count": f"COALESCE(SUM({present}), 0)",
+                "sum": f"SUM(({value}) * row_count)",
+                "avg": f"(SUM(({value}) * row_count) * 1.0 / SUM({present}))",
+                "min": f"MIN({value})",
+                "max": f"MAX({value})",
+            }[function]
+        name = column.group(2).lower()
+        if distinct:
+            raise _Unsupported("COUNT(DISTINCT measure)")
+        return {
+            "count": f"COALESCE(SUM(cnt_{name}), 0)",
+            "sum": f"SUM(sum_{name})",
+            "avg": f"(SUM(sum_{name}) * 1.0 / SUM(cnt_{name}))",
+            "min": f"MIN(min_{name})",
+            "max": f"MAX(max_{name})",
+        }[function]
+
+    def translate(self, expr: str, aggregates: bool, aliases: bool = False) -> str:
+        held = self._held
+
+        def hold(text):
+            held.append(text)
+            return f"\x00{len(held) - 1}\x00"
+
+        # Bucket expressions carry their own literal, so they go before literals are held back
+        expr = _BUCKET.sub(lambda m: hold(self._bucket(m)), expr)
+        expr = re.sub(r"'(?:[^']|'')*'", lambda m: hold(m.group(0)), expr)
+        while True:
+            match = _AGGREGATE.search(expr)
+            if match is None:
+                break
+            depth, end = 1, match.end()
+            while end < len(expr) and depth:
+                depth += (expr[end] == "(") - (expr[end] == ")")
+                end += 1
+            argument = expr[match.end():end - 1]
+            if match.group(1).lower() in ("min", "max") and len(split_top_level(argument)) > 1:
+                # Scalar min(a, b): leave it for the token pass below, only its arguments are translated
+                expr = expr[:match.start()] + hold(match.group(1)) + "(" + expr[match.end():]
+                continue
+            if not aggregates:
+                raise _Unsupported("aggregate outside SELECT/ORDER BY")
+            if _AGGREGATE.search(argument):
+                raise _Unsupported("nested aggregate")
+            expr = expr[:match.start()] + hold(self._aggregate(match.group(1), argument)) + expr[end:]
+
+        def token(m):
+            if m.group(1) is None:
+                text = m.group(0)
+                if text.startswith('"') and not (aliases and text[1:-1].lower() in self.aliases):
+                    raise _Unsupported(f"identifier {text}")
+                return text
+            first, second, call = m.group(1), m.group(2), m.group(3)
+            if call:
+                if second is not None or first.lower() not in _SCALAR_FUNCTIONS:
+                    raise _Unsupported(f"function {first}")
+                return m.group(0)
+            if second is None:
+                if first.lower() in _KEYWORDS:
+                    return first
+                if aliases and first.lower() in self.aliases:
+                    return first
+                # Measures only exist aggregated; a bare one (e.g. in WHERE) has no rollup equivalent
+                return self._column(None, first, dims_only=True)[1]
+            return self._column(first, second, dims_only=True)[1]
+
+        expr = _TOKEN.sub(token, expr)
+        while "\x00" in expr:
+            expr = re.sub(r"\x00(\d+)\x00", lambda m: held[int(m.group(1))], expr)
+        return expr
+
+    def time_bound(self, op: str, value: str) -> str:
+        value = value.strip()
+        if re.fullmatch(r"-?\d+", value):
+            epoch = int(value)
+            if op in (">", "<="):
+                epoch, op = epoch + 1, {">": ">=", "<=": "<"}[op]
+            self.grains = {g for g in self.grains if epoch % GRAINS[g] == 0}
+            return f"bucket {op} {epoch}"
+        if _DAY_ALIGNED.match(value) and op in (">=", "<"):
+            # Dynamic, but always on a day boundary, so every grain divides it
+            return f"bucket {op} {value}"
+        raise _Unsupported(f"bound {value}")
+
+
+class RollupRewriter:
+    """Routes aggregate queries to the rollups when they give the same answer as the raw table."""
+
+    def __init__(self):
+        self._catalog = (None, {})  # schema_version -> {log_type: {grain, ...}}
+        self._lock = threading.Lock()
+
+    def catalog(self, conn: sqlite3.Connection, schema_version: int) -> dict:
+        with self._lock:
+            if self._catalog[0] != schema_version:
+                available = {}
+                if has_rollups(conn):
+                    tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+                    for log_type in ROLLUPS:
+                        grains = {g for g in GRAINS if rollup_name(log_type, g) in tables}
+                        if grains and log_type in tables:
+                            available[log_type] = grains
+                self._catalog = (schema_version, available)
+            return self._catalog[1]
+
+    def _fresh(self, conn: sqlite3.Connection, log_type: str) -> bool:
+        watermark = conn.execute("SELECT max_rowid FROM rollup_state WHERE log_type = ?", (log_type,)).fetchone()
+        return watermark is not None and watermark[0] == _max_rowid(conn, log_type)
+
+    def rewrite(self, conn: sqlite3.Connection, sql: str, schema_version: int):
+        """The rollup form of `sql`, or None when it has to run on the log table."""
+        catalog = self.catalog(conn, schema_version)
+        if not catalog:
+            return None
+        clauses = split_clauses(sql)
+        if clauses is None or "from" not in clauses or "having" in clauses:
+            return None
+        source = re.fullmatch(r"([A-Za-z_]\w*)(?:\s+(?:as\s+)?([A-Za-z_]\w*))?", clauses["from"], re.I)
+        if source is None or source.group(1).lower() not in catalog:
+            return None
+        log_type = source.group(1).lower()
+        try:
+            rewritten, grain = self._rewrite(conn, log_type, source.group(2), clauses, catalog[log_type])
+        except _Unsupported:
+            return None
+        if not self._fresh(conn, log_type):
+            return None
+        return rewritten.replace("\x00rollup\x00", rollup_name(log_type, grain))
+
+    def _rewrite(self, conn, log_type, alias, clauses, grains):
+        if re.match(r"^(distinct|all)\b", clauses["select"], re.I):
+            raise _Unsupported("DISTINCT")
+        base_columns = {r[1].lower() for r in conn.execute(f"PRAGMA table_xinfo({log_type})")}
+        items = []
+        for item in split_top_level(clauses["select"]):
+            if item == "*" or item.endswith(".*"):
+                raise _Unsupported("SELECT *")
+            named = _ALIAS.match(item)
+            last = re.search(r"(\w+)$", named.group("expr")) if named else None
+            if named and named.group("alias").lower() not in _KEYWORDS and re.search(r"[\w)'\"]$", named.group("expr")) \
+                    and not (last and last.group(1).lower() in _KEYWORDS - _TERMINAL_KEYWORDS):
+                items.append((named.group("expr"), named.group("alias")))
+            else:
+                items.append((item, None))
+        aliases = {a.strip('"').lower() for _, a in items if a}
+        if aliases & base_columns:
+            # GROUP BY / WHERE resolve such a name to the column, ORDER BY to the alias: not worth mirroring
+            raise _Unsupported("alias shadows a column")
+        translation = _Translation(log_type, {log_type} | ({alias.lower()} if alias else set()), aliases)
+
+        select = []
+        for expr, name in items:
+            translated = translation.translate(expr, aggregates=True)
+            bare = re.fullmatch(r"(?:[A-Za-z_]\w*\s*\.\s*)?[A-Za-z_]\w*", expr.strip())
+            if name is None and not bare:
+                name = _quote(expr.strip())  # keep the column name SQLite would have given the original
+            select.append(f"{translated} AS {name}" if name else translated)
+        if "group by" not in clauses and not all(_AGGREGATE.search(expr) for expr, _ in items):
+            raise _Unsupported("bare column without GROUP BY")
+
+        where = []
+        pending = [clauses["where"]] if "where" in clauses else []
+        while pending:
+            for conjunct in split_conjuncts(pending.pop()):
+                inner = strip_parens(conjunct)
+                if inner != conjunct and len(split_conjuncts(inner)) > 1:
+                    pending.append(inner)
+                    continue
+                between = _EPOCH_BETWEEN.match(inner)
+                bound = _EPOCH_BOUND.match(inner)
+                if between or bound:
+                    qualifier = (between or bound).group("q")
+                    if qualifier is not None and qualifier.lower() not in translation.qualifiers:
+                        raise _Unsupported(f"unknown qualifier {qualifier}")
+                    if between:
+                        where.append(translation.time_bound(">=", between.group("low")))
+                        where.append(translation.time_bound("<=", between.group("high")))
+                    else:
+                        where.append(translation.time_bound(bound.group("op"), bound.group("value")))
+                else:
+                    where.append(f"({translation.translate(conjunct, aggregates=False)})")
+
+        group_by = [
+            item if re.fullmatch(r"\d+", item) else translation.translate(item, aggregates=False, aliases=True)
+            for item in split_top_level(clauses.get("group by", ""))
+        ] if "group by" in clauses else []
+        order_by = []
+        for item in split_top_level(clauses.get("order by", "")) if "order by" in clauses else []:
+            suffix = _ORDER_SUFFIX.search(item)
+            expr, suffix = item[:suffix.start()], item[suffix.start():]
+            if not re.fullmatch(r"\d+", expr.strip()):
+                expr = translation.translate(expr, aggregates=True, aliases=True)
+            order_by.append(expr + suffix)
+        if "limit" in clauses and not re.fullmatch(r"\d+(?:\s*(?:offset|,)\s*\d+)?", clauses["limit"], re.I):
+            raise _Unsupported("LIMIT expression")
+
+        usable = [g for g in GRAINS if g in grains and g in translation.grains]
+        if not usable:
+            raise _Unsupported("no rollup grain fits")
+        grain = max(usable, key=GRAINS.get)
+
+        sql = f"SELECT {', '.join(select)} FROM \x00rollup\x00"
+        if where:
+            sql += f" WHERE {' AND '.join(where)}"
+        if group_by:
+            sql += f" GROUP BY {', '.join(group_by)}"
+        if order_by:
+            sql += f" ORDER BY {', '.join(order_by)}"
+        if "limit" in clauses:
+            sql += f" LIMIT {clauses['limit']}"
+        return sql, grain
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Create, catch up or rebuild the rollup tables.")
+    parser.add_argument("--db", default="logs.db")
+    parser.add_argument("--rebuild", action="store_true", help="recompute from the log tables")
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db, isolation_level=None)
+    create_tables(conn)
+    started = time.perf_counter()
+    conn.execute("BEGIN")
+    try:
+        if args.rebuild:
+            rebuild_rollups(conn)
+            rows = sum(r[0] for r in conn.execute("SELECT max_rowid FROM rollup_state"))
+        else:
+            create_rollups(conn)
+            rows = refresh_rollups(conn)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("ANALYZE;")
+    conn.close()
+    print(f"rollups: folded {rows} rows in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
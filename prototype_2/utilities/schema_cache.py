@@ -0,0 +1,69 @@
+from langchain_community.utilities import SQLDatabase
+from utilities.db_version import DBVersion
+from utilities.create_logs_db import is_internal_table
+import sqlite3
+import threading
+
+
+class SchemaContext:
+    """
+    Cached table_info for the SQL prompt.
+    SQLDatabase reflects every table when it is built and get_table_info() runs sample-row SELECTs
+    on each call, so both are cached: the reflected SQLDatabase is rebuilt only when PRAGMA
+    schema_version moves, and the rendered string only when the schema or data version moves.
+    """
+
+    def __init__(self, db_path: str, version: DBVersion = None, refresh_on_data_change: bool = True):
+        self.db_path = db_path
+        self.version = version if version is not None else DBVersion(db_path)
+        self.refresh_on_data_change = refresh_on_data_change
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_schema_version = None
+        self._rendered = {}  # table subset -> (version key, table_info)
+        self._fingerprint = (None, None)
+
+    def _build_db(self) -> SQLDatabase:
+        conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+        try:
+            internal = [r[0] for r in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type IN ('table', 'view')"
+            ) if is_internal_table(r[0])]
+        finally:
+            conn.close()
+        # Views are included: in the partitioned layout the log tables are views over their shards
+        return SQLDatabase.from_uri(f"sqlite:///{self.db_path}", ignore_tables=internal, view_support=True)
+
+    def _current_db(self, schema_version) -> SQLDatabase:
+        if self._db is None or self._db_schema_version != schema_version:
+            self._db = self._build_db()
+            self._db_schema_version = schema_version
+            self._rendered.clear()
+        return self._db
+
+    @property
+    def db(self) -> SQLDatabase:
+        schema_version, _ = self.version.current()
+        with self._lock:
+            return self._current_db(schema_version)
+
+    def fingerprint(self) -> str:
+        """Identifies the current table layout, for caches of SQL generated against it."""
+        schema_version, _ = self.version.current()
+        with self._lock:
+            if self._fingerprint[0] != schema_version:
+                self._fingerprint = (schema_version, self.version.schema_fingerprint())
+            return self._fingerprint[1]
+
+    def table_info(self, table_names=None) -> str:
+        schema_version, data_version = self.version.current()
+        key = (schema_version, data_version) if self.refresh_on_data_change else (schema_version,)
+        subset = tuple(sorted(table_names)) if table_names else None
+        with self._lock:
+            db = self._current_db(schema_version)
+            cached = self._rendered.get(subset)
+            if cached is not None and cached[0] == key:
+                return cached[1]
+            info = db.get_table_info(table_names=list(subset) if subset else None)
+            self._rendered[subset] = (key, info)
+            return info
@@ -0,0 +1,202 @@
+"""
+Question-aware schema linking for the SQL prompt.
+
+Every usable table and each of its columns becomes a short document (name, description and, for
+low-cardinality columns, its value dictionary such as action ACCEPT/REJECT or status SUCCESS/FAILED)
+embedded once per schema with the MiniLM encoder. A question is scored against all of them with one
+matrix-vector product, plus a bonus for literal mentions of a column name or one of its values. Only
+the best-matching tables go into table_info (at most max_tables, however many log sources the DB
+grows), together with the columns they can be joined on and the values of their categorical columns.
+
+    python -m utilities.schema_linker "which functions failed on rejected connections?"
+"""
+from utilities import is_relevant
+from utilities.create_logs_db import HIDDEN_COLUMNS
+import argparse
+import numpy as np
+import os
+import re
+import threading
+
+
+SCHEMA_MAX_TABLES = int(os.environ.get("LOGBOT_SCHEMA_MAX_TABLES", "3"))
+SCHEMA_MARGIN = float(os.environ.get("LOGBOT_SCHEMA_MARGIN", "0.15"))  # keep tables this close to the best
+SCHEMA_MIN_SCORE = 0.2
+MAX_DICTIONARY_VALUES = 20  # columns with more distinct values are free text, not a dictionary
+VALUE_SAMPLE_ROWS = 10000
+LITERAL_BONUS = 0.3
+
+TABLE_DESCRIPTIONS = {
+    "vpc_logs": "VPC flow logs: network connections between source and destination IPs, accepted or rejected, with bytes sent",
+    "access_logs": "API access logs: which user called which endpoint with which HTTP method and status code",
+    "execution_logs": "function execution logs: backend function calls, their duration (latency) and success or failure",
+}
+COLUMN_DESCRIPTIONS = {
+    "timestamp": "time of the event",
+    "request_id": "request identifier shared by the logs of one request",
+    "src_ip": "source IP address",
+    "dst_ip": "destination IP address",
+    "action": "firewall decision, accepted or rejected traffic",
+    "bytes_sent": "bytes sent, traffic volume",
+    "user_id": "user who made the request",
+    "endpoint": "API endpoint path",
+    "method": "HTTP method",
+    "status_code": "HTTP status code of the response",
+    "function_name": "name of the function or service executed",
+    "duration_ms": "execution time, latency in milliseconds",
+    "status": "whether the execution succeeded or failed",
+}
+
+
+def _words(name: str) -> str:
+    return name.replace("_", " ")
+
+
+class SchemaIndex:
+    """Embedded table and column documents of one schema version."""
+
+    def __init__(self, columns: dict, dictionaries: dict):
+        self.columns = columns  # table -> [column]
+        self.dictionaries = dictionaries  # (table, column) -> [value]
+        # Columns every table has (timestamp, request_id) say nothing about which table a question needs
+        self.common = set.intersection(*map(set, columns.values())) if len(columns) > 1 else set()
+        self.keys, docs = [], []
+        for table, names in columns.items():
+            self.keys.append((table, None))
+            docs.append(f"{_words(table)}: {TABLE_DESCRIPTIONS.get(table, '')}")
+            for column in names:
+                doc = f"{_words(table)} {_words(column)}: {COLUMN_DESCRIPTIONS.get(column, '')}"
+                values = dictionaries.get((table, column))
+                if values:
+                    doc += f". values: {', '.join(map(str, values))}"
+                self.keys.append((table, column))
+                docs.append(doc)
+        self.vectors = is_relevant.encode(docs) if docs else np.zeros((0, 0), np.float32)
+
+    @classmethod
+    def build(cls, conn, tables) -> "SchemaIndex":
+        """Columns and value dictionaries read through a DB-API connection (SQLite or DuckDB)."""
+        columns, dictionaries = {}, {}
+        for table in tables:
+            names = [d[0] for d in conn.execute(f"SELECT * FROM {table} LIMIT 0").description]
+            columns[table] = [c for c in names if c not in HIDDEN_COLUMNS]
+            for column in columns[table]:
+                # Sampled, so building the index never scans a whole log table
+                values = [r[0] for r in conn.execute(
+                    f"SELECT DISTINCT {column} FROM (SELECT {column} FROM {table} LIMIT {VALUE_SAMPLE_ROWS}) "
+                    f"WHERE {column} IS NOT NULL LIMIT {MAX_DICTIONARY_VALUES + 1}"
+                ).fetchall()]
+                if 1 < len(values) <= MAX_DICTIONARY_VALUES:
+                    dictionaries[(table, column)] = sorted(values, key=str)
+        return cls(columns, dictionaries)
+
+    def _literal_bonus(self, question: str, table: str, column: str) -> float:
+        text = question.lower()
+        if column is None:
+            mentioned = re.search(rf"\b{re.escape(_words(table).split()[0])}", text)
+            return LITERAL_BONUS if mentioned else 0.0
+        if column in self.common:
+            return 0.0
+        if re.search(rf"\b{re.escape(column.lower())}\b", text):
+            return LITERAL_BONUS
+        lead = _words(column).lower().split()[0]  # "users" mentions user_id, "functions" function_name
+        if len(lead) >= 4 and re.search(rf"\b{re.escape(lead)}", text):
+            return LITERAL_BONUS
+        for value in self.dictionaries.get((table, column), ()):
+            value = str(value).lower()
+            if len(value) >= 3 and re.search(rf"(?<!\w){re.escape(value)}(?!\w)", text):
+                return LITERAL_BONUS
+        return 0.0
+
+    def scores(self, question: str) -> tuple:
+        """({(table, column or None): relevance}, tables one of whose columns or values the question names)."""
+        if not self.keys:
+            return {}, set()
+        similarity = self.vectors @ is_relevant.encode([question])[0]
+        bonus = [self._literal_bonus(question, *key) for key in self.keys]
+        mentioned = {table for (table, column), b in zip(self.keys, bonus) if b and column is not None}
+        return {key: float(s) + b for key, s, b in zip(self.keys, similarity, bonus)}, mentioned
+
+
+class LinkedSchema:
+    def __init__(self, tables: list, join_keys: list, dictionaries: dict, scores: dict):
+        self.tables = tables
+        self.join_keys = join_keys
+        self.dictionaries = dictionaries  # (table, column) -> values, for the linked tables
+        self.scores = scores  # table -> score
+
+    def notes(self) -> str:
+        """Join keys and categorical values of the linked tables, for the prompt."""
+        lines = []
+        if self.join_keys:
+            lines.append(f"Join these tables on: {', '.join(self.join_keys)}")
+        for (table, column), values in self.dictionaries.items():
+            lines.append(f"{table}.{column} takes the values: {', '.join(map(str, values))}")
+        return "\n    ".join(lines)
+
+
+class SchemaLinker:
+    """
+    Picks the tables relevant to a question. The index is rebuilt when the schema fingerprint moves;
+    `connect()` / `release(conn)` lend the connection used to read columns and value dictionaries.
+    """
+
+    def __init__(self, max_tables: int = SCHEMA_MAX_TABLES, margin: float = SCHEMA_MARGIN):
+        self.max_tables = max_tables
+        self.margin = margin
+        self._lock = threading.Lock()
+        self._index = (None, None)  # (schema fingerprint, SchemaIndex)
+
+    def index(self, fingerprint: str, tables, connect, release) -> SchemaIndex:
+        with self._lock:
+            if self._index[0] != fingerprint:
+                conn = connect()
+                try:
+                    self._index = (fingerprint, SchemaIndex.build(conn, tables))
+                finally:
+                    release(conn)
+            return self._index[1]
+
+    def link(self, question: str, index: SchemaIndex) -> LinkedSchema:
+        scores, mentioned = index.scores(question)
+        by_table = {}
+        for (table, _), score in scores.items():
+            by_table[table] = max(by_table.get(table, -1.0), score)
+        ranked = sorted(by_table, key=by_table.get, reverse=True)
+        if not ranked:
+            return LinkedSchema([], [], {}, {})
+        floor = max(by_table[ranked[0]] - self.margin, SCHEMA_MIN_SCORE)
+        # A table whose column or value the question names is kept even when its overall match is weaker
+        candidates = [t for t in ranked if t == ranked[0] or t in mentioned or by_table[t] >= floor]
+        candidates.sort(key=lambda t: (t != ranked[0], t not in mentioned, -by_table[t]))
+        tables = candidates[:self.max_tables]
+        # Columns named *_id that the linked tables share are what they join on
+        shared = set.intersection(*(set(index.columns[t]) for t in tables)) if len(tables) > 1 else set()
+        join_keys = sorted(c for c in shared if c.endswith("_id"))
+        dictionaries = {(t, c): v for (t, c), v in index.dictionaries.items() if t in tables}
+        return LinkedSchema(tables, join_keys, dictionaries, {t: by_table[t] for t in tables})
+
+
+def main(argv=None):
+    import sqlite3
+
+    parser = argparse.ArgumentParser(description="Show the tables the schema linker picks for a question.")
+    parser.add_argument("question")
+    parser.add_argument("--db", default=os.environ.get("LOGBOT_DB", "logs2.db"))
+    parser.add_argument("--max-tables", type=int, default=SCHEMA_MAX_TABLES)
+    args = parser.parse_args(argv)
+
+    from utilities.create_logs_db import is_internal_table
+
+    conn = sqlite3.connect(f"file:{args.db}?mode=ro", uri=True)
+    tables = [r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view')")
+              if not is_internal_table(r[0])]
+    index = SchemaIndex.build(conn, tables)
+    linked = SchemaLinker(args.max_tables).link(args.question, index)
+    for table in linked.tables:
+        print(f"{linked.scores[table]:.3f}  {table}")
+    print(linked.notes())
+
+
+if __name__ == "__main__":
+    main()
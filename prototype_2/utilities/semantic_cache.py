@@ -0,0 +1,193 @@
+from utilities import is_relevant
+from collections import OrderedDict
+import numpy as np
+import os
+import re
+import sqlite3
+import threading
+import time
+
+
+SQL_CACHE_PATH = os.environ.get("LOGBOT_SQL_CACHE_PATH", "semantic_sql_cache.db")
+SQL_CACHE_THRESHOLD = float(os.environ.get("LOGBOT_SQL_CACHE_THRESHOLD", "0.9"))
+
+# Tokens that change the SQL while barely moving the embedding: numbers, quoted literals, negations,
+# comparison/ordering words, time windows and the opposite values of the log columns
+_CONSTRAINT = re.compile(
+    r"(?<!\w)'[^']*'|\"[^\"]*\"|`[^`]*`|\d+(?:\.\d+)?|[<>!]=|[<>=]|\w+n't\b|\b(?:"
+    r"not|no|never|none|without|except|excluding|other|"
+    r"more|less|fewer|greater|above|below|over|under|least|most|top|bottom|highest|lowest|"
+    r"max|min|maximum|minimum|before|after|between|since|until|first|last|earliest|latest|"
+    r"oldest|newest|asc|desc|ascending|descending|"
+    r"now|today|tonight|yesterday|tomorrow|recent|recently|this|past|previous|next|ago|"
+    r"minutes?|hours?|hourly|days?|daily|weeks?|weekly|weekends?|months?|monthly|years?|yearly|"
+    r"(?:mon|tues|wednes|thurs|fri|satur|sun)days?|"
+    r"jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|"
+    r"sep(?:t|tember)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?|"
+    r"accept\w*|reject\w*|fail\w*|succe\w*|allow\w*|deny|denied|errors?"
+    r")\b"
+)
+# Spellings of one value that the SQL does not tell apart ("failed" and "failures" are both status = 'FAILED')
+_CANONICAL = [("accept", "accept"), ("reject", "reject"), ("fail", "fail"), ("succe", "success"),
+              ("allow", "allow"), ("denied", "deny"), ("error", "error")]
+_MONTHS = ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec")
+
+
+def _cache_text(question: str) -> str:
+    # Only case and whitespace are folded: numbers stay, "top 5" and "top 10" need different SQL
+    return " ".join(question.lower().split())
+
+
+def _canonical(token: str) -> str:
+    for prefix, value in _CANONICAL:
+        if token.startswith(prefix):
+            return value
+    if token[:3] in _MONTHS and token.isalpha() and not token.endswith("day"):
+        return token[:3]
+    return token
+
+
+def _constraints(text: str) -> list:
+    return [_canonical(token) for token in _CONSTRAINT.findall(text)]
+
+
+class SemanticSQLCache:
+    """
+    Question -> SQL cache in front of write_query.
+    Questions are embedded with the MiniLM model from utilities/is_relevant.py and the generated SQL of
+    the nearest cached question is reused when its cosine similarity clears `threshold` and both
+    questions carry exactly the same numbers, quoted literals, negation/comparison words, time windows
+    and column values (ACCEPT/REJECT, SUCCESS/FAILED, ...).
+    Bounded to `max_entries` (LRU), entries expire after `ttl_seconds`, and everything is persisted to a
+    small SQLite file (kept apart from the logs DB so cache writes never bump its data_version).
+    Entries remember the schema fingerprint they were generated against and are skipped once it changes.
+    """
+
+    def __init__(self, path: str = SQL_CACHE_PATH, threshold: float = SQL_CACHE_THRESHOLD,
+                 max_entries: int = 2000, ttl_seconds: float = 7 * 24 * 3600):
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # text -> dict(question, sql, embedding, created, schema)
+        self._matrix = None
+        self._keys = []
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+        CREATE TABLE IF NOT EXISTS semantic_sql_cache (
+            text TEXT PRIMARY KEY,
+            question TEXT,
+            sql TEXT,
+            embedding BLOB,
+            schema TEXT,
+            created REAL,
+            last_used REAL
+        );
+        """)
+        self._conn.commit()
+        self._load()
+
+    def _load(self):
+        rows = self._conn.execute(
+            "SELECT text, question, sql, embedding, schema, created FROM semantic_sql_cache ORDER BY last_used"
+        ).fetchall()
+        for text, question, sql, embedding, schema, created in rows:
+            self._entries[text] = {
+                "question": question,
+                "sql": sql,
+                "embedding": np.frombuffer(embedding, dtype=np.float32),
+                "schema": schema,
+                "created": created,
+            }
+        self._evict(time.time())
+
+    def _encode(self, text: str) -> np.ndarray:
+        return is_relevant.get_model().encode(text, normalize_embeddings=True).astype(np.float32)
+
+    def _evict(self, now: float):
+        expired = [k for k, e in self._entries.items() if now - e["created"] > self.ttl_seconds]
+        while len(self._entries) - len(expired) > self.max_entries:
+            oldest = next(k for k in self._entries if k not in expired)
+            expired.append(oldest)
+        if expired:
+            for k in expired:
+                self._entries.pop(k, None)
+            self._conn.executemany("DELETE FROM semantic_sql_cache WHERE text = ?", [(k,) for k in expired])
+            self._conn.commit()
+            self._matrix = None
+
+    def _touch(self, text: str, now: float):
+        self._entries.move_to_end(text)
+        self._conn.execute("UPDATE semantic_sql_cache SET last_used = ? WHERE text = ?", (now, text))
+        self._conn.commit()
+
+    def lookup(self, question: str, schema: str = None):
+        """Returns (sql, similarity) for the nearest cached question above the threshold, else None."""
+        text = _cache_text(question)
+        now = time.time()
+        with self._lock:
+            self._evict(now)
+            entry = self._entries.get(text)
+            if entry is not None and entry["schema"] == schema:
+                self.hits += 1
+                self._touch(text, now)
+                return entry["sql"], 1.0
+            if self._entries:
+                if self._matrix is None:
+                    self._keys = list(self._entries)
+                    self._matrix = np.stack([self._entries[k]["embedding"] for k in self._keys])
+                scores = self._matrix @ self._encode(text)
+                constraints = _constraints(text)
+                for i in np.argsort(-scores):
+                    if scores[i] < self.threshold:
+                        break
+                    entry = self._entries.get(self._keys[i])
+                    if entry is None or entry["schema"] != schema:
+                        continue
+                    # "top 5" is near "top 10" and "failed" near "not failed", but their SQL differs
+                    if _constraints(self._keys[i]) == constraints:
+                        self.hits += 1
+                        self._touch(self._keys[i], now)
+                        return entry["sql"], float(scores[i])
+            self.misses += 1
+            return None
+
+    def store(self, question: str, sql: str, schema: str = None):
+        text = _cache_text(question)
+        now = time.time()
+        embedding = self._encode(text)
+        with self._lock:
+            self._entries.pop(text, None)
+            self._entries[text] = {
+                "question": question,
+                "sql": sql,
+                "embedding": embedding,
+                "schema": schema,
+                "created": now,
+            }
+            self._conn.execute(
+                "INSERT OR REPLACE INTO semantic_sql_cache VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (text, question, sql, embedding.tobytes(), schema, now, now),
+            )
+            self._conn.commit()
+            self._matrix = None
+            self._evict(now)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+            self._conn.execute("DELETE FROM semantic_sql_cache")
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._entries),
+            "hit_rate": self.hits / total if total else 0.0,
+        }
@@ -0,0 +1,147 @@
+import re
+
+
+# Words that can follow a table reference and must not be mistaken for an alias
+_NOT_ALIAS = {
+    "where", "join", "inner", "left", "right", "full", "cross", "natural", "outer", "on", "using",
+    "group", "order", "limit", "having", "union", "intersect", "except", "window", "as", "indexed", "not",
+}
+# The alias is matched in a lookahead: when it turns out to be a keyword ("... FROM a JOIN b") it must
+# not be consumed, or the table reference right after it is skipped
+_TABLE_REF = re.compile(r"\b(?:from|join)\s+([A-Za-z_]\w*)(?=(?:\s+(?:as\s+)?([A-Za-z_]\w*))?)", re.I)
+
+
+def table_aliases(sql: str, tables) -> dict:
+    """Maps every name a known table is referenced by in `sql` (its own name and aliases) to the table."""
+    known = {t.lower(): t for t in tables}
+    aliases = {}
+    for match in _TABLE_REF.finditer(sql):
+        table = known.get(match.group(1).lower())
+        if table is None:
+            continue
+        aliases[table.lower()] = table
+        alias = match.group(2)
+        if alias and alias.lower() not in _NOT_ALIAS:
+            aliases[alias.lower()] = table
+    return aliases
+
+
+def referenced_tables(sql: str) -> list:
+    """Every name that follows a FROM or JOIN in `sql`, known table or not."""
+    return [m.group(1) for m in _TABLE_REF.finditer(mask_literals(sql))]
+
+
+_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_COMMENT_OR_LITERAL = re.compile(r"'(?:[^']|'')*'|--[^\n]*|/\*.*?(?:\*/|$)", re.S)
+_NESTED = re.compile(r"^\s*with\b|\(\s*select\b", re.I)
+_CLAUSES = ("select", "from", "where", "group by", "having", "order by", "limit")
+_CLAUSE = re.compile(r"\b(select|from|where|group\s+by|having|order\s+by|limit)\b", re.I)
+
+
+def mask_literals(sql: str) -> str:
+    """Same-length copy of `sql` with string literal contents blanked, for keyword/paren scanning."""
+    return _LITERAL.sub(lambda m: "'" + "_" * (len(m.group(0)) - 2) + "'", sql)
+
+
+def strip_comments(sql: str) -> str:
+    """`sql` with its -- and /* */ comments blanked (string literals are left alone)."""
+    return _COMMENT_OR_LITERAL.sub(lambda m: m.group(0) if m.group(0).startswith("'") else " ", sql)
+
+
+def top_level_matches(sql: str, pattern) -> list:
+    """Matches of `pattern` in `sql` outside parentheses and string literals."""
+    masked = mask_literals(sql)
+    depths = _depths(masked)
+    return [m for m in pattern.finditer(masked) if depths[m.start()] == 0]
+
+
+def has_nested_select(sql: str) -> bool:
+    """True for a statement with a CTE or a subquery (anywhere: FROM, WHERE, SELECT list)."""
+    return bool(_NESTED.search(mask_literals(sql)))
+
+
+def _depths(masked: str) -> list:
+    depths, depth = [], 0
+    for ch in masked:
+        depths.append(depth)
+        depth += (ch == "(") - (ch == ")")
+    return depths
+
+
+def split_top_level(text: str) -> list:
+    """Splits a comma-separated list on commas outside parentheses and string literals."""
+    masked = mask_literals(text)
+    depths = _depths(masked)
+    cuts = [i for i, ch in enumerate(masked) if ch == "," and depths[i] == 0]
+    bounds = zip([-1] + cuts, cuts + [len(text)])
+    return [text[a + 1:b].strip() for a, b in bounds]
+
+
+_AND = re.compile(r"\b(and|between)\b", re.I)
+
+
+def split_conjuncts(text: str) -> list:
+    """Splits a predicate on top-level ANDs, leaving the AND of a BETWEEN in place."""
+    masked = mask_literals(text)
+    depths = _depths(masked)
+    parts, start, in_between = [], 0, False
+    for m in _AND.finditer(masked):
+        if depths[m.start()] != 0:
+            continue
+        if m.group(1).lower() == "between":
+            in_between = True
+        elif in_between:
+            in_between = False
+        else:
+            parts.append(text[start:m.start()].strip())
+            start = m.end()
+    parts.append(text[start:].strip())
+    return parts
+
+
+def strip_parens(text: str) -> str:
+    """`text` without the parentheses that enclose all of it, e.g. "((a AND b))" -> "a AND b"."""
+    text = text.strip()
+    while text.startswith("(") and text.endswith(")"):
+        depth = 0
+        for i, ch in enumerate(mask_literals(text)):
+            depth += (ch == "(") - (ch == ")")
+            if depth == 0 and i < len(text) - 1:
+                return text
+        text = text[1:-1].strip()
+    return text
+
+
+def flat_conjuncts(text: str) -> list:
+    """Top-level AND-ed terms of a predicate, descending into parenthesized AND groups."""
+    terms = []
+    for conjunct in split_conjuncts(text):
+        inner = strip_parens(conjunct)
+        if inner != conjunct and len(split_conjuncts(inner)) > 1:
+            terms.extend(flat_conjuncts(inner))
+        else:
+            terms.append(inner)
+    return terms
+
+
+def split_clauses(sql: str):
+    """
+    Splits a single SELECT (no UNION/subqueries in FROM) into its clauses:
+    {"select": ..., "from": ..., "where": ..., "group by": ..., "having": ..., "order by": ..., "limit": ...}.
+    Returns None for anything else.
+    """
+    sql = sql.strip().rstrip(";").strip()
+    masked = mask_literals(sql)
+    depth_at = _depths(masked)
+    found = [(m.start(), m.end(), " ".join(m.group(1).lower().split()))
+             for m in _CLAUSE.finditer(masked) if depth_at[m.start()] == 0]
+    names = [f[2] for f in found]
+    if not names or names[0] != "select" or len(set(names)) != len(names):
+        return None
+    if [n for n in _CLAUSES if n in names] != names:
+        return None  # out of order, e.g. a compound SELECT
+    clauses = {}
+    for i, (start, end, name) in enumerate(found):
+        stop = found[i + 1][0] if i + 1 < len(found) else len(sql)
+        clauses[name] = sql[end:stop].strip()
+    return clauses
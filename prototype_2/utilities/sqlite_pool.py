@@ -0,0 +1,107 @@
+from contextlib import contextmanager
+import os
+import queue
+import sqlite3
+import threading
+
+
+POOL_SIZE = int(os.environ.get("LOGBOT_SQLITE_POOL_SIZE", "8"))
+MMAP_SIZE = int(os.environ.get("LOGBOT_SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+CACHE_SIZE = int(os.environ.get("LOGBOT_SQLITE_CACHE_SIZE", str(-64 * 1024)))  # negative = KiB
+
+
+def ensure_wal(db_path: str) -> bool:
+    """
+    Switches the database to WAL so ingest can write while readers keep their snapshots.
+    journal_mode is persistent but can only be changed through a writable connection.
+    """
+    try:
+        conn = sqlite3.connect(db_path)
+        try:
+            return conn.execute("PRAGMA journal_mode=WAL").fetchone()[0].lower() == "wal"
+        finally:
+            conn.close()
+    except sqlite3.OperationalError:
+        return False
+
+
+class ReadOnlyPool:
+    """
+    Pool of tuned read-only SQLite connections shared by every thread and Streamlit session.
+    Connections are opened with mode=ro + query_only, so generated SQL can never write, and reused
+    LIFO so the most recently used (warmest) page cache is handed out first.
+    Use checkout()/release() or the connection() context manager.
+    """
+
+    def __init__(self, db_path: str, size: int = POOL_SIZE, mmap_size: int = MMAP_SIZE,
+                 cache_size: int = CACHE_SIZE, busy_timeout_ms: int = 5000, wal: bool = True):
+        self.db_path = db_path
+        self.size = size
+        self.mmap_size = mmap_size
+        self.cache_size = cache_size
+        self.busy_timeout_ms = busy_timeout_ms
+        if wal:
+            ensure_wal(db_path)
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False)
+        conn.execute("PRAGMA query_only=ON")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        conn.execute(f"PRAGMA cache_size={int(self.cache_size)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        return conn
+
+    def checkout(self, timeout: float = None) -> sqlite3.Connection:
+        if self._closed:
+            raise RuntimeError("connection pool is closed")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+        if create:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"no SQLite connection available after {timeout}s") from None
+
+    def release(self, conn: sqlite3.Connection):
+        if self._closed:
+            conn.close()
+            return
+        if conn.in_transaction:
+            # End the read transaction so the snapshot does not pin the WAL
+            conn.rollback()
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self, timeout: float = None):
+        conn = self.checkout(timeout)
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
@@ -0,0 +1,271 @@
+"""
+Incremental ingest that follows growing log files.
+
+    python -m utilities.tail_ingest --db logs2.db --follow CSVs/*.csv /var/log/app/access_logs.jsonl
+
+Each file's byte offset is checkpointed in the DB (ingest_checkpoints) in the same transaction as the
+rows read up to it, so a restart resumes exactly where the last committed micro-batch ended. Only
+complete lines are consumed; a half-written last line is picked up on the next poll. On rotation (a
+changed inode) the old file is looked up by its inode in the same directory and read to its end before
+the new one is read from the start; a file smaller than its checkpoint was truncated and is re-read.
+Rows are deduplicated on request_id (INSERT OR IGNORE on its unique index). A complete JSON line that
+does not parse to an object is logged, counted in `skipped` and passed over, so it cannot stop the
+ingest on every restart; so is a record the insert rejects (nested values, no usable timestamp in the
+partitioned layout), counted in `rejected`.
+Rollup tables (utilities/rollups.py), when present, are brought up to date in the same transaction.
+Supports CSV (header line + rows) and JSON lines (one object per line).
+"""
+from utilities.create_logs_db import create_tables, create_indexes
+from utilities.csv_to_db import table_for
+from utilities.partitions import is_partitioned, insert_partitioned
+from utilities.rollups import refresh_rollups
+import argparse
+import csv
+import io
+import json
+import logging
+import os
+import sqlite3
+import time
+
+
+BATCH_ROWS = 5_000
+POLL_INTERVAL_S = 2.0
+
+log = logging.getLogger(__name__)
+# What a record the DB cannot take raises (as opposed to a locked or full DB, which is retried)
+_BAD_RECORD = (sqlite3.InterfaceError, sqlite3.ProgrammingError, sqlite3.IntegrityError, ValueError, TypeError,
+               OverflowError)
+
+
+def create_checkpoint_table(conn: sqlite3.Connection):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS ingest_checkpoints (
+        path TEXT PRIMARY KEY,
+        inode INTEGER,
+        offset INTEGER,
+        header TEXT,
+        updated_at REAL
+    );
+    """)
+
+
+def _read_checkpoint(conn: sqlite3.Connection, path: str):
+    row = conn.execute("SELECT inode, offset, header FROM ingest_checkpoints WHERE path = ?", (path,)).fetchone()
+    if row is None:
+        return None, 0, None
+    return row[0], row[1], json.loads(row[2]) if row[2] else None
+
+
+def _find_rotated(path: str, inode: int):
+    """The file `path` was rotated to: same inode, same directory, named after it (access_logs.jsonl.1)."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    for entry in os.scandir(os.path.dirname(path) or "."):
+        try:
+            if entry.name.startswith(stem) and entry.inode() == inode and entry.is_file():
+                return entry.path
+        except OSError:
+            continue
+    return None
+
+
+def _parse_json(line: str):
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None
+    return record if isinstance(record, dict) else None
+
+
+def _parse_lines(lines: list, is_json: bool, header):
+    """Returns (header, list of dict records, malformed lines) for complete lines."""
+    if is_json:
+        records, bad = [], []
+        for line in filter(str.strip, lines):
+            record = _parse_json(line)
+            if record is None:
+                bad.append(line)
+            else:
+                records.append(record)
+        return header, records, bad
+    rows = [row for row in csv.reader(io.StringIO("".join(lines))) if row]
+    if header is None and rows:
+        header, rows = rows[0], rows[1:]
+    return header, [dict(zip(header, row)) for row in rows], []
+
+
+class TailIngester:
+    """Follows a set of CSV / JSON-lines files and appends their new records in micro-batches."""
+
+    def __init__(self, conn: sqlite3.Connection, batch_rows: int = BATCH_ROWS):
+        self.conn = conn
+        self.batch_rows = batch_rows
+        create_tables(conn)
+        create_indexes(conn, secondary=False)
+        create_checkpoint_table(conn)
+        self._columns = {}
+        self.partitioned = is_partitioned(conn)
+        self.skipped = 0  # malformed lines passed over
+        self.rejected = 0  # parsed records the DB could not take
+
+    def _table_columns(self, table: str) -> list:
+        if table not in self._columns:
+            self._columns[table] = [r[1] for r in self.conn.execute(f"PRAGMA table_info({table})")]
+        return self._columns[table]
+
+    def insert_records(self, table: str, records: list) -> list:
+        """Appends records (dicts) that are new by request_id; returns the inserted ones."""
+        columns = [c for c in self._table_columns(table) if any(c in r for r in records)]
+        if not records or not columns:
+            return []
+        ids = list({r.get("request_id") for r in records} - {None})
+        seen = set()
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            seen.update(row[0] for row in self.conn.execute(
+                f"SELECT request_id FROM {table} WHERE request_id IN ({', '.join('?' * len(chunk))})", chunk
+            ))
+        fresh, batch_ids = [], set()
+        for r in records:
+            request_id = r.get("request_id")
+            if request_id is not None:
+                # Records without a request_id are not deduplicated (the unique index allows many NULLs)
+                if request_id in seen or request_id in batch_ids:
+                    continue
+                batch_ids.add(request_id)
+            fresh.append(r)
+        rows = [tuple(r.get(c) for c in columns) for r in fresh]
+        if self.partitioned:
+            insert_partitioned(self.conn, table, columns, rows)
+        else:
+            self.conn.executemany(
+                f"INSERT OR IGNORE INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                rows,
+            )
+            # Same transaction as the rows themselves, so readers never see the rollups lag behind
+            refresh_rollups(self.conn, [table])
+        return fresh
+
+    def _insert_or_reject(self, table: str, records: list, path: str) -> int:
+        """insert_records, except that records it cannot take are counted in `rejected` and skipped."""
+        self.conn.execute("SAVEPOINT batch")
+        try:
+            inserted = len(self.insert_records(table, records))
+            self.conn.execute("RELEASE batch")
+            return inserted
+        except _BAD_RECORD:
+            self.conn.execute("ROLLBACK TO batch")
+            self.conn.execute("RELEASE batch")
+        # One record the DB cannot take (a nested value, no usable timestamp for its shard...) must not
+        # hold back the rest of its batch, nor the checkpoint, on every poll from now on
+        inserted = 0
+        for record in records:
+            self.conn.execute("SAVEPOINT record")
+            try:
+                inserted += len(self.insert_records(table, [record]))
+                self.conn.execute("RELEASE record")
+            except _BAD_RECORD as e:
+                self.conn.execute("ROLLBACK TO record")
+                self.conn.execute("RELEASE record")
+                self.rejected += 1
+                log.warning("%s: rejecting record %.200r: %s", path, record, e)
+        return inserted
+
+    def _save_checkpoint(self, path: str, inode: int, offset: int, header):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO ingest_checkpoints VALUES (?, ?, ?, ?, ?)",
+            (path, inode, offset, json.dumps(header) if header else None, time.time()),
+        )
+
+    def _ingest(self, path: str, source: str, inode: int, offset: int, header, final: bool = False) -> int:
+        """Ingests `source` from `offset` on, checkpointed under `path`. `final`: nothing more will be written to it."""
+        table = table_for(path)
+        is_json = path.endswith((".jsonl", ".json", ".ndjson"))
+        inserted = 0
+        with open(source, "rb") as f:
+            f.seek(offset)
+            while True:
+                lines, consumed = [], 0
+                for raw in f:
+                    if not raw.endswith(b"\n") and not final:
+                        break  # partial line still being written
+                    lines.append(raw.decode("utf-8"))
+                    consumed += len(raw)
+                    if len(lines) >= self.batch_rows:
+                        break
+                if not lines:
+                    break
+                header, records, bad = _parse_lines(lines, is_json, header)
+                for line in bad:
+                    log.warning("%s: skipping malformed line %.200r", source, line)
+                self.skipped += len(bad)
+                offset += consumed
+                self.conn.execute("BEGIN")
+                try:
+                    inserted += self._insert_or_reject(table, records, source)
+                    self._save_checkpoint(path, inode, offset, header)
+                    self.conn.execute("COMMIT")
+                except Exception:
+                    self.conn.execute("ROLLBACK")
+                    raise
+                f.seek(offset)
+        return inserted
+
+    def poll_file(self, path: str) -> int:
+        """Ingests whatever complete lines were appended to `path` since its checkpoint. Returns rows inserted."""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return 0
+        inode, offset, header = _read_checkpoint(self.conn, path)
+        inserted = 0
+        if inode is not None and inode != stat.st_ino:
+            # Rotated: finish what was appended to the old file before it was renamed away
+            rotated = _find_rotated(path, inode)
+            if rotated is not None and os.path.getsize(rotated) > offset:
+                inserted += self._ingest(path, rotated, inode, offset, header, final=True)
+            self.conn.execute("BEGIN")
+            self._save_checkpoint(path, stat.st_ino, 0, None)
+            self.conn.execute("COMMIT")
+            offset, header = 0, None
+        elif stat.st_size < offset:
+            # Truncated in place: start over
+            offset, header = 0, None
+        if stat.st_size == offset:
+            return inserted
+        return inserted + self._ingest(path, path, stat.st_ino, offset, header)
+
+    def poll(self, paths: list) -> int:
+        return sum(self.poll_file(path) for path in paths)
+
+    def follow(self, paths: list, interval: float = POLL_INTERVAL_S):
+        while True:
+            rows = self.poll(paths)
+            if rows:
+                print(f"{time.strftime('%H:%M:%S')} ingested {rows} rows "
+                      f"({self.skipped} malformed lines, {self.rejected} rejected records so far)")
+            time.sleep(interval)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tail CSV / JSON-lines log files into the logs DB.")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--db", default="logs.db")
+    parser.add_argument("--follow", action="store_true", help="keep polling for new records")
+    parser.add_argument("--interval", type=float, default=POLL_INTERVAL_S)
+    parser.add_argument("--batch-rows", type=int, default=BATCH_ROWS)
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    ingester = TailIngester(conn, batch_rows=args.batch_rows)
+    if args.follow:
+        ingester.follow(args.paths, args.interval)
+    else:
+        rows = ingester.poll(args.paths)
+        print(f"ingested {rows} rows, skipped {ingester.skipped} malformed lines and {ingester.rejected} rejected records")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+Rewrites time predicates on the ISO `timestamp` TEXT column onto the indexed integer `ts_epoch` column.
+
+Stored timestamps look like 2025-04-13T12:00:00 (UTC), so every rewrite below is exactly equivalent to
+the original string comparison, including its quirks:
+  - `ts OP '2025-04-13T12:00:00'`                 -> `ts_epoch OP <epoch>`
+  - `ts OP '2025-04-13'` / `ts OP '2025-04-13 12:00:00'` / `ts OP date(...)|datetime(...)`
+      compare at day granularity as strings ('T' sorts after ' '), so >, >= become `ts_epoch >= day`
+      and <, <= become `ts_epoch < day`
+  - `date(ts)` / `strftime('%Y-%m-%d'|'%Y-%m'|'%Y', ts) OP '<literal>'` -> day/month/year ranges
+  - `datetime(ts) OP datetime(...)`                 -> `ts_epoch OP <epoch of the expression>`
+  - `ts LIKE '2025-04%'`                            -> month range (year/month/day/hour prefixes)
+  - BETWEEN forms of the above
+Anything else (including `=` against a date-only value, which never matches) is left as written.
+
+Only columns that resolve to a log table with ts_epoch are rewritten: `v.timestamp` when v names or
+aliases one of those tables, a bare `timestamp` when every table in the statement is one. Statements
+with a CTE or subquery are left alone, since `timestamp` may be a column of the derived table there.
+"""
+from utilities.create_logs_db import TABLES
+from utilities.sql_text import has_nested_select, referenced_tables, table_aliases
+from datetime import datetime, timedelta
+import calendar
+import re
+
+
+_COL = r"(?<![\w.])(?:(?P<q>[A-Za-z_]\w*)\.)?timestamp\b"
+_OP = r"(?P<op>>=|<=|==|=|>|<)"
+# A date/datetime valued SQL call such as date('now', '-7 days') or datetime('now')
+_CALL = r"(?:date|datetime)\s*\((?:[^()']|'[^']*')*\)"
+_LIT = r"'[^']*'"
+_VALUE = rf"(?:{_LIT}|{_CALL})"
+
+_FULL = re.compile(r"^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}$")
+_DAY = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+_DAY_SPACE = re.compile(r"^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$")
+_MONTH = re.compile(r"^\d{4}-\d{2}$")
+_YEAR = re.compile(r"^\d{4}$")
+_HOUR_PREFIX = re.compile(r"^\d{4}-\d{2}-\d{2}T\d{2}$")
+
+
+def _epoch(dt: datetime) -> int:
+    return calendar.timegm(dt.timetuple())
+
+
+def _epoch_col(q):
+    return f"{q}.ts_epoch" if q else "ts_epoch"
+
+
+def _next_month(dt: datetime) -> datetime:
+    return dt.replace(year=dt.year + dt.month // 12, month=dt.month % 12 + 1)
+
+
+def _period(text: str):
+    """[start, end) epochs for a literal naming a day, month or year; None otherwise."""
+    if _DAY.match(text):
+        start = datetime.strptime(text, "%Y-%m-%d")
+        return _epoch(start), _epoch(start + timedelta(days=1))
+    if _MONTH.match(text):
+        start = datetime.strptime(text, "%Y-%m")
+        return _epoch(start), _epoch(_next_month(start))
+    if _YEAR.match(text):
+        start = datetime.strptime(text, "%Y")
+        return _epoch(start), _epoch(start.replace(year=start.year + 1))
+    return None
+
+
+def _range(col: str, op: str, start, end):
+    # Predicate of `bucket(ts) OP period` where the period is [start, end)
+    if op in ("=", "=="):
+        return f"({col} >= {start} AND {col} < {end})"
+    return {">=": f"{col} >= {start}", ">": f"{col} >= {end}", "<": f"{col} < {start}", "<=": f"{col} < {end}"}[op]
+
+
+def _raw_compare(q, op: str, value: str):
+    """`timestamp OP value` with value as written in the SQL; None when not rewritable."""
+    col = _epoch_col(q)
+    if value.startswith("'"):
+        text = value[1:-1]
+        if _FULL.match(text):
+            return f"{col} {'=' if op == '==' else op} {_epoch(datetime.strptime(text, '%Y-%m-%dT%H:%M:%S'))}"
+        if _DAY.match(text) or _DAY_SPACE.match(text):
+            day = f"{_epoch(datetime.strptime(text[:10], '%Y-%m-%d'))}"
+        else:
+            return None
+    else:
+        day = f"CAST(strftime('%s', {value}, 'start of day') AS INTEGER)"
+    if op in ("=", "=="):
+        return None
+    return f"{col} >= {day}" if op in (">", ">=") else f"{col} < {day}"
+
+
+def _bucket_compare(func: str, fmt, q, op: str, value: str):
+    """`date(ts)` / `datetime(ts)` / `strftime(fmt, ts)` OP value; None when not rewritable."""
+    col = _epoch_col(q)
+    if func == "datetime" or fmt == "%Y-%m-%d %H:%M:%S":
+        if value.startswith("'"):
+            text = value[1:-1]
+            if not _DAY_SPACE.match(text):
+                return None
+            return f"{col} {'=' if op == '==' else op} {_epoch(datetime.strptime(text, '%Y-%m-%d %H:%M:%S'))}"
+        if not value.lower().startswith("datetime"):
+            return None
+        return f"{col} {'=' if op == '==' else op} CAST(strftime('%s', {value}) AS INTEGER)"
+    granularity = {"date": "%Y-%m-%d"}.get(func, fmt)
+    if value.startswith("'"):
+        text = value[1:-1]
+        expected = {"%Y-%m-%d": _DAY, "%Y-%m": _MONTH, "%Y": _YEAR}.get(granularity)
+        if expected is None or not expected.match(text):
+            return None
+        start, end = _period(text)
+        return _range(col, op, start, end)
+    if granularity == "%Y-%m-%d" and value.lower().startswith("date("):
+        start = f"CAST(strftime('%s', {value}) AS INTEGER)"
+        return _range(col, op, start, f"{start} + 86400")
+    return None
+
+
+_RAW_BETWEEN = re.compile(rf"{_COL}\s+between\s+(?P<a>{_VALUE})\s+and\s+(?P<b>{_VALUE})", re.I)
+_RAW_CMP = re.compile(rf"{_COL}\s*{_OP}\s*(?P<v>{_VALUE})", re.I)
+_BUCKET = (
+    rf"(?:(?P<func>date|datetime)\s*\(\s*{_COL}\s*\)"
+    rf"|strftime\s*\(\s*'(?P<fmt>%Y-%m-%d %H:%M:%S|%Y-%m-%d|%Y-%m|%Y)'\s*,\s*{_COL.replace('(?P<q>', '(?P<q2>')}\s*\))"
+)
+_BUCKET_BETWEEN = re.compile(rf"{_BUCKET}\s+between\s+(?P<a>{_VALUE})\s+and\s+(?P<b>{_VALUE})", re.I)
+_BUCKET_CMP = re.compile(rf"{_BUCKET}\s*{_OP}\s*(?P<v>{_VALUE})", re.I)
+_LIKE = re.compile(rf"{_COL}\s+like\s+'(?P<prefix>[0-9T:-]+)%'", re.I)
+
+
+def _bucket_args(m):
+    func = (m.group("func") or "strftime").lower()
+    return func, m.group("fmt"), m.group("q") or m.group("q2")
+
+
+def _sub(pattern, build, sql: str, resolves) -> str:
+    def replace(m):
+        groups = m.groupdict()
+        if not resolves(groups.get("q") or groups.get("q2")):
+            return m.group(0)
+        rewritten = build(m)
+        return rewritten if rewritten is not None else m.group(0)
+    return pattern.sub(replace, sql)
+
+
+def _both(a, b):
+    return f"({a} AND {b})" if a is not None and b is not None else None
+
+
+def _like(m):
+    prefix, col = m.group("prefix"), _epoch_col(m.group("q"))
+    if _HOUR_PREFIX.match(prefix):
+        start = _epoch(datetime.strptime(prefix, "%Y-%m-%dT%H"))
+        return f"({col} >= {start} AND {col} < {start + 3600})"
+    period = _period(prefix.rstrip("-"))
+    if period is None or prefix.endswith("-") and _DAY.match(prefix[:-1]):
+        # '2025-04-13-%' can never match a stored timestamp
+        return None
+    return f"({col} >= {period[0]} AND {col} < {period[1]})"
+
+
+def rewrite_time_predicates(sql: str, tables=tuple(TABLES)) -> str:
+    """
+    Returns `sql` with every recognized timestamp predicate moved onto ts_epoch (see module docstring).
+    `tables` are the tables that have a ts_epoch column.
+    """
+    if has_nested_select(sql):
+        return sql
+    aliases = table_aliases(sql, tables)
+    known = {t.lower() for t in tables}
+    bare_ok = all(name.lower() in known for name in referenced_tables(sql))
+
+    def resolves(qualifier):
+        return qualifier.lower() in aliases if qualifier else bare_ok
+
+    sql = _sub(_BUCKET_BETWEEN, lambda m: _both(
+        _bucket_compare(*_bucket_args(m), ">=", m.group("a")),
+        _bucket_compare(*_bucket_args(m), "<=", m.group("b")),
+    ), sql, resolves)
+    sql = _sub(_BUCKET_CMP, lambda m: _bucket_compare(*_bucket_args(m), m.group("op"), m.group("v")), sql, resolves)
+    sql = _sub(_RAW_BETWEEN, lambda m: _both(
+        _raw_compare(m.group("q"), ">=", m.group("a")),
+        _raw_compare(m.group("q"), "<=", m.group("b")),
+    ), sql, resolves)
+    sql = _sub(_RAW_CMP, lambda m: _raw_compare(m.group("q"), m.group("op"), m.group("v")), sql, resolves)
+    sql = _sub(_LIKE, _like, sql, resolves)
+    return sql